@@ -1,6 +1,7 @@
 import logging
-from typing import Optional, Dict, Set
+from typing import Optional
 from enum import Enum, auto
+from user_state import UserStateStore, ENABLED, ANALYZING_SENTIMENT
 
 logger = logging.getLogger(__name__)
 
@@ -12,43 +13,39 @@ class AIProvider(Enum):
     # Adicione novos providers aqui
 
 class AIManager:
-    def __init__(self):
-        # Dicionário para armazenar o estado de ativação por usuário
-        self._enabled_users: Set[int] = set()
-        # Dicionário para armazenar o provider ativo por usuário
-        self._active_providers: Dict[int, AIProvider] = {}
+    def __init__(self, state: Optional[UserStateStore] = None):
+        # Estado compacto por usuário (IA ativa, provider, análise de sentimento)
+        self._state = state if state is not None else UserStateStore()
 
     def enable_ai(self, user_id: int, provider: Optional[AIProvider] = None) -> AIProvider:
         """
         Ativa a IA para um usuário e opcionalmente define o provider
         """
-        self._enabled_users.add(user_id)
+        self._state.set_flag(user_id, ENABLED, True)
         if provider:
-            self._active_providers[user_id] = provider
-        elif user_id not in self._active_providers:
+            self._state.set_provider_code(user_id, provider.value)
+        elif not self._state.get_provider_code(user_id):
             # Define DeepSeek como provider padrão
-            self._active_providers[user_id] = AIProvider.DEEPSEEK
+            self._state.set_provider_code(user_id, AIProvider.DEEPSEEK.value)
 
-        logger.info(f"AI enabled for user {user_id} with provider {self._active_providers[user_id]}")
-        return self._active_providers[user_id]
+        active_provider = self.get_active_provider(user_id)
+        logger.info(f"AI enabled for user {user_id} with provider {active_provider}")
+        return active_provider
 
     def disable_ai(self, user_id: int) -> None:
         """
         Desativa a IA para um usuário
         """
-        self._enabled_users.discard(user_id)
+        self._state.set_flag(user_id, ENABLED, False)
         logger.info(f"AI disabled for user {user_id}")
 
     def switch_provider(self, user_id: int, provider: AIProvider) -> None:
         """
         Troca o provider ativo para um usuário
         """
-        self._active_providers[user_id] = provider
+        self._state.set_provider_code(user_id, provider.value)
         # Garante que a IA está ativa ao trocar o provider, exceto se for modo DUMMY
-        if provider != AIProvider.DUMMY:
-            self._enabled_users.add(user_id)
-        else:
-            self._enabled_users.discard(user_id)
+        self._state.set_flag(user_id, ENABLED, provider != AIProvider.DUMMY)
         logger.info(f"Switched AI provider for user {user_id} to {provider}")
 
     def enable_dummy_mode(self, user_id: int) -> None:
@@ -68,13 +65,29 @@ class AIManager:
         """
         Verifica se a IA está ativa para um usuário
         """
-        return user_id in self._enabled_users
+        return self._state.get_flag(user_id, ENABLED)
 
     def get_active_provider(self, user_id: int) -> Optional[AIProvider]:
         """
         Retorna o provider ativo para um usuário
         """
-        return self._active_providers.get(user_id)
+        code = self._state.get_provider_code(user_id)
+        return AIProvider(code) if code else None
+
+    def request_sentiment_analysis(self, user_id: int) -> None:
+        """
+        Marca a próxima mensagem do usuário para análise de sentimento
+        """
+        self._state.set_flag(user_id, ANALYZING_SENTIMENT, True)
+
+    def consume_sentiment_request(self, user_id: int) -> bool:
+        """
+        Retorna se a mensagem atual deve ir para análise de sentimento, limpando a marcação
+        """
+        if not self._state.get_flag(user_id, ANALYZING_SENTIMENT):
+            return False
+        self._state.set_flag(user_id, ANALYZING_SENTIMENT, False)
+        return True
 
     def initialize_user(self, user_id: int) -> None:
         """
@@ -82,6 +95,30 @@ class AIManager:
         """
         self.enable_ai(user_id, AIProvider.DEEPSEEK)
 
+    def has_user(self, user_id: int) -> bool:
+        """
+        Verifica se o estado do usuário já está em memória
+        """
+        return user_id in self._state
+
+    def preload_user(self, user_id: int, state) -> None:
+        """
+        Coloca em memória o estado do usuário lido do disco (sem regravá-lo)
+        """
+        self._state.preload(user_id, state)
+
+    def retain_users(self, keep) -> int:
+        """
+        Esquece o estado em memória dos usuários para os quais `keep` retorna False
+        """
+        return self._state.retain(keep)
+
+    def state_stats(self) -> dict:
+        """
+        Retorna estatísticas do armazenamento de estado por usuário
+        """
+        return self._state.stats()
+
     def list_available_providers(self) -> list:
         """
         Retorna lista de providers disponíveis (exceto DUMMY)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class AsyncTTLCache:
+    """
+    Cache assíncrono com expiração (TTL) e deduplicação de cargas concorrentes
+    (single-flight): várias requisições pela mesma chave ausente compartilham
+    uma única chamada ao loader.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float = 0.0, name: str = "cache"):
+        self.ttl = ttl
+        # Por quanto tempo um erro do loader é reaproveitado antes de tentar de novo
+        self.negative_ttl = negative_ttl
+        self.name = name
+        self._entries: Dict[Hashable, Tuple[float, Any, Optional[BaseException]]] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Contadores de invalidação (global e por chave): uma carga só é guardada se nenhum mudou
+        self._epoch = 0
+        self._generations: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Retorna o valor em cache ou carrega-o com `loader`, compartilhando a carga em andamento.
+        A carga roda numa task própria: quem desiste (cancelamento) só deixa de esperar,
+        e os demais recebem o valor normalmente
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value, error = entry
+            if time.monotonic() < expires_at:
+                self.hits += 1
+                if error is not None:
+                    raise error
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._inflight[key] = asyncio.create_task(self._load(key, loader, self._generation(key)))
+            # Sem ninguém esperando, o erro da carga não gera o aviso "exception was never retrieved"
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    def _generation(self, key: Hashable) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(key, 0)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: Tuple[int, int]) -> Any:
+        # Uma carga iniciada antes de invalidate() entrega o valor a quem esperava, mas não o guarda
+        try:
+            self.loads += 1
+            value = await loader()
+        except Exception as e:
+            self.errors += 1
+            if self.negative_ttl > 0 and self._generation(key) == generation:
+                self._entries[key] = (time.monotonic() + self.negative_ttl, None, e)
+            raise
+        else:
+            if self._generation(key) == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value, None)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Remove uma chave (ou todas, se `key` for None) do cache; cargas em
+        andamento deixam de ser compartilhadas e seus resultados não são guardados
+        """
+        self.invalidations += 1
+        if key is None:
+            self._epoch += 1
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+        logger.info(f"Cache '{self.name}' invalidado ({key if key is not None else 'todas as chaves'})")
+
+    def stats(self) -> dict:
+        """
+        Retorna contadores de acerto/falha do cache
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "errors": self.errors,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
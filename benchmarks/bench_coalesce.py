@@ -0,0 +1,205 @@
+"""
+Benchmark do agrupamento de mensagens seguidas (coalescer.MessageCoalescer), offline.
+
+Cada usuário simulado escreve um pensamento em rajadas de `--burst`
+mensagens curtas (intervalos exponenciais com média `--gap` segundos),
+espera a resposta da última e pensa `--think` segundos antes da próxima
+rajada, por `--rounds` rodadas. Cada modo roda em um processo novo, com o
+bot real de bot.py apontado para os servidores falsos:
+
+- off: uma chamada à IA por mensagem (MESSAGE_COALESCE_WINDOW=0);
+- window: mensagens dentro da janela viram um só prompt;
+- cancel: sem janela, mas uma mensagem nova cancela a resposta em andamento;
+- window+cancel: os dois juntos.
+
+Relata chamadas às IAs por mensagem, tempo da última mensagem de cada
+rajada até a resposta (p50/p95), chamadas canceladas e requisições ao
+Telegram.
+
+Uso: python -m benchmarks.bench_coalesce [--modes off,window,cancel,window+cancel] [--window 0.8]
+     [--users 10] [--rounds 3] [--burst 3] [--gap 0.3] [--llm-latency 0.6] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.fake_servers import serve_in_process, stop_process
+from benchmarks.bench_end_to_end import configure_environment, fetch_server_stats, percentile, QUESTIONS
+
+MODES = {
+    "off": {"MESSAGE_COALESCE_WINDOW": "0", "CANCEL_SUPERSEDED_REQUESTS": "false"},
+    "window": {"CANCEL_SUPERSEDED_REQUESTS": "false"},
+    "cancel": {"MESSAGE_COALESCE_WINDOW": "0", "CANCEL_SUPERSEDED_REQUESTS": "true"},
+    "window+cancel": {"CANCEL_SUPERSEDED_REQUESTS": "true"}
+}
+
+def message_update(bot, update_id: int, user_id: int, text: str):
+    from telegram import Update
+
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"Usuário {user_id}"},
+        "text": text
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split(" ")[0])}]
+    return Update.de_json({"update_id": update_id, "message": message}, bot)
+
+async def measure_child(args) -> dict:
+    logging.disable(logging.WARNING)
+    import bot
+
+    application = bot.build_application()
+    answered: Dict[int, Optional[asyncio.Future]] = {}
+    respond_with_ai = bot.respond_with_ai
+
+    async def tracked(reply_to, user_id, message_text, batch=None):
+        await respond_with_ai(reply_to, user_id, message_text, batch)
+        waiter = answered.pop(reply_to.message_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+    # handle_message e respond_to_batch buscam a função pelo nome no módulo
+    bot.respond_with_ai = tracked
+    generator = random.Random(args.seed)
+    update_ids = iter(range(1, 10**9))
+    latencies: List[float] = []
+    messages = 0
+
+    async def send(user_id: int, text: str, wait: bool = False) -> None:
+        """
+        Envia a mensagem; com wait=True, espera a resposta a ela e registra a latência
+        """
+        update_id = next(update_ids)
+        waiter = answered[update_id] = asyncio.get_running_loop().create_future() if wait else None
+        sent_at = time.perf_counter()
+        await application.update_queue.put(message_update(application.bot, update_id, user_id, text))
+        if waiter is not None:
+            latencies.append(await asyncio.wait_for(waiter, args.timeout) - sent_at)
+
+    async def user_loop(user_id: int) -> None:
+        nonlocal messages
+        user_random = random.Random(generator.random())
+        for _ in range(args.rounds):
+            words = user_random.choice(QUESTIONS).split()
+            pieces = [" ".join(words[index::args.burst]) for index in range(args.burst)]
+            for index, piece in enumerate(pieces):
+                if index:
+                    await asyncio.sleep(user_random.expovariate(1 / args.gap))
+                messages += 1
+                await send(user_id, piece, wait=index == len(pieces) - 1)
+            await asyncio.sleep(user_random.expovariate(1 / args.think))
+
+    users = [100000 + index for index in range(args.users)]
+    async with application:
+        await bot.post_init(application)
+        await application.start()
+        try:
+            for user_id in users:
+                await send(user_id, "/start")
+            await asyncio.sleep(0.5)
+            started = time.perf_counter()
+            await asyncio.gather(*(user_loop(user_id) for user_id in users))
+            elapsed = time.perf_counter() - started
+            coalescer = bot.message_coalescer.stats()
+        finally:
+            await application.stop()
+            await bot.post_stop(application)
+            await bot.post_shutdown(application)
+    return {"messages": messages, "elapsed": elapsed, "latencies": latencies, "coalescer": coalescer}
+
+def run_mode(args, mode: str, urls: Dict[str, str]) -> dict:
+    before = asyncio.run(fetch_server_stats(urls))
+    with tempfile.TemporaryDirectory(prefix="bench-coalesce-") as data_dir:
+        configure_environment(urls, data_dir)
+        os.environ["MESSAGE_COALESCE_WINDOW"] = str(args.window)
+        os.environ.update(MODES[mode])
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_coalesce", "--child", *sys.argv[1:]],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+    if completed.returncode != 0:
+        raise Exception(f"Modo {mode} falhou:\n{completed.stderr.strip()}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    after = asyncio.run(fetch_server_stats(urls))
+
+    def delta(server: str, route: str) -> int:
+        return after[server]["by_route"].get(route, 0) - before[server]["by_route"].get(route, 0)
+
+    llm_calls = delta("deepseek", "stream") + delta("deepseek", "completions") + delta("eden", "generation")
+    latencies = result.pop("latencies")
+    return {
+        "mode": mode,
+        **result,
+        "llm_calls": llm_calls,
+        "calls_per_message": llm_calls / result["messages"] if result["messages"] else 0.0,
+        "telegram_requests": sum(after["telegram"]["by_route"].values()) - sum(before["telegram"]["by_route"].values()),
+        "latency": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95)}
+    }
+
+def print_report(args, results: List[dict]) -> None:
+    print(
+        f"{args.users} usuários, {args.rounds} rajadas de {args.burst} mensagens (intervalo médio "
+        f"{args.gap * 1000:.0f} ms), janela {args.window * 1000:.0f} ms, latência LLM {args.llm_latency * 1000:.0f} ms"
+    )
+    print(
+        f"{'modo':<14} {'msgs':>5} {'chamadas':>9} {'por msg':>8} {'canceladas':>11} "
+        f"{'resp p50':>9} {'resp p95':>9} {'telegram':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['mode']:<14} {result['messages']:>5} {result['llm_calls']:>9} "
+            f"{result['calls_per_message']:>8.2f} {result['coalescer']['cancelled']:>11} "
+            f"{result['latency']['p50']:>8.2f}s {result['latency']['p95']:>8.2f}s {result['telegram_requests']:>9}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="off,window,cancel,window+cancel", help="modos separados por vírgula")
+    parser.add_argument("--window", type=float, default=0.8, help="MESSAGE_COALESCE_WINDOW, em segundos")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--burst", type=int, default=3, help="mensagens por rajada")
+    parser.add_argument("--gap", type=float, default=0.3, help="intervalo médio entre mensagens da rajada")
+    parser.add_argument("--think", type=float, default=2.0, help="pausa média entre rajadas")
+    parser.add_argument("--llm-latency", type=float, default=0.6, help="mediana, em segundos")
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=120.0, help="espera máxima por uma resposta")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure_child(args))))
+        return
+
+    specs = {
+        "telegram": {"latency": {"median": args.telegram_latency, "sigma": 0.3}},
+        "deepseek": {"latency": {"median": args.llm_latency, "sigma": 0.3}},
+        "eden": {"latency": {"median": args.llm_latency, "sigma": 0.3}},
+        "notion": {"latency": {"median": 0.05, "sigma": 0.3}}
+    }
+    process, urls, conn = serve_in_process(specs)
+    try:
+        results = [run_mode(args, mode, urls) for mode in args.modes.split(",")]
+    finally:
+        stop_process(process, conn)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_report(args, results)
+
+if __name__ == "__main__":
+    main()
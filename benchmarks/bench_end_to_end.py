@@ -0,0 +1,389 @@
+"""
+Benchmark de ponta a ponta do bot, totalmente offline.
+
+Sobe servidores falsos do Telegram, DeepSeek, Eden AI e Notion em outro
+processo (benchmarks/fake_servers.py), aponta o bot para eles e injeta
+Updates sintéticos na fila da Application real, com os handlers de bot.py,
+a uma taxa fixa (chegadas de Poisson) espalhada entre N usuários.
+
+Relata updates/s, latência de ponta a ponta (p50/p95/p99) por tipo de
+update, lag do event loop, pico de RSS e erros registrados nos logs.
+Configurações do bot (limites de taxa, streaming etc.) vêm do ambiente,
+como em produção; bancos SQLite ficam em um diretório temporário.
+
+Uso: python -m benchmarks.bench_end_to_end [--users 50] [--rate 10] [--duration 30]
+     [--mix text=0.8,search=0.1,sentiment=0.05,save=0.05] [--llm-latency 0.8] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.fake_servers import serve_in_process, stop_process
+
+KINDS = ("text", "search", "sentiment", "save", "databases")
+
+QUESTIONS = (
+    "Quais tarefas estão atrasadas no projeto?",
+    "Resuma as reuniões da semana",
+    "Crie uma lista de ideias para o próximo evento",
+    "Quais contratos vencem este mês?",
+    "Me ajude a organizar minhas leituras",
+    "Como estão as metas financeiras do trimestre?"
+)
+
+SEARCH_TERMS = ("reuniões", "tarefas", "projetos", "clientes", "metas", "viagens")
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Percentil por posição mais próxima (0.0 para lista vazia)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo desconhecido em --mix: {kind} (use {', '.join(KINDS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+class ErrorCounter(logging.Handler):
+    """
+    Conta registros de log de nível ERROR ou acima, por logger
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.counts: Dict[str, int] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.counts[record.name] = self.counts.get(record.name, 0) + 1
+
+class LoopLagMonitor:
+    """
+    Mede o atraso do event loop: quanto um sleep de `interval` demora além do pedido
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+class LoadGenerator:
+    """
+    Monta Updates sintéticos e registra quando cada um entra na fila e termina
+    """
+
+    def __init__(self, application, users: int, mix: Dict[str, float], seed: int):
+        self.application = application
+        self.user_ids = [100000 + index for index in range(users)]
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.random = random.Random(seed)
+        self.update_id = 0
+        self.enqueued: Dict[int, float] = {}
+        self.kind_of: Dict[int, str] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.first_enqueued = None
+        self.last_done = None
+        self.measuring = False
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def _update(self, user_id: int, text: str):
+        from telegram import Update
+
+        self.update_id += 1
+        message = {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Usuário {user_id}"},
+            "text": text
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split(" ")[0])}]
+        return Update.de_json({"update_id": self.update_id, "message": message}, self.application.bot)
+
+    async def send(self, user_id: int, text: str, kind: str) -> None:
+        update = self._update(user_id, text)
+        now = time.perf_counter()
+        self.enqueued[update.update_id] = now
+        self.kind_of[update.update_id] = kind
+        if self.measuring and self.first_enqueued is None:
+            self.first_enqueued = now
+        self.pending += 1
+        self.idle.clear()
+        await self.application.update_queue.put(update)
+
+    async def on_done(self, update, context) -> None:
+        """
+        Handler do último grupo: roda depois que os handlers do bot terminaram
+        """
+        started = self.enqueued.pop(update.update_id, None)
+        kind = self.kind_of.pop(update.update_id, None)
+        if started is None:
+            return
+        now = time.perf_counter()
+        if kind is not None and self.measuring:
+            self.latencies.setdefault(kind, []).append(now - started)
+            self.last_done = now
+        self.pending -= 1
+        if self.pending == 0:
+            self.idle.set()
+
+    async def warm_up(self, eden_share: float) -> None:
+        """
+        Ativa a IA de cada usuário (/start); uma fração passa a usar a Eden
+        """
+        for user_id in self.user_ids:
+            await self.send(user_id, "/start", None)
+            if self.random.random() < eden_share:
+                await self.send(user_id, "/use_eden", None)
+        await self.idle.wait()
+
+    async def send_one(self, kind: str) -> None:
+        user_id = self.random.choice(self.user_ids)
+        if kind == "text":
+            await self.send(user_id, self.random.choice(QUESTIONS), kind)
+        elif kind == "search":
+            await self.send(user_id, f"/search {self.random.choice(SEARCH_TERMS)}", kind)
+        elif kind == "databases":
+            await self.send(user_id, "/databases", kind)
+        elif kind == "sentiment":
+            # Comando e mensagem analisada: os dois contam como updates do tipo
+            await self.send(user_id, "/analyze_sentiment", kind)
+            await self.send(user_id, self.random.choice(QUESTIONS), kind)
+        elif kind == "save":
+            await self.send(user_id, f"/save Nota {self.update_id}", kind)
+            await self.send(user_id, "Conteúdo da nota gerado pelo benchmark. " * 20, kind)
+
+    async def run(self, rate: float, duration: float) -> int:
+        """
+        Carga em malha aberta: chegadas de Poisson a `rate` por segundo, sem
+        esperar as respostas, durante `duration` segundos
+        """
+        self.measuring = True
+        deadline = time.perf_counter() + duration
+        next_at = time.perf_counter()
+        batches = 0
+        while True:
+            next_at += self.random.expovariate(rate)
+            if next_at >= deadline:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.send_one(self.random.choices(self.kinds, self.weights)[0])
+            batches += 1
+        return batches
+
+async def fetch_server_stats(urls: Dict[str, str]) -> Dict[str, dict]:
+    import aiohttp
+
+    stats = {}
+    async with aiohttp.ClientSession() as session:
+        for name, url in urls.items():
+            async with session.get(f"{url}/_stats") as response:
+                stats[name] = await response.json()
+    return stats
+
+async def run(args, urls: Dict[str, str]) -> dict:
+    if not args.verbose:
+        # Antes do import: os clientes registram logs INFO ao serem criados
+        logging.disable(logging.INFO)
+    # Importado só depois de configurar o ambiente para os servidores falsos
+    import bot
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+
+    application = bot.build_application()
+    generator = LoadGenerator(application, args.users, args.mix, args.seed)
+    application.add_handler(TypeHandler(Update, generator.on_done), group=99)
+    monitor = LoopLagMonitor()
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    async with application:
+        await bot.post_init(application)
+        await application.start()
+        try:
+            await generator.warm_up(args.eden_share)
+            monitor.start()
+            started = time.perf_counter()
+            sent = await generator.run(args.rate, args.duration)
+            try:
+                await asyncio.wait_for(generator.idle.wait(), timeout=args.drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+            elapsed = time.perf_counter() - started
+            await monitor.stop()
+        finally:
+            await application.stop()
+            await bot.post_stop(application)
+            await bot.post_shutdown(application)
+
+    completed = {kind: len(values) for kind, values in generator.latencies.items()}
+    all_latencies = [value for values in generator.latencies.values() for value in values]
+    window = (generator.last_done or 0) - (generator.first_enqueued or 0)
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "config": {
+            "users": args.users, "rate": args.rate, "duration": args.duration, "mix": args.mix,
+            "llm_latency": args.llm_latency, "llm_error_rate": args.llm_error_rate,
+            "notion_latency": args.notion_latency, "notion_error_rate": args.notion_error_rate,
+            "telegram_latency": args.telegram_latency, "seed": args.seed
+        },
+        "sent_batches": sent,
+        "completed": sum(completed.values()),
+        "unfinished": generator.pending,
+        "elapsed": elapsed,
+        "updates_per_second": sum(completed.values()) / window if window > 0 else 0.0,
+        "latency": {
+            kind: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": max(values)
+            }
+            for kind, values in sorted(generator.latencies.items()) + [("all", all_latencies)] if values
+        },
+        "loop_lag": {
+            "p50": percentile(monitor.samples, 50),
+            "p99": percentile(monitor.samples, 99),
+            "max": max(monitor.samples, default=0.0)
+        },
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit / 2**20,
+        "rss_before_load_mib": rss_before * rss_unit / 2**20,
+        "logged_errors": errors.counts,
+        "servers": await fetch_server_stats(urls)
+    }
+
+def print_report(report: dict) -> None:
+    config = report["config"]
+    print(
+        f"{config['users']} usuários, {config['rate']:.1f} updates/s por {config['duration']:.0f}s, "
+        f"latência LLM {config['llm_latency'] * 1000:.0f} ms, Notion {config['notion_latency'] * 1000:.0f} ms"
+    )
+    print(
+        f"Concluídos: {report['completed']} em {report['elapsed']:.1f}s "
+        f"({report['updates_per_second']:.2f} updates/s), pendentes: {report['unfinished']}"
+    )
+    print(f"{'tipo':<12} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for kind, data in report["latency"].items():
+        print(
+            f"{kind:<12} {data['count']:>6} {data['p50'] * 1000:>7.0f}ms {data['p95'] * 1000:>7.0f}ms "
+            f"{data['p99'] * 1000:>7.0f}ms {data['max'] * 1000:>7.0f}ms"
+        )
+    lag = report["loop_lag"]
+    print(f"Lag do event loop: p50 {lag['p50'] * 1000:.1f} ms, p99 {lag['p99'] * 1000:.1f} ms, máx {lag['max'] * 1000:.1f} ms")
+    print(f"RSS: {report['rss_before_load_mib']:.1f} MiB antes da carga, pico {report['peak_rss_mib']:.1f} MiB")
+    print(f"Erros nos logs: {report['logged_errors'] or 'nenhum'}")
+    for name, stats in report["servers"].items():
+        print(f"Servidor {name:<9} {stats['requests']:>6} requisições, {stats['errors']} erros simulados  {stats['by_route']}")
+
+def configure_environment(urls: Dict[str, str], data_dir: str) -> None:
+    os.environ.update({
+        "TELEGRAM_TOKEN": "123456:benchmark",
+        "TELEGRAM_API_URL": f"{urls['telegram']}/bot",
+        "DEEPSEEK_API_KEY": "benchmark",
+        "DEEPSEEK_API_URL": f"{urls['deepseek']}/v1/chat/completions",
+        "EDEN_AI_API_KEY": "benchmark",
+        "EDEN_AI_API_URL": f"{urls['eden']}/v2",
+        "NOTION_TOKEN": "benchmark",
+        "NOTION_API_URL": urls["notion"],
+        "NOTION_DATABASE_ID": "db0000",
+        "BOT_MODE": "polling",
+        "USER_SETTINGS_DB_PATH": os.path.join(data_dir, "user_settings.db"),
+        "NOTION_OUTBOX_PATH": os.path.join(data_dir, "notion_outbox.db"),
+        "NOTION_INDEX_PATH": os.path.join(data_dir, "notion_index.db"),
+        "RESPONSE_CACHE_PATH": os.path.join(data_dir, "response_cache.db")
+    })
+    # Métricas continuam sendo registradas; só o servidor HTTP fica desligado por padrão
+    os.environ.setdefault("METRICS_PORT", "0")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=10.0, help="updates (ou pares de updates) por segundo")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("text=0.8,search=0.1,sentiment=0.05,save=0.05"))
+    parser.add_argument("--eden-share", type=float, default=0.2, help="fração de usuários na Eden AI")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="mediana, em segundos")
+    parser.add_argument("--llm-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--notion-latency", type=float, default=0.15)
+    parser.add_argument("--notion-error-rate", type=float, default=0.0)
+    parser.add_argument("--notion-pages", type=int, default=200)
+    parser.add_argument("--notion-databases", type=int, default=20)
+    parser.add_argument("--telegram-latency", type=float, default=0.03)
+    parser.add_argument("--telegram-error-rate", type=float, default=0.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    parser.add_argument("--verbose", action="store_true", help="mantém os logs INFO do bot")
+    args = parser.parse_args()
+
+    llm = {"median": args.llm_latency, "sigma": args.llm_sigma, "error_rate": args.llm_error_rate}
+    specs = {
+        "telegram": {"latency": {"median": args.telegram_latency, "sigma": 0.3, "error_rate": args.telegram_error_rate}},
+        "deepseek": {"latency": llm},
+        "eden": {"latency": llm},
+        "notion": {
+            "latency": {"median": args.notion_latency, "sigma": 0.4, "error_rate": args.notion_error_rate, "error_status": 429},
+            "pages": args.notion_pages,
+            "databases": args.notion_databases
+        }
+    }
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    process, urls, conn = serve_in_process(specs)
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-e2e-") as data_dir:
+            configure_environment(urls, data_dir)
+            report = asyncio.run(run(args, urls))
+    finally:
+        stop_process(process, conn)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark do modo com shards (front + N workers), totalmente offline.
+
+Sobe os servidores falsos de benchmarks/fake_servers.py, o roteador do
+front (sharding.ShardRouter) neste processo e N workers reais (`bot.py`
+com SHARD_ROLE=worker) iniciados pelo WorkerSupervisor, falando por um
+socket Unix. Cada usuário simulado envia uma rajada de `--burst`
+mensagens, espera todas serem processadas e repete até o fim de
+`--duration` (malha fechada).
+
+Relata updates/s, latência (p50/p95/p99), distribuição por worker,
+updates retidos durante trocas de worker, perdidos e fora de ordem.
+Com --rebalance um worker é adicionado em 1/3 da duração e o worker-0 é
+removido em 2/3, com a carga rodando.
+
+Uso: python -m benchmarks.bench_sharding [--workers 1,2,4] [--users 20] [--burst 2]
+     [--duration 20] [--llm-latency 0.3] [--rebalance] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.fake_servers import serve_in_process, stop_process
+from benchmarks.bench_end_to_end import configure_environment, percentile, QUESTIONS
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"Usuário {user_id}"},
+        "text": text
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split(" ")[0])}]
+    return {"update_id": update_id, "message": message}
+
+class Tracker:
+    """
+    Envia updates pelo roteador e acompanha as confirmações dos workers
+    """
+
+    def __init__(self, seed: int):
+        self.router = None
+        self.random = random.Random(seed)
+        self.update_id = 0
+        self.sent_at: Dict[int, float] = {}
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.last_done: Dict[int, int] = {}
+        self.by_worker: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.order_violations = 0
+        self.measuring = False
+
+    def send(self, user_id: int, text: str) -> asyncio.Future:
+        self.update_id += 1
+        self.sent_at[self.update_id] = time.perf_counter()
+        waiter = self.waiters[self.update_id] = asyncio.get_running_loop().create_future()
+        self.router.route(user_id, message_update(self.update_id, user_id, text))
+        return waiter
+
+    def done(self, update_id: int, key: int, worker: str) -> None:
+        started = self.sent_at.pop(update_id, None)
+        if key in self.last_done and update_id < self.last_done[key]:
+            self.order_violations += 1
+        self.last_done[key] = max(update_id, self.last_done.get(key, 0))
+        if self.measuring and started is not None:
+            self.latencies.append(time.perf_counter() - started)
+            self.by_worker[worker] = self.by_worker.get(worker, 0) + 1
+        waiter = self.waiters.pop(update_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(worker)
+
+    async def user_loop(self, user_id: int, burst: int, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            waiters = [self.send(user_id, self.random.choice(QUESTIONS)) for _ in range(burst)]
+            await asyncio.gather(*waiters)
+
+async def wait_for(condition, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise Exception("Workers não ficaram prontos a tempo")
+        await asyncio.sleep(0.05)
+
+async def rebalance(supervisor, duration: float) -> List[str]:
+    events = []
+    await asyncio.sleep(duration / 3)
+    events.append(f"+{await supervisor.add()}")
+    await asyncio.sleep(duration / 3)
+    events.append(f"-{await supervisor.remove('worker-0')}")
+    return events
+
+async def run_configuration(args, workers: int, data_dir: str) -> dict:
+    from sharding import ShardRouter, WorkerSupervisor
+
+    socket_path = os.path.join(data_dir, "shards.sock")
+    tracker = Tracker(args.seed)
+    router = tracker.router = ShardRouter(socket_path, on_done=tracker.done)
+    await router.start()
+    supervisor = WorkerSupervisor(socket_path, metrics_port=0)
+    try:
+        for _ in range(workers):
+            await supervisor.add()
+        await wait_for(lambda: router.stats()["workers"] == workers and not router.paused, 120)
+
+        users = [100000 + index for index in range(args.users)]
+        # Ativa a IA de cada usuário antes de medir
+        await asyncio.gather(*(tracker.send(user_id, "/start") for user_id in users))
+
+        tracker.measuring = True
+        started = time.perf_counter()
+        deadline = started + args.duration
+        events = asyncio.create_task(rebalance(supervisor, args.duration)) if args.rebalance else None
+        await asyncio.gather(*(tracker.user_loop(user_id, args.burst, deadline) for user_id in users))
+        elapsed = time.perf_counter() - started
+        rebalance_events = await events if events is not None else []
+    finally:
+        await supervisor.stop()
+        await router.stop()
+
+    stats = router.stats()
+    return {
+        "workers": workers,
+        "completed": len(tracker.latencies),
+        "elapsed": elapsed,
+        "updates_per_second": len(tracker.latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency": {
+            "p50": percentile(tracker.latencies, 50),
+            "p95": percentile(tracker.latencies, 95),
+            "p99": percentile(tracker.latencies, 99)
+        },
+        "by_worker": dict(sorted(tracker.by_worker.items())),
+        "order_violations": tracker.order_violations,
+        "handoffs": stats["handoffs"],
+        "lost": stats["lost"],
+        "rebalances": stats["rebalances"],
+        "restarts": supervisor.restarts,
+        "events": rebalance_events
+    }
+
+def print_report(args, results: List[dict]) -> None:
+    print(
+        f"{args.users} usuários, rajadas de {args.burst}, {args.duration:.0f}s por configuração, "
+        f"latência LLM {args.llm_latency * 1000:.0f} ms"
+    )
+    print(f"{'workers':>7} {'updates/s':>10} {'p50':>8} {'p95':>8} {'p99':>8}  fora de ordem/retidos/perdidos")
+    for result in results:
+        latency = result["latency"]
+        print(
+            f"{result['workers']:>7} {result['updates_per_second']:>10.2f} {latency['p50'] * 1000:>6.0f}ms "
+            f"{latency['p95'] * 1000:>6.0f}ms {latency['p99'] * 1000:>6.0f}ms  "
+            f"{result['order_violations']}/{result['handoffs']}/{result['lost']}"
+        )
+        print(f"        por worker: {result['by_worker']} {' '.join(result['events'])}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="números de workers a comparar, separados por vírgula")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=2, help="mensagens por rajada de cada usuário")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="mediana, em segundos")
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--notion-latency", type=float, default=0.1)
+    parser.add_argument("--rebalance", action="store_true", help="adiciona e remove um worker durante a carga")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    parser.add_argument("--verbose", action="store_true", help="mantém os logs INFO dos workers")
+    args = parser.parse_args()
+
+    specs = {
+        "telegram": {"latency": {"median": args.telegram_latency, "sigma": 0.3}},
+        "deepseek": {"latency": {"median": args.llm_latency, "sigma": 0.3}},
+        "eden": {"latency": {"median": args.llm_latency, "sigma": 0.3}},
+        "notion": {"latency": {"median": args.notion_latency, "sigma": 0.3}}
+    }
+    process, urls, conn = serve_in_process(specs)
+    results = []
+    try:
+        for workers in (int(value) for value in args.workers.split(",")):
+            with tempfile.TemporaryDirectory(prefix="bench-shards-") as data_dir:
+                configure_environment(urls, data_dir)
+                os.environ["LOG_LEVEL"] = "INFO" if args.verbose else "WARNING"
+                results.append(asyncio.run(run_configuration(args, workers, data_dir)))
+    finally:
+        stop_process(process, conn)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_report(args, results)
+
+if __name__ == "__main__":
+    main()
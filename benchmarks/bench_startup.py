@@ -0,0 +1,161 @@
+"""
+Benchmark do tempo de inicialização do bot, totalmente offline.
+
+Cada rodada executa o bot em um processo novo (o custo dos imports só
+aparece em um interpretador limpo) apontado para os servidores falsos de
+benchmarks/fake_servers.py e mede:
+
+- import: `import bot` (módulos, configuração e criação dos clientes);
+- build: build_application();
+- ready: até application.start() retornar, ou seja, o bot recebendo updates
+  (inclui o getMe do Telegram e o post_init);
+- health: até as verificações de saúde em segundo plano terminarem;
+- spawn→ready: do início do processo filho (com o interpretador) até ficar pronto.
+
+--notion-latency simula um Notion lento e --notion-down aponta o bot para
+uma porta fechada: nenhum dos dois deve atrasar o "ready".
+
+Uso: python -m benchmarks.bench_startup [--runs 5] [--notion-latency 0.15] [--notion-down] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.fake_servers import serve_in_process, stop_process
+from benchmarks.bench_end_to_end import configure_environment, percentile
+
+PHASES = ("import", "build", "ready", "health", "spawn_to_ready")
+
+async def measure_child(started: float) -> dict:
+    # Sem logs INFO na saída: o processo pai lê o JSON do stdout
+    logging.disable(logging.INFO)
+    timings = {}
+    import_started = time.perf_counter()
+    import bot
+    timings["import"] = time.perf_counter() - import_started
+
+    build_started = time.perf_counter()
+    application = bot.build_application()
+    timings["build"] = time.perf_counter() - build_started
+
+    ready_started = time.perf_counter()
+    async with application:
+        await bot.post_init(application)
+        await application.start()
+        ready = time.perf_counter()
+        timings["ready"] = ready - ready_started
+        timings["spawn_to_ready"] = time.time() - started
+        if bot.health_task is not None:
+            await bot.health_task
+        timings["health"] = time.perf_counter() - ready_started
+        await application.stop()
+        await bot.post_shutdown(application)
+    return {"timings": timings, "health": bot.service_health}
+
+def run_child(started: float) -> None:
+    print(json.dumps(asyncio.run(measure_child(started))))
+
+def closed_port_url() -> str:
+    """
+    URL de uma porta local sem ninguém escutando (conexão recusada)
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+def run_rounds(args, urls: Dict[str, str]) -> List[dict]:
+    results = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="bench-startup-") as data_dir:
+            configure_environment(urls, data_dir)
+            if args.notion_down:
+                os.environ["NOTION_API_URL"] = closed_port_url()
+            started = time.time()
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--child", str(started)],
+                capture_output=True, text=True, env=os.environ.copy()
+            )
+        if completed.returncode != 0:
+            results.append({"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "falhou"})
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return results
+
+def summarize(results: List[dict]) -> dict:
+    ok = [result for result in results if "timings" in result]
+    phases = {}
+    for phase in PHASES:
+        values = sorted(result["timings"][phase] for result in ok)
+        if values:
+            phases[phase] = {"p50": percentile(values, 50), "max": values[-1]}
+    health = {}
+    for result in ok:
+        for service, data in result["health"].items():
+            entry = health.setdefault(service, {"ok": 0, "failed": 0, "errors": set()})
+            entry["ok" if data["ok"] else "failed"] += 1
+            if not data["ok"]:
+                entry["errors"].add(data["error"])
+    for entry in health.values():
+        entry["errors"] = sorted(entry["errors"])
+    return {
+        "runs": len(results),
+        "failed_runs": [result["error"] for result in results if "error" in result],
+        "phases": phases,
+        "health": health
+    }
+
+def print_report(args, report: dict) -> None:
+    notion = "fora do ar" if args.notion_down else f"latência {args.notion_latency * 1000:.0f} ms"
+    print(f"{report['runs']} inicializações, Notion {notion}")
+    print(f"{'fase':<16} {'p50':>9} {'max':>9}")
+    for phase, data in report["phases"].items():
+        print(f"{phase:<16} {data['p50'] * 1000:>7.0f}ms {data['max'] * 1000:>7.0f}ms")
+    for service, data in sorted(report["health"].items()):
+        errors = f" ({', '.join(data['errors'])})" if data["errors"] else ""
+        print(f"Saúde {service:<9} {data['ok']} ok, {data['failed']} indisponível{errors}")
+    for error in report["failed_runs"]:
+        print(f"Falha ao iniciar: {error}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--notion-latency", type=float, default=0.15, help="mediana, em segundos")
+    parser.add_argument("--notion-down", action="store_true", help="Notion recusa conexões")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="mediana, em segundos")
+    parser.add_argument("--telegram-latency", type=float, default=0.03)
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child)
+        return
+
+    specs = {
+        "telegram": {"latency": {"median": args.telegram_latency, "sigma": 0.3}},
+        "deepseek": {"latency": {"median": args.llm_latency, "sigma": 0.3}},
+        "eden": {"latency": {"median": args.llm_latency, "sigma": 0.3}},
+        "notion": {"latency": {"median": args.notion_latency, "sigma": 0.3}}
+    }
+    process, urls, conn = serve_in_process(specs)
+    try:
+        report = summarize(run_rounds(args, urls))
+    finally:
+        stop_process(process, conn)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(args, report)
+
+if __name__ == "__main__":
+    main()
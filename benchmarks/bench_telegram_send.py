@@ -0,0 +1,182 @@
+"""
+Benchmark da fila de saída da Bot API (send_queue.TelegramRateLimiter), offline.
+
+Sobe o Telegram falso de benchmarks/fake_servers.py com limites de flood
+(`--flood-global` mensagens/s no total e `--flood-chat` por chat, 429 com
+retry_after acima disso, 400 para textos com mais de 4096 caracteres) e
+dispara uma rajada: `--reply-chats` chats recebem respostas longas das IAs
+(`--reply-chars` caracteres) enquanto `--ack-chats` outros chats recebem
+confirmações curtas de comandos, espalhadas ao longo do primeiro segundo.
+
+Modos:
+- baseline: como o bot enviava antes, sem fila e sem dividir o texto;
+- chunked: respostas divididas com split_message, mas sem fila;
+- queue: ExtBot com TelegramRateLimiter e respostas divididas com split_message.
+
+Relata mensagens entregues por segundo, latência das confirmações e das
+respostas completas (p50/p95), 429 recebidos do servidor, falhas vistas
+pelo chamador e textos recusados por tamanho.
+
+Uso: python -m benchmarks.bench_telegram_send [--mode baseline,chunked,queue] [--reply-chats 40]
+     [--ack-chats 20] [--reply-chars 9000] [--flood-global 30] [--flood-chat 1] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from benchmarks.fake_servers import serve_in_process, stop_process
+from benchmarks.bench_end_to_end import configure_environment, percentile
+
+def long_answer(chars: int, seed: int) -> str:
+    """
+    Texto com parágrafos e frases de tamanhos variados, como uma resposta de IA
+    """
+    generator = random.Random(seed)
+    paragraphs = []
+    size = 0
+    while size < chars:
+        sentences = [
+            " ".join(f"palavra{generator.randint(0, 999)}" for _ in range(generator.randint(6, 20))) + "."
+            for _ in range(generator.randint(2, 6))
+        ]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:chars]
+
+async def fetch_telegram_stats(url: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/_stats") as response:
+            return await response.json()
+
+async def run_mode(args, mode: str, url: str) -> dict:
+    from telegram.ext import ExtBot
+    from telegram.request import HTTPXRequest
+    from send_queue import TelegramRateLimiter, send_priority, PRIORITY_ACK, PRIORITY_REPLY
+    from streaming import split_message
+
+    limiter = TelegramRateLimiter() if mode == "queue" else None
+    # Mesmo pool de conexões que o ApplicationBuilder usa no bot
+    bot = ExtBot(
+        os.environ["TELEGRAM_TOKEN"],
+        base_url=os.environ["TELEGRAM_API_URL"],
+        request=HTTPXRequest(connection_pool_size=256),
+        rate_limiter=limiter
+    )
+    before = await fetch_telegram_stats(url)
+    latencies: Dict[str, List[float]] = {"ack": [], "reply": []}
+    failures: Dict[str, int] = {}
+    delivered = 0
+
+    async def send(kind: str, chat_id: int, parts: List[str], priority: int, delay: float) -> None:
+        nonlocal delivered
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        try:
+            with send_priority(priority):
+                for part in parts:
+                    await bot.send_message(chat_id=chat_id, text=part)
+                    delivered += 1
+        except Exception as e:
+            failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+            return
+        latencies[kind].append(time.perf_counter() - started)
+
+    tasks = []
+    async with bot:
+        started = time.perf_counter()
+        for index in range(args.reply_chats):
+            text = long_answer(args.reply_chars, args.seed + index)
+            parts = [text] if mode == "baseline" else split_message(text)
+            tasks.append(send("reply", 200000 + index, parts, PRIORITY_REPLY, 0.0))
+        for index in range(args.ack_chats):
+            delay = index / max(1, args.ack_chats)
+            tasks.append(send("ack", 300000 + index, ["✅ Comando recebido"], PRIORITY_ACK, delay))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    after = await fetch_telegram_stats(url)
+
+    return {
+        "mode": mode,
+        "elapsed": elapsed,
+        "delivered": delivered,
+        "messages_per_second": delivered / elapsed if elapsed > 0 else 0.0,
+        "latency": {
+            kind: {"p50": percentile(values, 50), "p95": percentile(values, 95), "completed": len(values)}
+            for kind, values in latencies.items()
+        },
+        "failures": failures,
+        "server_429": after["flooded"] - before["flooded"],
+        "server_too_long": after["too_long"] - before["too_long"],
+        "queue": limiter.stats() if limiter is not None else {}
+    }
+
+def print_report(args, results: List[dict]) -> None:
+    print(
+        f"{args.reply_chats} chats com respostas de {args.reply_chars} caracteres, {args.ack_chats} chats com "
+        f"confirmações; limites do servidor {args.flood_global:g}/s global, {args.flood_chat:g}/s por chat"
+    )
+    print(
+        f"{'modo':<9} {'msgs/s':>7} {'ack p50':>8} {'ack p95':>8} {'resp p50':>9} {'resp p95':>9}"
+        f" {'429':>5} {'falhas':>7} {'longos':>7}"
+    )
+    for result in results:
+        ack = result["latency"]["ack"]
+        reply = result["latency"]["reply"]
+        print(
+            f"{result['mode']:<9} {result['messages_per_second']:>7.1f} {ack['p50'] * 1000:>6.0f}ms "
+            f"{ack['p95'] * 1000:>6.0f}ms {reply['p50']:>8.2f}s {reply['p95']:>8.2f}s "
+            f"{result['server_429']:>5} {sum(result['failures'].values()):>7} {result['server_too_long']:>7}"
+        )
+        if result["failures"]:
+            print(f"          falhas: {result['failures']}")
+        if result["queue"]:
+            print(f"          fila: {result['queue']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="baseline,chunked,queue", help="modos a comparar, separados por vírgula")
+    parser.add_argument("--reply-chats", type=int, default=40)
+    parser.add_argument("--ack-chats", type=int, default=20)
+    parser.add_argument("--reply-chars", type=int, default=9000, help="tamanho das respostas longas")
+    parser.add_argument("--flood-global", type=float, default=30, help="mensagens/s aceitas pelo servidor")
+    parser.add_argument("--flood-chat", type=float, default=1, help="mensagens/s aceitas por chat")
+    parser.add_argument("--telegram-latency", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    specs = {
+        "telegram": {
+            "latency": {"median": args.telegram_latency, "sigma": 0.3},
+            "flood_global": args.flood_global,
+            "flood_chat": args.flood_chat
+        },
+        "deepseek": {},
+        "eden": {},
+        "notion": {}
+    }
+    process, urls, conn = serve_in_process(specs)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-send-") as data_dir:
+            configure_environment(urls, data_dir)
+            for mode in args.mode.split(","):
+                results.append(asyncio.run(run_mode(args, mode, urls["telegram"])))
+    finally:
+        stop_process(process, conn)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_report(args, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark de memória do estado por usuário.
+
+Compara o layout antigo (set de usuários ativos + dict de AIProvider) com o
+UserStateStore compactado para 1 milhão de usuários.
+
+Uso: python -m benchmarks.bench_user_state [--users 1000000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from ai_manager import AIManager, AIProvider
+from user_state import UserStateStore
+
+def measure(label: str, build) -> None:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    holder = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / 2**20:8.1f} MiB  (pico {peak / 2**20:8.1f} MiB)  {elapsed:6.2f}s")
+    del holder
+
+def build_legacy(users: int):
+    enabled = set()
+    providers = {}
+    sentiment = {}
+    for user_id in range(users):
+        enabled.add(user_id)
+        providers[user_id] = AIProvider.DEEPSEEK if user_id % 2 else AIProvider.EDEN
+        sentiment[user_id] = False
+    return enabled, providers, sentiment
+
+def build_store(users: int):
+    manager = AIManager(UserStateStore(max_users=users, idle_ttl=float("inf")))
+    for user_id in range(users):
+        manager.switch_provider(user_id, AIProvider.DEEPSEEK if user_id % 2 else AIProvider.EDEN)
+    return manager
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Usuários: {args.users:,}")
+    measure("dict/set (layout antigo)", lambda: build_legacy(args.users))
+    measure("UserStateStore", lambda: build_store(args.users))
+
+if __name__ == "__main__":
+    main()
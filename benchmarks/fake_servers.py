@@ -0,0 +1,511 @@
+"""
+Servidores falsos (aiohttp) para os benchmarks: Telegram Bot API, DeepSeek,
+Eden AI e Notion, com latência log-normal e taxa de erros configuráveis.
+
+Cada servidor expõe GET /_stats com a contagem de requisições por rota.
+`serve_in_process` sobe todos em um processo separado, para que o custo
+dos servidores não entre nas medidas de CPU, memória e lag do bot.
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, Optional, Tuple
+
+from aiohttp import web
+
+BLOCK_TYPES = ("paragraph", "heading_2", "bulleted_list_item", "numbered_list_item", "to_do", "toggle", "quote")
+
+TOPICS = (
+    "Reuniões", "Tarefas", "Projetos", "Clientes", "Ideias", "Leituras", "Viagens",
+    "Finanças", "Contratos", "Metas", "Receitas", "Estudos", "Eventos", "Fornecedores"
+)
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+class Latency:
+    """
+    Latência log-normal em torno da mediana (`sigma` 0 = latência fixa) e
+    fração de requisições que falham com `error_status`
+    """
+
+    def __init__(self, median: float = 0.05, sigma: float = 0.5, error_rate: float = 0.0, error_status: int = 503):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(random.gauss(0.0, self.sigma)) if self.sigma else self.median
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "Latency":
+        return cls(**(data or {}))
+
+class FakeServer:
+    """
+    Base dos servidores falsos: contadores por rota e o endpoint /_stats
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.requests = 0
+        self.errors = 0
+        self.by_route: Dict[str, int] = {}
+
+    async def begin(self, route: str) -> bool:
+        """
+        Conta a requisição, aplica a latência e diz se ela deve falhar
+        """
+        self.requests += 1
+        self.by_route[route] = self.by_route.get(route, 0) + 1
+        await asyncio.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.errors += 1
+            return True
+        return False
+
+    def error_response(self) -> web.Response:
+        return web.json_response(
+            {"error": {"message": "Erro simulado"}},
+            status=self.latency.error_status
+        )
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "by_route": dict(self.by_route)}
+
+    async def stats_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def routes(self, app: web.Application) -> None:
+        raise NotImplementedError
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=8 * 2**20)
+        app.router.add_get("/_stats", self.stats_handler)
+        self.routes(app)
+        return app
+
+class FakeDeepSeek(FakeServer):
+    """
+    POST /v1/chat/completions, com ou sem streaming (SSE)
+    """
+
+    def __init__(self, latency: Latency, answer_words: int = 120, stream_chunks: int = 20):
+        super().__init__(latency)
+        self.answer = " ".join(f"palavra{i}" for i in range(answer_words))
+        self.stream_chunks = stream_chunks
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        if not payload.get("stream"):
+            if await self.begin("completions"):
+                return self.error_response()
+            return web.json_response({
+                "id": "bench",
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.answer}, "finish_reason": "stop"}]
+            })
+
+        # Streaming: o primeiro chunk sai após ~30% da latência e o resto é espalhado
+        self.requests += 1
+        self.by_route["stream"] = self.by_route.get("stream", 0) + 1
+        total = self.latency.sample()
+        await asyncio.sleep(total * 0.3)
+        if self.latency.fails():
+            self.errors += 1
+            return self.error_response()
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        words = self.answer.split(" ")
+        size = max(1, math.ceil(len(words) / self.stream_chunks))
+        pause = total * 0.7 / self.stream_chunks
+        try:
+            await response.prepare(request)
+            for start in range(0, len(words), size):
+                delta = " ".join(words[start:start + size]) + " "
+                chunk = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(pause)
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # Cliente desistiu no meio do stream (ex.: resposta cancelada pelo bot)
+            self.by_route["stream_aborted"] = self.by_route.get("stream_aborted", 0) + 1
+        return response
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_post("/v1/chat/completions", self.completions)
+
+class FakeEden(FakeServer):
+    """
+    POST /v2/text/generation e /v2/text/sentiment_analysis
+    """
+
+    async def generation(self, request: web.Request) -> web.Response:
+        await request.json()
+        if await self.begin("generation"):
+            return self.error_response()
+        return web.json_response({"openai": {"generated_text": "Resposta simulada da Eden AI.", "status": "success"}})
+
+    async def sentiment(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if await self.begin("sentiment"):
+            return self.error_response()
+        return web.json_response({
+            provider: {"general": "Positive", "general_score": 0.87, "status": "success"}
+            for provider in payload.get("providers", "").split(",") if provider
+        })
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_post("/v2/text/generation", self.generation)
+        app.router.add_post("/v2/text/sentiment_analysis", self.sentiment)
+
+class FakeNotion(FakeServer):
+    """
+    Workspace sintético com os endpoints usados por NotionManager: usuário,
+    busca paginada, páginas (leitura e criação) e árvores de blocos
+    """
+
+    def __init__(self, latency: Latency, databases: int = 20, pages: int = 200, depth: int = 2, fanout: int = 5):
+        super().__init__(latency)
+        self.depth = depth
+        self.fanout = fanout
+        self.edits = 0
+        now = datetime.now(timezone.utc)
+        self.databases = [
+            {
+                "object": "database",
+                "id": f"db{index:04d}",
+                "title": [{"plain_text": f"{TOPICS[index % len(TOPICS)]} {index}"}],
+                "description": [{"plain_text": f"Banco de {TOPICS[index % len(TOPICS)].lower()} da equipe"}],
+                "url": f"https://notion.so/db{index:04d}"
+            }
+            for index in range(databases)
+        ]
+        self.pages: Dict[str, dict] = {}
+        for index in range(pages):
+            self._add_page(
+                f"page{index:05d}",
+                f"{TOPICS[index % len(TOPICS)]} semana {index}",
+                f"db{index % max(1, databases):04d}",
+                now - timedelta(minutes=index)
+            )
+
+    def _add_page(self, page_id: str, title: str, database_id: str, edited: datetime) -> dict:
+        page = {
+            "object": "page",
+            "id": page_id,
+            "url": f"https://notion.so/{page_id}",
+            "last_edited_time": _iso(edited),
+            "parent": {"type": "database_id", "database_id": database_id},
+            "properties": {"Name": {"id": "title", "type": "title", "title": [{"plain_text": title}]}}
+        }
+        self.pages[page_id] = page
+        return page
+
+    def touch(self, page_id: str) -> None:
+        """
+        Marca a página como editada agora (invalida caches por last_edited_time)
+        """
+        # Segundos a mais por edição: duas edições seguidas nunca têm o mesmo horário
+        self.edits += 1
+        page = self.pages.get(page_id) or self._add_page(page_id, page_id, "db0000", datetime.now(timezone.utc))
+        page["last_edited_time"] = _iso(datetime.now(timezone.utc) + timedelta(seconds=self.edits))
+
+    def error_response(self) -> web.Response:
+        status = self.latency.error_status
+        headers = {"Retry-After": "1"} if status == 429 else None
+        return web.json_response(
+            {"object": "error", "status": status, "code": "rate_limited" if status == 429 else "service_unavailable",
+             "message": "Erro simulado"},
+            status=status,
+            headers=headers
+        )
+
+    def _children(self, block_id: str) -> list:
+        level = block_id.count("-")
+        if level >= self.depth:
+            return []
+        blocks = []
+        for index in range(self.fanout):
+            child_id = f"{block_id}-{index}"
+            block_type = BLOCK_TYPES[(level + index) % len(BLOCK_TYPES)]
+            blocks.append({
+                "object": "block",
+                "id": child_id,
+                "type": block_type,
+                "has_children": level + 1 < self.depth,
+                block_type: {
+                    "rich_text": [{"plain_text": f"Bloco {child_id} " + "texto " * 10}],
+                    "checked": index % 2 == 0
+                }
+            })
+        return blocks
+
+    @staticmethod
+    def _listing(items: list, start: int, page_size: int) -> dict:
+        end = start + page_size
+        return {
+            "object": "list",
+            "results": items[start:end],
+            "has_more": end < len(items),
+            "next_cursor": str(end) if end < len(items) else None
+        }
+
+    async def users_me(self, request: web.Request) -> web.Response:
+        if await self.begin("users_me"):
+            return self.error_response()
+        return web.json_response({"object": "user", "id": "bench-bot", "type": "bot", "name": "Benchmark"})
+
+    async def search(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if await self.begin("search"):
+            return self.error_response()
+        if payload.get("filter", {}).get("value") == "database":
+            items = self.databases
+        else:
+            items = sorted(self.pages.values(), key=lambda page: page["last_edited_time"], reverse=True)
+        query = (payload.get("query") or "").lower()
+        if query:
+            items = [
+                item for item in items
+                if query in "".join(
+                    t["plain_text"] for t in item.get("title") or item["properties"]["Name"]["title"]
+                ).lower()
+            ]
+        return web.json_response(self._listing(
+            items, int(payload.get("start_cursor") or 0), min(100, int(payload.get("page_size", 100)))
+        ))
+
+    async def page(self, request: web.Request) -> web.Response:
+        if await self.begin("pages_retrieve"):
+            return self.error_response()
+        page_id = request.match_info["page_id"]
+        page = self.pages.get(page_id) or self._add_page(page_id, page_id, "db0000", datetime(2024, 1, 1, tzinfo=timezone.utc))
+        return web.json_response(page)
+
+    async def create_page(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if await self.begin("pages_create"):
+            return self.error_response()
+        title = payload.get("properties", {}).get("Name", {}).get("title") or [{"text": {"content": "Sem título"}}]
+        page = self._add_page(
+            f"page{len(self.pages):05d}",
+            title[0].get("text", {}).get("content", "Sem título"),
+            payload.get("parent", {}).get("database_id", "db0000"),
+            datetime.now(timezone.utc)
+        )
+        return web.json_response(page)
+
+    async def block_children(self, request: web.Request) -> web.Response:
+        if await self.begin("blocks_children"):
+            return self.error_response()
+        blocks = self._children(request.match_info["block_id"])
+        return web.json_response(self._listing(
+            blocks, int(request.query.get("start_cursor", 0)), min(100, int(request.query.get("page_size", 100)))
+        ))
+
+    async def append_children(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if await self.begin("blocks_append"):
+            return self.error_response()
+        return web.json_response({"object": "list", "results": payload.get("children", []), "has_more": False})
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_get("/v1/users/me", self.users_me)
+        app.router.add_post("/v1/search", self.search)
+        app.router.add_get("/v1/pages/{page_id}", self.page)
+        app.router.add_post("/v1/pages", self.create_page)
+        app.router.add_get("/v1/blocks/{block_id}/children", self.block_children)
+        app.router.add_patch("/v1/blocks/{block_id}/children", self.append_children)
+
+class FakeTelegram(FakeServer):
+    """
+    Bot API em /bot<token>/<método>: getMe, sendMessage, editMessageText e
+    respostas genéricas para os demais métodos.
+
+    Com `flood_global`/`flood_chat` (mensagens por segundo, 0 desliga) os
+    envios acima do limite numa janela de 1 s recebem 429 com retry_after,
+    como o Telegram faz; textos acima de `max_text` caracteres recebem 400.
+    """
+
+    def __init__(self, latency: Latency, flood_global: float = 0, flood_chat: float = 0, max_text: int = 4096):
+        super().__init__(latency)
+        self.message_id = 0
+        self.flood_global = flood_global
+        self.flood_chat = flood_chat
+        self.max_text = max_text
+        self._sent: Deque[float] = deque()
+        self._sent_by_chat: Dict[str, Deque[float]] = {}
+        self.flooded = 0
+        self.too_long = 0
+
+    def _flood_wait(self, chat_id: str) -> float:
+        """
+        Registra um envio e devolve quantos segundos o chamador deveria ter
+        esperado (0 se está dentro dos limites)
+        """
+        now = time.monotonic()
+        windows = []
+        if self.flood_global:
+            windows.append((self._sent, self.flood_global))
+        if self.flood_chat:
+            windows.append((self._sent_by_chat.setdefault(chat_id, deque()), self.flood_chat))
+        wait = 0.0
+        for window, limit in windows:
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+            if len(window) >= limit:
+                wait = max(wait, 1.0 - (now - window[0]))
+        if wait > 0:
+            return wait
+        for window, _ in windows:
+            window.append(now)
+        return 0.0
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["flooded"] = self.flooded
+        stats["too_long"] = self.too_long
+        return stats
+
+    def error_response(self) -> web.Response:
+        status = self.latency.error_status
+        body = {"ok": False, "error_code": status, "description": "Erro simulado"}
+        if status == 429:
+            body["description"] = "Too Many Requests: retry after 1"
+            body["parameters"] = {"retry_after": 1}
+        return web.json_response(body, status=status)
+
+    def _message(self, params: dict, message_id: Optional[int] = None) -> dict:
+        if message_id is None:
+            self.message_id += 1
+            message_id = self.message_id
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Benchmark"},
+            "text": params.get("text", "")
+        }
+
+    async def method(self, request: web.Request) -> web.Response:
+        name = request.match_info["method"]
+        # O python-telegram-bot envia os parâmetros como formulário; valores não-texto vêm em JSON
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if await self.begin(name):
+            return self.error_response()
+
+        if name in ("sendMessage", "editMessageText"):
+            if len(params.get("text", "")) > self.max_text:
+                self.too_long += 1
+                return web.json_response(
+                    {"ok": False, "error_code": 400, "description": "Bad Request: message is too long"},
+                    status=400
+                )
+            wait = self._flood_wait(str(params.get("chat_id", "")))
+            if wait > 0:
+                self.flooded += 1
+                retry_after = max(1, math.ceil(wait))
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after}
+                }, status=429)
+
+        if name == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+        elif name in ("sendMessage", "sendDocument"):
+            result = self._message(params)
+        elif name == "editMessageText":
+            result = self._message(params, int(params.get("message_id", 0)))
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_post("/bot{token}/{method}", self.method)
+
+SERVERS = {
+    "telegram": FakeTelegram,
+    "deepseek": FakeDeepSeek,
+    "eden": FakeEden,
+    "notion": FakeNotion
+}
+
+async def start_server(server: FakeServer, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """
+    Sobe o servidor (porta 0 = porta livre) e retorna o runner e a URL base
+    """
+    runner = web.AppRunner(server.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
+
+async def _serve(specs: Dict[str, dict], conn) -> None:
+    runners = []
+    urls = {}
+    for name, options in specs.items():
+        options = dict(options)
+        latency = Latency.from_dict(options.pop("latency", None))
+        runner, url = await start_server(SERVERS[name](latency, **options))
+        runners.append(runner)
+        urls[name] = url
+    conn.send(urls)
+    try:
+        # Roda até o processo pai encerrar a conexão
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+    except EOFError:
+        pass
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+def _serve_forever(specs: Dict[str, dict], conn) -> None:
+    asyncio.run(_serve(specs, conn))
+
+def serve_in_process(specs: Dict[str, dict]) -> Tuple[multiprocessing.Process, Dict[str, str], object]:
+    """
+    Sobe os servidores descritos em `specs` ({nome: {"latency": {...}, ...}})
+    em outro processo. Retorna o processo, as URLs base e a conexão; enviar
+    qualquer coisa pela conexão (ou fechá-la) encerra os servidores.
+    """
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_serve_forever, args=(specs, child_conn), daemon=True)
+    process.start()
+    child_conn.close()
+    if not parent_conn.poll(30):
+        process.terminate()
+        raise Exception("Servidores falsos não iniciaram a tempo")
+    return process, parent_conn.recv(), parent_conn
+
+def stop_process(process: multiprocessing.Process, conn) -> None:
+    """
+    Encerra os servidores iniciados por serve_in_process
+    """
+    try:
+        conn.send("stop")
+    except (BrokenPipeError, OSError):
+        pass
+    process.join(10)
+    if process.is_alive():
+        process.terminate()
@@ -1,29 +1,281 @@
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
-
-from config import TELEGRAM_TOKEN, WELCOME_MESSAGE, HELP_MESSAGE, ERROR_MESSAGE
+import signal
+import time
+from datetime import datetime
+from typing import Optional
+from telegram import Message, Update
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, CallbackContext
+
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_API_URL, WELCOME_MESSAGE, HELP_MESSAGE, ERROR_MESSAGE, DEEPSEEK_STREAMING,
+    NOTION_CONTEXT_TTL, NOTION_CONTEXT_ERROR_TTL, NOTION_RATE_LIMIT, USER_SETTINGS_DB_PATH,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, BUSY_MESSAGE, UNAVAILABLE_MESSAGE,
+    DEEPSEEK_MAX_CONCURRENCY, DEEPSEEK_RATE_LIMIT, EDEN_MAX_CONCURRENCY, EDEN_RATE_LIMIT,
+    PROVIDER_ROUTING, NOTION_SEARCH_LIMIT, SENTIMENT_MODE, SENTIMENT_PROVIDERS,
+    PROMPT_CONTEXT_TOP_K, ADMIN_USER_IDS, PROFILER_MAX_DURATION, HEALTH_CHECK_TIMEOUT,
+    LOG_LEVEL, SHARD_ROLE, SHARD_WORKER_NAME, TELEGRAM_CONCURRENT_UPDATES
+)
 from deepseek_client import DeepSeekClient
 from eden_client import EdenAIClient
 from notion_manager import NotionManager
+from notion_outbox import NotionOutbox
+from notion_index import NotionIndex
+from rate_limiter import TokenBucket
 from ai_manager import AIManager, AIProvider
+from streaming import reply_streaming, reply_long, TELEGRAM_MESSAGE_LIMIT
+from send_queue import TelegramRateLimiter, send_priority, PRIORITY_BACKGROUND
+from update_processor import UserOrderedUpdateProcessor
+from async_cache import AsyncTTLCache
+from user_state import UserStateStore
+from user_settings import UserSettingsStore
+from response_cache import build_response_cache
+from webhook_server import WebhookServer
+from scheduler import ProviderScheduler, SchedulerBusyError
+from provider_router import HedgedRouter, ProvidersUnavailableError
+from conversation_memory import ConversationMemory
+from sentiment import SentimentAnalyzer
+from context_builder import ContextBuilder
+from metrics import MetricsServer, registry, instrument_handler, export_stats, summary, LOOP_LAG
+from tracing import span, start_trace, traced, LoopLagMonitor
+from profiling import RuntimeProfiler
+from sharding import ShardWorker, build_front_application
+from coalescer import MessageCoalescer, MessageBatch
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+def configure_logging() -> None:
+    """Configura o logging do processo (só quando o bot é executado, não ao importar)."""
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=LOG_LEVEL
+    )
+
+# Listagens longas são enviadas em partes, com folga para o limite do Telegram
+LISTING_FLUSH_CHARS = TELEGRAM_MESSAGE_LIMIT - 96
+
 # Initialize clients and managers
 deepseek_client = DeepSeekClient()
 eden_client = EdenAIClient()
 notion_client = NotionManager()
-ai_manager = AIManager()
+# Fila persistente de /save, enviada ao Notion respeitando o limite de taxa
+# Limite de taxa do Notion compartilhado pelo que roda em segundo plano (fila de /save e índice)
+notion_rate_limit = TokenBucket(NOTION_RATE_LIMIT)
+notion_outbox = NotionOutbox(notion_client, bucket=notion_rate_limit)
+# Índice local (FTS5) usado pelo /search, sincronizado em segundo plano
+notion_index = NotionIndex(notion_client, bucket=notion_rate_limit)
+notion_client.index = notion_index
+user_settings = UserSettingsStore(USER_SETTINGS_DB_PATH)
+ai_manager = AIManager(UserStateStore(
+    loader=user_settings.load_state,
+    on_write=user_settings.save_state
+))
+
+# Cache for context (compartilhado por todo o workspace)
+notion_context = AsyncTTLCache(
+    ttl=NOTION_CONTEXT_TTL,
+    negative_ttl=NOTION_CONTEXT_ERROR_TTL,
+    name="notion_context"
+)
+
+# Contexto compacto por mensagem (top-k sob orçamento de tokens)
+context_builder = ContextBuilder()
+
+# Cache opcional de respostas das IAs (RESPONSE_CACHE_BACKEND)
+response_cache = build_response_cache()
+
+# Concorrência, taxa e filas por provider, com revezamento justo entre usuários
+provider_schedulers = {
+    AIProvider.DEEPSEEK: ProviderScheduler("deepseek", DEEPSEEK_MAX_CONCURRENCY, DEEPSEEK_RATE_LIMIT),
+    AIProvider.EDEN: ProviderScheduler("eden", EDEN_MAX_CONCURRENCY, EDEN_RATE_LIMIT)
+}
+
+# Análise de sentimento com cache, micro-lotes e timeout (pelo agendador da Eden)
+sentiment_analyzer = SentimentAnalyzer(eden_client, provider_schedulers[AIProvider.EDEN])
+
+# Histórico de conversa por usuário, limitado por orçamento de tokens
+conversation_memory = ConversationMemory()
+
+# Roteamento opcional com hedging e circuit breaker entre os providers
+provider_router = (
+    HedgedRouter(ai_manager.list_available_providers(), ignore_errors=(SchedulerBusyError,))
+    if PROVIDER_ROUTING == "hedged" else None
+)
 
-# Cache for context
-notion_context = {}
-analyzing_sentiment = {}  # Dicionário para controlar análise de sentimento
+# Endpoint /metrics (Prometheus) em uma porta local
+metrics_server = MetricsServer()
+
+# Atraso do event loop, com a pilha do código que o bloqueia
+loop_monitor = LoopLagMonitor(on_lag=lambda lag: LOOP_LAG.observe((), lag))
+
+# Fila de saída da Bot API: ritmo global e por chat, RetryAfter e prioridades
+telegram_rate_limiter = TelegramRateLimiter()
+# Usuários diferentes em paralelo: esperar o ritmo de envio de um chat não segura os outros
+update_processor = UserOrderedUpdateProcessor(max(1, TELEGRAM_CONCURRENT_UPDATES))
+
+# Mensagens seguidas do mesmo usuário respondidas juntas (MESSAGE_COALESCE_WINDOW)
+message_coalescer = MessageCoalescer(lambda batch: respond_to_batch(batch))
+
+# Profiler de CPU e memória ligado pelo /profile
+runtime_profiler = RuntimeProfiler()
+
+# Resultado das verificações de saúde dos serviços externos, feitas em segundo plano
+service_health = {}
+health_task = None
+
+# Worker do modo com shards (SHARD_ROLE=worker)
+shard_worker = None
+
+def component_stats() -> dict:
+    """Estatísticas atuais dos componentes compartilhados, por nome."""
+    stats = {
+        f"scheduler_{provider.name.lower()}": scheduler.stats()
+        for provider, scheduler in provider_schedulers.items()
+    }
+    stats.update({
+        "notion_context": notion_context.stats(),
+        "response_cache": response_cache.stats(),
+        "sentiment": sentiment_analyzer.stats(),
+        "prompt_context": context_builder.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "notion_outbox": notion_outbox.stats(),
+        "notion_index": notion_index.stats(),
+        "notion_pages": notion_client.page_cache_stats(),
+        "user_settings": user_settings.stats(),
+        "user_state": ai_manager.state_stats(),
+        "http_deepseek": deepseek_client.pool_stats(),
+        "http_eden": eden_client.pool_stats(),
+        "event_loop": loop_monitor.stats(),
+        "telegram_send": telegram_rate_limiter.stats(),
+        "updates": update_processor.stats(),
+        "coalescer": message_coalescer.stats()
+    })
+    if shard_worker is not None:
+        stats["shard_worker"] = shard_worker.stats()
+    for service, health in service_health.items():
+        stats[f"health_{service}"] = {key: value for key, value in health.items() if key != "error"}
+    return stats
+
+def collect_component_stats() -> None:
+    """Publica as estatísticas dos componentes como gauges no momento da leitura."""
+    for component, stats in component_stats().items():
+        export_stats(component, stats)
+
+registry.add_collector(collect_component_stats)
+
+async def load_notion_context() -> dict:
+    """Busca no Notion o contexto do workspace usado nos prompts."""
+    databases = await notion_client.list_databases()
+    return {
+        "databases": databases
+    }
+
+async def get_notion_context() -> dict:
+    """Retorna o contexto do workspace, compartilhando a busca entre usuários."""
+    try:
+        return await notion_context.get("workspace", load_notion_context)
+    except Exception as e:
+        logger.warning(f"Could not fetch Notion context: {str(e)}")
+        return {}
+
+async def build_prompt_context(message_text: str) -> str:
+    """Monta o contexto compacto do prompt com os bancos e páginas mais relevantes."""
+    workspace = await get_notion_context()
+    pages = None
+    if notion_index.enabled and notion_index.ready:
+        pages = await notion_index.search(message_text, PROMPT_CONTEXT_TOP_K)
+    return context_builder.build(workspace, message_text, pages)
+
+async def request_ai_response(provider: AIProvider, message_text: str, workspace_context: str, history: list = None) -> str:
+    """Obtém a resposta completa do provider selecionado."""
+    if provider == AIProvider.DEEPSEEK:
+        return await deepseek_client.get_response(
+            message_text,
+            context=workspace_context,
+            history=history
+        )
+    # AIProvider.EDEN
+    return await eden_client.get_response(
+        message_text,
+        context=workspace_context,
+        history=history
+    )
+
+def remember_exchange(user_id: int, message_text: str, response: str) -> None:
+    """Registra a pergunta e a resposta no histórico de conversa do usuário."""
+    conversation_memory.add_turn(user_id, "user", message_text)
+    conversation_memory.add_turn(user_id, "assistant", response)
+
+def get_pending_notion_content(context: CallbackContext, user_id: int):
+    """Retorna o /save pendente do usuário, recuperando-o do disco após um reinício."""
+    if "waiting_for_notion_content" not in context.user_data:
+        context.user_data["waiting_for_notion_content"] = user_settings.load_pending_save(user_id)
+    return context.user_data["waiting_for_notion_content"]
+
+def set_pending_notion_content(context: CallbackContext, user_id: int, data) -> None:
+    """Define (ou limpa, com None) o /save pendente do usuário."""
+    context.user_data["waiting_for_notion_content"] = data
+    user_settings.save_pending_save(user_id, data)
+
+async def load_user_settings(update: Update, context: CallbackContext) -> None:
+    """Lê do disco, sem bloquear o event loop, as configurações de um usuário que não estão em memória."""
+    user = update.effective_user
+    if user is None:
+        return
+    if ai_manager.has_user(user.id) and "waiting_for_notion_content" in context.user_data:
+        return
+    state, pending_save = await user_settings.load_user(user.id)
+    ai_manager.preload_user(user.id, state)
+    context.user_data.setdefault("waiting_for_notion_content", pending_save)
+
+async def notify_notion_save(bot, entry: dict, page: dict, error: str) -> None:
+    """Avisa o usuário quando a nota da fila foi gravada (ou descartada) no Notion."""
+    if page is not None:
+        # A nova página altera o workspace: descarta o contexto em cache e reindexa
+        notion_context.invalidate()
+        notion_index.request_sync()
+        text = (
+            "✅ Conteúdo salvo com sucesso no Notion!\n\n"
+            f"📄 Título: {page['title']}\n"
+            f"🔗 Link: {page['url']}"
+        )
+    elif "Token" in error:
+        text = (
+            f"❌ Não foi possível salvar '{entry['title']}': erro de autenticação no Notion.\n"
+            "Por favor, verifique se o token de integração está correto."
+        )
+    elif "database" in error.lower():
+        text = (
+            f"❌ Não foi possível salvar '{entry['title']}': erro ao acessar o banco de dados do Notion.\n"
+            "Verifique se o ID do banco está correto e se você tem permissão de acesso."
+        )
+    else:
+        text = (
+            f"❌ Não foi possível salvar '{entry['title']}' no Notion.\n"
+            "Por favor, verifique se o conteúdo é válido e tente novamente."
+        )
+    # Aviso em segundo plano: cede a vez às respostas dos handlers
+    with send_priority(PRIORITY_BACKGROUND):
+        await bot.send_message(chat_id=entry["chat_id"], text=text)
+
+def format_sentiment(results: dict) -> str:
+    """Formata os resultados por provider; os que ainda não responderam aparecem como pendentes."""
+    response = "📊 Análise de Sentimento:\n\n"
+    for provider in SENTIMENT_PROVIDERS:
+        response += f"{provider.capitalize()}:\n"
+        result = results.get(provider)
+        if result is None:
+            response += "- ⏳ Aguardando resposta...\n\n"
+        elif "error" in result:
+            response += "- ⚠️ Indisponível no momento\n\n"
+        else:
+            # A Eden AI devolve "general"/"general_score" (0 a 1)
+            sentiment = result.get("general", result.get("sentiment", "N/A"))
+            score = result.get("general_score")
+            confidence = score * 100 if score is not None else result.get("confidence", 0)
+            response += f"- Sentimento: {sentiment}\n"
+            response += f"- Confiança: {confidence:.2f}%\n\n"
+    return response.rstrip("\n")
 
 async def start(update: Update, context: CallbackContext) -> None:
     """Send a message when the command /start is issued."""
@@ -61,14 +313,34 @@ async def use_eden(update: Update, context: CallbackContext) -> None:
 async def analyze_sentiment(update: Update, context: CallbackContext) -> None:
     """Enable sentiment analysis for the next message."""
     user_id = update.effective_user.id
-    analyzing_sentiment[user_id] = True
+    ai_manager.request_sentiment_analysis(user_id)
     await update.message.reply_text("📊 Envie uma mensagem para análise de sentimento.")
 
+async def _flush_listing(update: Update, response: str, entry: str) -> str:
+    """
+    Acrescenta uma entrada à listagem, enviando o que já foi montado
+    antes que a mensagem ultrapasse o limite do Telegram
+    """
+    if len(response) + len(entry) > LISTING_FLUSH_CHARS:
+        await update.message.reply_text(response)
+        response = ""
+    return response + entry
+
 async def list_databases(update: Update, context: CallbackContext) -> None:
     """Lista todos os bancos de dados acessíveis do Notion."""
     try:
-        databases = await notion_client.list_databases()
-        if not databases:
+        response = "📚 Bancos de dados disponíveis no Notion:\n\n"
+        found = 0
+        async for db in notion_client.iter_databases():
+            entry = f"📁 {db['title']}\n"
+            entry += f"ID: `{db['id']}`\n"
+            if db.get('description'):
+                entry += f"📝 {db['description']}\n"
+            entry += "\n"
+            response = await _flush_listing(update, response, entry)
+            found += 1
+
+        if not found:
             await update.message.reply_text(
                 "📚 Nenhum banco de dados encontrado no seu workspace Notion.\n\n"
                 "Verifique se:\n"
@@ -78,15 +350,8 @@ async def list_databases(update: Update, context: CallbackContext) -> None:
             )
             return
 
-        response = "📚 Bancos de dados disponíveis no Notion:\n\n"
-        for db in databases:
-            response += f"📁 {db['title']}\n"
-            response += f"ID: `{db['id']}`\n"
-            if db.get('description'):
-                response += f"📝 {db['description']}\n"
-            response += "\n"
-
-        await update.message.reply_text(response)
+        if response:
+            await update.message.reply_text(response)
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Erro ao listar bancos de dados: {error_msg}")
@@ -130,15 +395,14 @@ async def save_to_notion(update: Update, context: CallbackContext) -> None:
     title = " ".join(context.args)
 
     # Aguardando próxima mensagem
-    context.user_data["waiting_for_notion_content"] = {
+    set_pending_notion_content(context, user_id, {
         "title": title,
         "command": "save"
-    }
+    })
 
     await update.message.reply_text(
         f"📝 Título definido: '{title}'\n"
-        "Agora envie o conteúdo que deseja salvar no Notion.\n"
-        "Obs: O conteúdo será limitado a 2000 caracteres."
+        "Agora envie o conteúdo que deseja salvar no Notion."
     )
 
 async def search_notion(update: Update, context: CallbackContext) -> None:
@@ -152,18 +416,21 @@ async def search_notion(update: Update, context: CallbackContext) -> None:
 
     query = " ".join(context.args)
     try:
-        results = await notion_client.search_pages(query)
-        if not results:
+        response = "🔍 Resultados encontrados:\n\n"
+        found = 0
+        for page in await notion_client.search_pages(query, limit=NOTION_SEARCH_LIMIT):
+            entry = f"📄 {page['title']}\n"
+            entry += f"🔗 {page['url']}\n"
+            entry += f"⏱️ Última edição: {page['last_edited']}\n\n"
+            response = await _flush_listing(update, response, entry)
+            found += 1
+
+        if not found:
             await update.message.reply_text("🔍 Nenhum resultado encontrado.")
             return
 
-        response = "🔍 Resultados encontrados:\n\n"
-        for page in results:
-            response += f"📄 {page['title']}\n"
-            response += f"🔗 {page['url']}\n"
-            response += f"⏱️ Última edição: {page['last_edited']}\n\n"
-
-        await update.message.reply_text(response)
+        if response:
+            await update.message.reply_text(response)
     except Exception as e:
         logger.error(f"Error searching Notion: {str(e)}")
         await update.message.reply_text(
@@ -171,6 +438,164 @@ async def search_notion(update: Update, context: CallbackContext) -> None:
             "Por favor, tente novamente mais tarde."
         )
 
+async def require_admin(update: Update) -> bool:
+    """Retorna True para administradores; os demais recebem um aviso."""
+    if update.effective_user.id in ADMIN_USER_IDS:
+        return True
+    await update.message.reply_text("⛔ Comando disponível apenas para administradores.")
+    return False
+
+async def stats_command(update: Update, context: CallbackContext) -> None:
+    """Mostra volume, erros e latência por handler e serviço (somente administradores)."""
+    if not await require_admin(update):
+        return
+
+    data = summary()
+    response = "📈 Estatísticas\n\n"
+    for section, title in (("handlers", "Handlers"), ("providers", "Serviços externos")):
+        response = await _flush_listing(update, response, f"{title}:\n")
+        for name, row in sorted(data[section].items()):
+            entry = (
+                f"- {name}: {row['requests']:.0f} req, {row['errors']:.0f} erros, "
+                f"p50 {row['p50']:.2f}s, p95 {row['p95']:.2f}s, em andamento {row['in_flight']:.0f}\n"
+            )
+            response = await _flush_listing(update, response, entry)
+        response += "\n"
+
+    response = await _flush_listing(update, response, "Filas:\n")
+    for scheduler in provider_schedulers.values():
+        stats = scheduler.stats()
+        response = await _flush_listing(
+            update, response,
+            f"- {stats['name']}: {stats['queue_depth']} na fila, {stats['in_flight']} em andamento, "
+            f"espera média {stats['avg_wait']:.2f}s\n"
+        )
+    outbox = notion_outbox.stats()
+    response = await _flush_listing(
+        update, response,
+        f"- notion (gravações): {outbox['pending']} pendentes, {outbox['failed']} com falha\n"
+    )
+    if service_health:
+        response = await _flush_listing(update, response, "\nSaúde na inicialização:\n")
+        for name, health in sorted(service_health.items()):
+            status = "ok" if health["ok"] else f"indisponível ({health['error']})"
+            response = await _flush_listing(update, response, f"- {name}: {status}, {health['latency']:.2f}s\n")
+    await update.message.reply_text(response)
+
+async def profile_command(update: Update, context: CallbackContext) -> None:
+    """Liga e desliga o profiler de CPU/memória e envia o relatório (somente administradores)."""
+    if not await require_admin(update):
+        return
+
+    args = [arg.lower() for arg in context.args or []]
+    action = args[0] if args else ("stop" if runtime_profiler.running else "start")
+    if action == "start":
+        if runtime_profiler.running:
+            await update.message.reply_text("ℹ️ O profiler já está em execução. Use /profile stop.")
+            return
+        # O rastreamento de memória (tracemalloc) deixa o bot mais lento: só com "mem"
+        memory = "mem" in args[1:]
+        runtime_profiler.start(memory=memory)
+        await update.message.reply_text(
+            f"🔬 Profiler iniciado{' com rastreamento de memória' if memory else ''}.\n"
+            f"Use /profile stop para receber o relatório (ele para sozinho em {PROFILER_MAX_DURATION:.0f}s)."
+        )
+    elif action == "stop":
+        try:
+            report = runtime_profiler.stop()
+        except Exception as e:
+            await update.message.reply_text(f"ℹ️ {str(e)}.")
+            return
+        await update.message.reply_document(
+            document=report,
+            filename=f"perfil-{datetime.now():%Y%m%d-%H%M%S}.txt",
+            caption="🔬 Funções mais quentes, pilhas e maiores alocadores de memória."
+        )
+    else:
+        await update.message.reply_text("ℹ️ Uso: /profile start [mem] ou /profile stop")
+
+async def respond_with_ai(reply_to: Message, user_id: int, message_text: str, batch: Optional[MessageBatch] = None) -> None:
+    """Responde `message_text` com a IA ativa do usuário (com `batch`, marca quando a resposta começa a ser enviada)."""
+    # Contexto do Notion reduzido ao que é relevante para a mensagem
+    with span("notion_context"):
+        workspace_context = await build_prompt_context(message_text)
+
+    # Histórico da conversa; também entra na chave do cache de respostas
+    history = conversation_memory.messages(user_id)
+    cache_context = [workspace_context, history] if history else workspace_context
+
+    # Get AI response based on selected provider
+    provider = ai_manager.get_active_provider(user_id)
+    with span("response_cache"):
+        cached = await response_cache.get(provider.name, message_text, cache_context)
+    if cached is not None:
+        if batch is not None:
+            batch.commit()
+        remember_exchange(user_id, message_text, cached)
+        with span("reply", cached=True):
+            await reply_long(reply_to, cached)
+        return
+
+    def scheduled_request(target: AIProvider):
+        return provider_schedulers[target].submit(
+            user_id,
+            lambda: request_ai_response(target, message_text, workspace_context, history)
+        )
+
+    # No modo hedged a resposta completa é necessária para escolher o vencedor
+    if provider == AIProvider.DEEPSEEK and DEEPSEEK_STREAMING and provider_router is None:
+        # Resposta parcial editada progressivamente na mensagem provisória. Cancelável só
+        # até o primeiro texto: a partir daí o usuário já está lendo a resposta (commit)
+        try:
+            # Inclui as edições da mensagem: no streaming provider e envio se sobrepõem
+            with span("provider", provider=provider.name, streaming=True):
+                response = await provider_schedulers[provider].submit(user_id, lambda: reply_streaming(
+                    reply_to,
+                    deepseek_client.stream_response(
+                        message_text,
+                        context=workspace_context,
+                        history=history
+                    ),
+                    ERROR_MESSAGE,
+                    on_first_delta=batch.commit if batch is not None else None
+                ))
+            remember_exchange(user_id, message_text, response)
+            await response_cache.set(provider.name, message_text, cache_context, response)
+        except SchedulerBusyError:
+            await reply_to.reply_text(BUSY_MESSAGE)
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+        return
+
+    try:
+        with span("provider", provider=provider.name):
+            if provider_router is not None:
+                # No hedging a resposta pode vir do secundário: o cache fica com o nome de quem respondeu
+                answered_by, response = await provider_router.route(provider, scheduled_request)
+            else:
+                answered_by, response = provider, await scheduled_request(provider)
+    except SchedulerBusyError:
+        await reply_to.reply_text(BUSY_MESSAGE)
+        return
+    except ProvidersUnavailableError:
+        await reply_to.reply_text(UNAVAILABLE_MESSAGE)
+        return
+    if batch is not None:
+        batch.commit()
+    remember_exchange(user_id, message_text, response)
+    await response_cache.set(answered_by.name, message_text, cache_context, response)
+    with span("reply"):
+        await reply_long(reply_to, response)
+
+async def respond_to_batch(batch: MessageBatch) -> None:
+    """Responde um lote de mensagens seguidas do usuário com uma única chamada à IA."""
+    with start_trace("message_batch", user_id=batch.user_id, messages=len(batch.messages)):
+        try:
+            await respond_with_ai(batch.reply_to, batch.user_id, batch.text, batch)
+        except Exception as e:
+            logger.error(f"Error processing message: {str(e)}")
+            await batch.reply_to.reply_text(ERROR_MESSAGE)
+
 async def handle_message(update: Update, context: CallbackContext) -> None:
     """Processa todas as mensagens recebidas."""
     try:
@@ -178,49 +603,32 @@ async def handle_message(update: Update, context: CallbackContext) -> None:
         message_text = update.message.text
 
         # Verificar se estamos esperando conteúdo para o Notion
-        if context.user_data.get("waiting_for_notion_content"):
-            notion_data = context.user_data["waiting_for_notion_content"]
+        notion_data = get_pending_notion_content(context, user_id)
+        if notion_data:
 
             if notion_data["command"] == "save":
                 try:
-                    result = await notion_client.create_page(
-                        title=notion_data["title"],
-                        content=message_text
-                    )
-
-                    # Se o conteúdo foi truncado, avisar o usuário
-                    truncated_warning = ""
-                    if len(message_text) > 2000:
-                        truncated_warning = "\n⚠️ O conteúdo foi limitado a 2000 caracteres."
-
+                    # Gravado em disco na hora; o envio ao Notion acontece em segundo plano
+                    with span("outbox_enqueue"):
+                        await notion_outbox.enqueue(
+                            chat_id=update.effective_chat.id,
+                            user_id=user_id,
+                            title=notion_data["title"],
+                            content=message_text
+                        )
                     await update.message.reply_text(
-                        "✅ Conteúdo salvo com sucesso no Notion!" +
-                        truncated_warning + "\n\n"
-                        f"📄 Título: {result['title']}\n"
-                        f"🔗 Link: {result['url']}"
+                        "📥 Conteúdo recebido! Ele será salvo no Notion em instantes "
+                        "e você receberá o link assim que estiver pronto."
                     )
                 except Exception as e:
-                    error_msg = str(e)
-                    logger.error(f"Erro ao salvar no Notion: {error_msg}")
-
-                    if "Token" in error_msg:
-                        await update.message.reply_text(
-                            "❌ Erro de autenticação no Notion.\n"
-                            "Por favor, verifique se o token de integração está correto."
-                        )
-                    elif "database" in error_msg.lower():
-                        await update.message.reply_text(
-                            "❌ Erro ao acessar o banco de dados do Notion.\n"
-                            "Verifique se o ID do banco está correto e se você tem permissão de acesso."
-                        )
-                    else:
-                        await update.message.reply_text(
-                            "❌ Erro ao salvar no Notion.\n"
-                            "Por favor, verifique se o conteúdo é válido e tente novamente."
-                        )
+                    logger.error(f"Erro ao enfileirar conteúdo para o Notion: {str(e)}")
+                    await update.message.reply_text(
+                        "❌ Erro ao salvar no Notion.\n"
+                        "Por favor, tente novamente."
+                    )
 
                 # Limpar o estado de espera
-                del context.user_data["waiting_for_notion_content"]
+                set_pending_notion_content(context, user_id, None)
                 return
 
         # Verifica se está em modo dummy
@@ -241,84 +649,237 @@ async def handle_message(update: Update, context: CallbackContext) -> None:
             return
 
         # Verifica se é para fazer análise de sentimento
-        if analyzing_sentiment.get(user_id, False):
-            analyzing_sentiment[user_id] = False  # Reset flag
+        if ai_manager.consume_sentiment_request(user_id):
             try:
-                sentiment_results = await eden_client.analyze_sentiment(message_text)
-
-                response = "📊 Análise de Sentimento:\n\n"
-
-                if "amazon" in sentiment_results:
-                    amazon = sentiment_results["amazon"]
-                    response += "Amazon:\n"
-                    response += f"- Sentimento: {amazon.get('sentiment', 'N/A')}\n"
-                    response += f"- Confiança: {amazon.get('confidence', 0):.2f}%\n\n"
-
-                if "google" in sentiment_results:
-                    google = sentiment_results["google"]
-                    response += "Google:\n"
-                    response += f"- Sentimento: {google.get('sentiment', 'N/A')}\n"
-                    response += f"- Confiança: {google.get('confidence', 0):.2f}%\n"
-
-                await update.message.reply_text(response)
+                if SENTIMENT_MODE == "first":
+                    # Responde com o primeiro provider e edita quando os demais chegam
+                    results = {}
+                    reply = None
+                    with span("sentiment", mode="first"):
+                        async for provider, result in sentiment_analyzer.iter_results(message_text, user_id):
+                            results[provider] = result
+                            if reply is None:
+                                reply = await update.message.reply_text(format_sentiment(results))
+                            else:
+                                try:
+                                    await reply.edit_text(format_sentiment(results))
+                                except Exception as e:
+                                    logger.warning(f"Não foi possível atualizar a análise de sentimento: {str(e)}")
+                    return
+
+                with span("sentiment"):
+                    sentiment_results = await sentiment_analyzer.analyze(message_text, user_id)
+                with span("reply"):
+                    await update.message.reply_text(format_sentiment(sentiment_results))
+                return
+            except SchedulerBusyError:
+                await update.message.reply_text(BUSY_MESSAGE)
                 return
             except Exception as e:
                 logger.error(f"Error in sentiment analysis: {str(e)}")
                 await update.message.reply_text("Erro ao analisar sentimento. Tente novamente.")
                 return
 
-        # Get current Notion context for the user
-        if user_id not in notion_context:
-            try:
-                databases = await notion_client.list_databases()
-                notion_context[user_id] = {
-                    "databases": databases
-                }
-            except Exception as e:
-                logger.warning(f"Could not fetch Notion context: {str(e)}")
-                notion_context[user_id] = {}
-
-        # Get AI response based on selected provider
-        provider = ai_manager.get_active_provider(user_id)
-        if provider == AIProvider.DEEPSEEK:
-            response = await deepseek_client.get_response(
-                message_text,
-                context=notion_context.get(user_id, {})
-            )
-        else:  # AIProvider.EDEN
-            response = await eden_client.get_response(
-                message_text,
-                context=notion_context.get(user_id, {})
-            )
-
-        await update.message.reply_text(response)
+        if message_coalescer.enabled:
+            # Respondida em segundo plano, junto com as mensagens seguintes que chegarem na janela
+            message_coalescer.submit(user_id, update.message)
+            return
+        await respond_with_ai(update.message, user_id, message_text)
 
     except Exception as e:
         logger.error(f"Error processing message: {str(e)}")
         await update.message.reply_text(ERROR_MESSAGE)
 
+async def check_service(name: str, check) -> None:
+    """Executa uma verificação de saúde e guarda o resultado (nunca levanta exceção)."""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), HEALTH_CHECK_TIMEOUT)
+        service_health[name] = {"ok": True, "latency": time.perf_counter() - started}
+        logger.info(f"{name}: disponível ({service_health[name]['latency']:.2f}s)")
+    except Exception as e:
+        error = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)
+        service_health[name] = {"ok": False, "latency": time.perf_counter() - started, "error": error}
+        logger.error(f"{name}: indisponível na inicialização: {error}")
+
+async def run_health_checks() -> None:
+    """Verifica Notion, DeepSeek e Eden em paralelo, já aquecendo as conexões."""
+    await asyncio.gather(
+        check_service("notion", notion_client.verify_connection),
+        check_service("deepseek", deepseek_client.health_check),
+        check_service("eden", eden_client.health_check)
+    )
+
+async def post_init(application: Application) -> None:
+    """Abre os recursos locais; os serviços externos são verificados em segundo plano."""
+    global health_task
+    # Só SQLite local: nenhuma chamada de rede atrasa o início do polling
+    await asyncio.gather(
+        user_settings.start(),
+        notion_outbox.start(
+            lambda entry, page, error: notify_notion_save(application.bot, entry, page, error)
+        ),
+        notion_index.start()
+    )
+    loop_monitor.start()
+    if HEALTH_CHECK_TIMEOUT > 0:
+        # Um serviço fora do ar fica registrado no log e no /stats, sem impedir o bot de subir
+        health_task = asyncio.create_task(run_health_checks())
+    try:
+        await metrics_server.start()
+    except OSError as e:
+        # Porta ocupada não impede o bot de funcionar; só fica sem /metrics
+        logger.warning(f"Não foi possível iniciar o servidor de métricas: {str(e)}")
+
+async def post_stop(application: Application) -> None:
+    """Responde as mensagens ainda agrupadas enquanto o bot ainda consegue enviar."""
+    await message_coalescer.flush()
+
+async def post_shutdown(application: Application) -> None:
+    """Fecha os recursos compartilhados ao encerrar o bot."""
+    if health_task is not None and not health_task.done():
+        health_task.cancel()
+        try:
+            await health_task
+        except asyncio.CancelledError:
+            pass
+    await metrics_server.stop()
+    await loop_monitor.stop()
+    logger.info(f"Estatísticas do event loop: {loop_monitor.stats()}")
+    if provider_router is not None:
+        logger.info(f"Estatísticas do roteamento: {provider_router.stats()}")
+    for scheduler in provider_schedulers.values():
+        logger.info(f"Estatísticas do agendador: {scheduler.stats()}")
+        await scheduler.close()
+    for client in (deepseek_client, eden_client):
+        logger.info(f"Estatísticas do pool HTTP: {client.pool_stats()}")
+        await client.close()
+    logger.info(f"Estatísticas do cache de contexto: {notion_context.stats()}")
+    logger.info(f"Estatísticas do cache de respostas: {response_cache.stats()}")
+    logger.info(f"Estatísticas da análise de sentimento: {sentiment_analyzer.stats()}")
+    logger.info(f"Estatísticas do contexto dos prompts: {context_builder.stats()}")
+    await response_cache.close()
+    logger.info(f"Estatísticas da fila do Notion: {notion_outbox.stats()}")
+    await notion_outbox.close()
+    logger.info(f"Estatísticas do índice do Notion: {notion_index.stats()}")
+    await notion_index.close()
+    await notion_client.close()
+    await user_settings.close()
+
+def handler_callback(name: str, callback):
+    """Callback de handler com métricas e trace (o trace fica dentro da medição)."""
+    return instrument_handler(name, traced(name, callback))
+
+def build_application() -> Application:
+    """Cria a Application com todos os handlers registrados."""
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .rate_limiter(telegram_rate_limiter)
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    # Antes de qualquer handler, as configurações do usuário são lidas do disco numa thread
+    application.add_handler(TypeHandler(Update, load_user_settings), group=-1)
+    # Add handlers (cada callback é instrumentado para o /metrics e o /stats e gera um trace)
+    application.add_handler(CommandHandler("start", handler_callback("start", start)))
+    application.add_handler(CommandHandler("help", handler_callback("help", help_command)))
+    application.add_handler(CommandHandler("databases", handler_callback("databases", list_databases)))
+    application.add_handler(CommandHandler("toggle_ai", handler_callback("toggle_ai", toggle_ai)))
+    application.add_handler(CommandHandler("use_deepseek", handler_callback("use_deepseek", use_deepseek)))
+    application.add_handler(CommandHandler("use_eden", handler_callback("use_eden", use_eden)))
+    application.add_handler(CommandHandler("use_dummy", handler_callback("use_dummy", use_dummy_mode)))
+    application.add_handler(CommandHandler("analyze_sentiment", handler_callback("analyze_sentiment", analyze_sentiment)))
+    application.add_handler(CommandHandler("save", handler_callback("save", save_to_notion)))
+    application.add_handler(CommandHandler("search", handler_callback("search", search_notion)))
+    application.add_handler(CommandHandler("stats", handler_callback("stats", stats_command)))
+    application.add_handler(CommandHandler("profile", handler_callback("profile", profile_command)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handler_callback("message", handle_message)))
+    return application
+
+async def run_webhook(application: Application) -> None:
+    """Executa o bot recebendo updates pelo servidor de webhook embutido."""
+    server = WebhookServer(application)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    # run_polling chama post_init/post_stop/post_shutdown sozinho; aqui fazemos isso manualmente
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        await server.start()
+        try:
+            if WEBHOOK_URL:
+                await application.bot.set_webhook(
+                    url=WEBHOOK_URL,
+                    secret_token=WEBHOOK_SECRET_TOKEN or None,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                logger.info(f"Webhook registrado no Telegram: {WEBHOOK_URL}")
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            await application.post_stop(application)
+            await application.post_shutdown(application)
+
+async def release_users(application: Application, keep) -> int:
+    """Grava e esquece o estado dos usuários que passaram para outro worker."""
+    # Lotes em espera são respondidos aqui, antes de o próximo worker receber mensagens novas
+    await message_coalescer.flush(lambda user_id: not keep(user_id))
+    released = ai_manager.retain_users(keep)
+    conversation_memory.retain(keep)
+    for user_id in [user_id for user_id in application.user_data if not keep(user_id)]:
+        application.drop_user_data(user_id)
+    # O próximo worker lê do disco o estado que este acabou de alterar
+    await user_settings.flush()
+    return released
+
+async def run_worker(application: Application) -> None:
+    """Executa um worker do modo com shards: processa os updates que o front envia."""
+    global shard_worker
+    shard_worker = ShardWorker(application, release_users)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    async with application:
+        await post_init(application)
+        await application.start()
+        try:
+            await shard_worker.run(stop_event)
+        finally:
+            await application.stop()
+            await post_stop(application)
+            await post_shutdown(application)
+
 def main() -> None:
     """Start the bot."""
+    configure_logging()
     try:
-        # Create the Application
-        application = Application.builder().token(TELEGRAM_TOKEN).build()
-
-        # Add handlers
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("databases", list_databases))
-        application.add_handler(CommandHandler("toggle_ai", toggle_ai))
-        application.add_handler(CommandHandler("use_deepseek", use_deepseek))
-        application.add_handler(CommandHandler("use_eden", use_eden))
-        application.add_handler(CommandHandler("use_dummy", use_dummy_mode))
-        application.add_handler(CommandHandler("analyze_sentiment", analyze_sentiment))
-        application.add_handler(CommandHandler("save", save_to_notion))
-        application.add_handler(CommandHandler("search", search_notion))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+        if SHARD_ROLE == "worker":
+            logger.info(f"Starting shard worker {SHARD_WORKER_NAME}...")
+            asyncio.run(run_worker(build_application()))
+            return
+
+        # Create the Application (o front só recebe e distribui os updates)
+        application = build_front_application() if SHARD_ROLE == "front" else build_application()
 
         # Start the Bot
-        logger.info("Starting bot...")
-        application.run_polling()
+        if BOT_MODE == "webhook":
+            logger.info("Starting bot in webhook mode...")
+            asyncio.run(run_webhook(application))
+        else:
+            logger.info("Starting bot...")
+            application.run_polling()
 
     except Exception as e:
         logger.error(f"Error starting bot: {str(e)}")
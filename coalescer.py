@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from telegram import Message
+from config import (
+    MESSAGE_COALESCE_WINDOW, MESSAGE_COALESCE_MAX_WAIT, MESSAGE_COALESCE_MAX_MESSAGES, CANCEL_SUPERSEDED_REQUESTS
+)
+
+logger = logging.getLogger(__name__)
+
+class MessageBatch:
+    """
+    Mensagens seguidas de um usuário respondidas com uma única chamada à IA
+    """
+    __slots__ = ("user_id", "messages", "committed")
+
+    def __init__(self, user_id: int, messages: List[Message]):
+        self.user_id = user_id
+        self.messages = messages
+        self.committed = False
+
+    @property
+    def text(self) -> str:
+        return "\n".join(message.text for message in self.messages)
+
+    @property
+    def reply_to(self) -> Message:
+        return self.messages[-1]
+
+    def commit(self) -> None:
+        """
+        Marca a resposta como em envio: a partir daqui uma mensagem nova não a cancela
+        """
+        self.committed = True
+
+class _UserQueue:
+    __slots__ = ("pending", "first_at", "timer", "batch", "task")
+
+    def __init__(self):
+        self.pending: List[Message] = []
+        self.first_at = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # Lote em resposta; None depois de cancelado (as mensagens voltam para `pending`)
+        self.batch: Optional[MessageBatch] = None
+        self.task: Optional[asyncio.Task] = None
+
+class MessageCoalescer:
+    """
+    Junta mensagens de texto seguidas de um mesmo usuário em um só prompt.
+
+    Cada mensagem reinicia uma janela de `window` segundos; quando ela
+    termina sem novas mensagens (ou após `max_wait` segundos desde a
+    primeira, ou com `max_messages` acumuladas) o lote é respondido por
+    `respond(batch)` em uma task própria, sem segurar a fila de updates.
+    Cada usuário tem no máximo uma resposta em andamento; mensagens que
+    chegam durante ela formam o próximo lote. Com `cancel_superseded`, uma
+    mensagem nova cancela a resposta em andamento que ainda não começou a
+    ser enviada (MessageBatch.commit) e as mensagens dela entram no lote
+    seguinte.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[MessageBatch], Awaitable[None]],
+        window: float = MESSAGE_COALESCE_WINDOW,
+        max_wait: float = MESSAGE_COALESCE_MAX_WAIT,
+        max_messages: int = MESSAGE_COALESCE_MAX_MESSAGES,
+        cancel_superseded: bool = CANCEL_SUPERSEDED_REQUESTS
+    ):
+        self.respond = respond
+        self.window = max(0.0, window)
+        self.max_wait = max(self.window, max_wait)
+        self.max_messages = max(1, max_messages)
+        self.cancel_superseded = cancel_superseded
+        self._users: Dict[int, _UserQueue] = {}
+        self.messages = 0
+        self.batches = 0
+        self.cancelled = 0
+        self.max_batch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 or self.cancel_superseded
+
+    def submit(self, user_id: int, message: Message) -> None:
+        """
+        Acrescenta a mensagem ao próximo lote do usuário
+        """
+        queue = self._users.get(user_id)
+        if queue is None:
+            queue = self._users[user_id] = _UserQueue()
+        self.messages += 1
+        loop = asyncio.get_running_loop()
+        if not queue.pending:
+            queue.first_at = loop.time()
+
+        batch = queue.batch
+        if self.cancel_superseded and batch is not None and not batch.committed:
+            # A resposta em andamento ficou velha: cancela e responde tudo junto
+            queue.task.cancel()
+            queue.batch = None
+            queue.pending[:0] = batch.messages
+            self.cancelled += 1
+            logger.info(f"Resposta ao usuário {user_id} cancelada por uma mensagem nova")
+        queue.pending.append(message)
+
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        delay = min(self.window, queue.first_at + self.max_wait - loop.time())
+        if delay <= 0 or len(queue.pending) >= self.max_messages:
+            self._dispatch(user_id, queue)
+        else:
+            queue.timer = loop.call_later(delay, self._dispatch, user_id, queue)
+
+    def _dispatch(self, user_id: int, queue: _UserQueue) -> None:
+        queue.timer = None
+        if not queue.pending or queue.task is not None:
+            # Uma resposta por vez por usuário: o lote sai quando a atual terminar
+            return
+        batch = queue.batch = MessageBatch(user_id, queue.pending)
+        queue.pending = []
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch.messages))
+        queue.task = asyncio.create_task(self._run(batch))
+        queue.task.add_done_callback(lambda task: self._finished(user_id, queue))
+
+    async def _run(self, batch: MessageBatch) -> None:
+        try:
+            await self.respond(batch)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Erro ao responder as mensagens do usuário {batch.user_id}: {str(e)}")
+
+    def _finished(self, user_id: int, queue: _UserQueue) -> None:
+        queue.task = None
+        queue.batch = None
+        if queue.pending:
+            if queue.timer is None:
+                self._dispatch(user_id, queue)
+        elif self._users.get(user_id) is queue:
+            del self._users[user_id]
+
+    async def flush(self, select: Optional[Callable[[int], bool]] = None) -> None:
+        """
+        Responde já os lotes em espera (dos usuários com `select(user_id)`
+        verdadeiro, ou de todos) e aguarda as respostas em andamento
+        """
+        while True:
+            tasks = []
+            for user_id, queue in list(self._users.items()):
+                if select is not None and not select(user_id):
+                    continue
+                if queue.timer is not None:
+                    queue.timer.cancel()
+                    self._dispatch(user_id, queue)
+                if queue.task is not None:
+                    tasks.append(queue.task)
+            if not tasks:
+                return
+            await asyncio.wait(tasks)
+
+    def stats(self) -> dict:
+        return {
+            "messages": self.messages,
+            "batches": self.batches,
+            # Mensagens respondidas sem uma chamada própria à IA (lotes cancelados não contam como resposta)
+            "coalesced": self.messages - (self.batches - self.cancelled),
+            "cancelled": self.cancelled,
+            "max_batch": self.max_batch,
+            "active_users": len(self._users)
+        }
@@ -1,5 +1,4 @@
 import os
-import logging
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,17 +8,149 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
 NOTION_TOKEN = os.getenv('NOTION_TOKEN')
+NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
 EDEN_AI_API_KEY = os.getenv('EDEN_AI_API_KEY')
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
+# Logging Configuration
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# Update Delivery Configuration ("polling" ou "webhook")
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# URL pública registrada no Telegram; vazio = não chama setWebhook (testes locais)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+
+# Sharding Configuration (SHARD_ROLE: vazio = processo único, "front" ou "worker")
+# O front recebe os updates (BOT_MODE) e os distribui por user_id entre os workers
+SHARD_ROLE = os.getenv('SHARD_ROLE', '').lower()
+SHARD_SOCKET = os.getenv('SHARD_SOCKET', 'bot-shards.sock')
+# Workers iniciados pelo próprio front; outros podem se conectar ao socket
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '2'))
+SHARD_WORKER_NAME = os.getenv('SHARD_WORKER_NAME', f'worker-{os.getpid()}')
+SHARD_VIRTUAL_NODES = int(os.getenv('SHARD_VIRTUAL_NODES', '160'))
+SHARD_REBALANCE_TIMEOUT = float(os.getenv('SHARD_REBALANCE_TIMEOUT', '5'))
 
 # API Configuration
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+# As URLs podem ser sobrescritas para apontar para servidores locais de teste
+DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', "https://api.deepseek.com/v1/chat/completions")
+EDEN_AI_API_URL = os.getenv('EDEN_AI_API_URL', "https://api.edenai.run/v2")
+NOTION_API_URL = os.getenv('NOTION_API_URL', "https://api.notion.com")
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', "https://api.telegram.org/bot")
+
+# HTTP Connection Pool Configuration
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+
+# Telegram Send Queue Configuration (limites da Bot API, envios por segundo; 0 desativa)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', '0.33'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+# Updates processados ao mesmo tempo (usuários diferentes); 1 processa um update por vez
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv('TELEGRAM_CONCURRENT_UPDATES', '256'))
+
+# Streaming Configuration
+DEEPSEEK_STREAMING = os.getenv('DEEPSEEK_STREAMING', 'true').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.0'))
+
+# Message Coalescing Configuration (mensagens seguidas do mesmo usuário viram um só prompt; janela 0 desativa)
+MESSAGE_COALESCE_WINDOW = float(os.getenv('MESSAGE_COALESCE_WINDOW', '0'))
+MESSAGE_COALESCE_MAX_WAIT = float(os.getenv('MESSAGE_COALESCE_MAX_WAIT', '3'))
+MESSAGE_COALESCE_MAX_MESSAGES = int(os.getenv('MESSAGE_COALESCE_MAX_MESSAGES', '10'))
+CANCEL_SUPERSEDED_REQUESTS = os.getenv('CANCEL_SUPERSEDED_REQUESTS', 'false').lower() == 'true'
+
+# Notion Context Cache Configuration
+NOTION_CONTEXT_TTL = float(os.getenv('NOTION_CONTEXT_TTL', '300'))
+NOTION_CONTEXT_ERROR_TTL = float(os.getenv('NOTION_CONTEXT_ERROR_TTL', '30'))
+NOTION_SEARCH_LIMIT = int(os.getenv('NOTION_SEARCH_LIMIT', '5'))
+NOTION_FETCH_CONCURRENCY = int(os.getenv('NOTION_FETCH_CONCURRENCY', '4'))
+NOTION_PAGE_CACHE_SIZE = int(os.getenv('NOTION_PAGE_CACHE_SIZE', '500'))
+
+# Notion Local Search Index Configuration (intervalo 0 desativa o índice)
+NOTION_INDEX_PATH = os.getenv('NOTION_INDEX_PATH', 'notion_index.db')
+NOTION_INDEX_SYNC_INTERVAL = float(os.getenv('NOTION_INDEX_SYNC_INTERVAL', '300'))
+NOTION_INDEX_FULL_SYNC_INTERVAL = float(os.getenv('NOTION_INDEX_FULL_SYNC_INTERVAL', '86400'))
+
+# Notion Save Queue Configuration
+NOTION_OUTBOX_PATH = os.getenv('NOTION_OUTBOX_PATH', 'notion_outbox.db')
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', '3'))
+NOTION_OUTBOX_CONCURRENCY = int(os.getenv('NOTION_OUTBOX_CONCURRENCY', '3'))
+NOTION_OUTBOX_MAX_ATTEMPTS = int(os.getenv('NOTION_OUTBOX_MAX_ATTEMPTS', '8'))
+NOTION_OUTBOX_MAX_BACKOFF = float(os.getenv('NOTION_OUTBOX_MAX_BACKOFF', '300'))
+
+# Per-User State Configuration
+USER_STATE_MAX_USERS = int(os.getenv('USER_STATE_MAX_USERS', '100000'))
+USER_STATE_IDLE_TTL = float(os.getenv('USER_STATE_IDLE_TTL', '86400'))
+
+# User Settings Persistence Configuration
+USER_SETTINGS_DB_PATH = os.getenv('USER_SETTINGS_DB_PATH', 'user_settings.db')
+USER_SETTINGS_FLUSH_INTERVAL = float(os.getenv('USER_SETTINGS_FLUSH_INTERVAL', '1.0'))
+
+# AI Response Cache Configuration ("none", "memory" ou "disk")
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'none')
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'response_cache.db')
+
+# Provider Scheduling Configuration
+DEEPSEEK_MAX_CONCURRENCY = int(os.getenv('DEEPSEEK_MAX_CONCURRENCY', '8'))
+DEEPSEEK_RATE_LIMIT = float(os.getenv('DEEPSEEK_RATE_LIMIT', '5'))
+EDEN_MAX_CONCURRENCY = int(os.getenv('EDEN_MAX_CONCURRENCY', '4'))
+EDEN_RATE_LIMIT = float(os.getenv('EDEN_RATE_LIMIT', '2'))
+PROVIDER_MAX_QUEUE = int(os.getenv('PROVIDER_MAX_QUEUE', '100'))
+PROVIDER_MAX_QUEUE_PER_USER = int(os.getenv('PROVIDER_MAX_QUEUE_PER_USER', '3'))
+
+# Provider Routing Configuration ("single" ou "hedged")
+PROVIDER_ROUTING = os.getenv('PROVIDER_ROUTING', 'single').lower()
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '1.0'))
+HEDGE_MAX_DELAY = float(os.getenv('HEDGE_MAX_DELAY', '10.0'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+
+# Conversation Memory Configuration (orçamento 0 desativa o histórico)
+CONVERSATION_TOKEN_BUDGET = int(os.getenv('CONVERSATION_TOKEN_BUDGET', '2000'))
+CONVERSATION_MAX_TURNS = int(os.getenv('CONVERSATION_MAX_TURNS', '20'))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv('CONVERSATION_SUMMARY_TOKENS', '200'))
+CONVERSATION_MAX_USERS = int(os.getenv('CONVERSATION_MAX_USERS', '10000'))
+
+# Prompt Context Configuration
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv('PROMPT_CONTEXT_TOKEN_BUDGET', '300'))
+PROMPT_CONTEXT_TOP_K = int(os.getenv('PROMPT_CONTEXT_TOP_K', '5'))
+
+# Sentiment Analysis Configuration (modo "all" espera todos os providers; "first" responde com o primeiro)
+SENTIMENT_PROVIDERS = [p.strip() for p in os.getenv('SENTIMENT_PROVIDERS', 'amazon,google').split(',') if p.strip()]
+SENTIMENT_MODE = os.getenv('SENTIMENT_MODE', 'all').lower()
+SENTIMENT_TIMEOUT = float(os.getenv('SENTIMENT_TIMEOUT', '10'))
+SENTIMENT_CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', '1000'))
+SENTIMENT_BATCH_WINDOW = float(os.getenv('SENTIMENT_BATCH_WINDOW', '0.05'))
+SENTIMENT_MAX_BATCH = int(os.getenv('SENTIMENT_MAX_BATCH', '32'))
+SENTIMENT_MAX_CONCURRENCY = int(os.getenv('SENTIMENT_MAX_CONCURRENCY', '4'))
+
+# Startup Configuration (timeout 0 desativa as verificações de saúde em segundo plano)
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '10'))
+
+# Metrics Configuration (porta 0 desativa o endpoint /metrics)
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+
+# Tracing and Profiling Configuration (limiar/intervalo 0 desativa)
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', '5.0'))
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.1'))
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.1'))
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', '0.005'))
+PROFILER_MAX_DURATION = float(os.getenv('PROFILER_MAX_DURATION', '300'))
+PROFILER_TOP = int(os.getenv('PROFILER_TOP', '30'))
+PROFILER_TRACEMALLOC_FRAMES = int(os.getenv('PROFILER_TRACEMALLOC_FRAMES', '5'))
+
+# Admin Configuration (IDs do Telegram separados por vírgula; liberam /stats)
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
 
 # Bot Messages
 WELCOME_MESSAGE = """
@@ -70,4 +201,12 @@ Observação: As respostas podem levar alguns segundos para serem processadas.
 
 ERROR_MESSAGE = "Desculpe, ocorreu um erro. Por favor, tente novamente mais tarde."
 
-PROCESSING_MESSAGE = "Processing your message... Please wait."
\ No newline at end of file
+PROCESSING_MESSAGE = "Processing your message... Please wait."
+
+STREAM_PLACEHOLDER_MESSAGE = "💭 Pensando..."
+
+SUPERSEDED_MESSAGE = "↪️ Resposta interrompida: vou responder considerando também a sua nova mensagem."
+
+BUSY_MESSAGE = "⏳ Estou com muitas mensagens no momento. Por favor, tente novamente em alguns instantes."
+
+UNAVAILABLE_MESSAGE = "⚠️ Os serviços de IA estão indisponíveis no momento. Por favor, tente novamente em alguns minutos."
\ No newline at end of file
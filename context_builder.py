@@ -0,0 +1,148 @@
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set
+from config import PROMPT_CONTEXT_TOKEN_BUDGET, PROMPT_CONTEXT_TOP_K
+from conversation_memory import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w{3,}")
+
+# Palavras frequentes demais para indicar relevância
+_STOPWORDS = {
+    "para", "com", "uma", "que", "dos", "das", "por", "como", "mais", "meu", "minha",
+    "sobre", "isso", "esse", "essa", "the", "and", "for", "with", "from", "this", "that"
+}
+
+# Tamanho máximo da descrição de cada banco no prompt
+_DESCRIPTION_CHARS = 120
+
+def _singular(word: str) -> str:
+    # Plural simples (pt/en): "reunioes" -> "reuniao", "tarefas" -> "tarefa"
+    if word.endswith(("oes", "aes")):
+        return word[:-3] + "ao"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+def terms(text: str) -> Set[str]:
+    """
+    Termos normalizados (minúsculas, sem acentos, no singular) usados na pontuação de relevância
+    """
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return {_singular(word) for word in _WORD.findall(normalized) if word not in _STOPWORDS}
+
+class _Entry:
+    __slots__ = ("line", "tokens")
+
+    def __init__(self, line: str):
+        self.line = line
+        self.tokens = estimate_tokens(line)
+
+class CompiledContext:
+    """
+    Forma compacta de uma versão do contexto do workspace: uma linha curta
+    por banco de dados e um índice invertido termo -> bancos
+    """
+
+    def __init__(self, workspace: dict):
+        self.source = workspace
+        self.entries: List[_Entry] = []
+        self.title_terms: Dict[str, List[int]] = {}
+        self.description_terms: Dict[str, List[int]] = {}
+        for position, db in enumerate(workspace.get("databases", [])):
+            title = db.get("title") or "Sem título"
+            description = (db.get("description") or "").strip()
+            line = f"- {title}"
+            if description:
+                line += f": {description[:_DESCRIPTION_CHARS]}"
+            self.entries.append(_Entry(line))
+            for term in terms(title):
+                self.title_terms.setdefault(term, []).append(position)
+            for term in terms(description):
+                self.description_terms.setdefault(term, []).append(position)
+        # Tamanho que o contexto teria no formato antigo (str do dict inteiro)
+        self.raw_tokens = estimate_tokens(str(workspace)) if workspace else 0
+
+    def rank(self, message_terms: Set[str]) -> List[_Entry]:
+        scores: Dict[int, int] = {}
+        for term in message_terms:
+            for position in self.title_terms.get(term, ()):
+                scores[position] = scores.get(position, 0) + 2
+            for position in self.description_terms.get(term, ()):
+                scores[position] = scores.get(position, 0) + 1
+        ranked = sorted(scores, key=lambda position: (-scores[position], position))
+        return [self.entries[position] for position in ranked]
+
+class ContextBuilder:
+    """
+    Monta o contexto do prompt por mensagem: só os bancos e páginas mais
+    relevantes (top-k), dentro de um orçamento de tokens. A forma compacta
+    é calculada uma vez por versão do contexto do workspace.
+    """
+
+    def __init__(self, token_budget: int = PROMPT_CONTEXT_TOKEN_BUDGET, top_k: int = PROMPT_CONTEXT_TOP_K):
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self._compiled: Optional[CompiledContext] = None
+        self.compilations = 0
+        self.builds = 0
+        self.raw_tokens_total = 0
+        self.built_tokens_total = 0
+
+    def _compile(self, workspace: dict) -> CompiledContext:
+        # O cache do contexto devolve o mesmo objeto até a próxima recarga
+        if self._compiled is None or self._compiled.source is not workspace:
+            self._compiled = CompiledContext(workspace)
+            self.compilations += 1
+        return self._compiled
+
+    def build(self, workspace: dict, message: str, pages: Optional[List[dict]] = None) -> str:
+        """
+        Retorna o contexto compacto para `message`; `pages` são páginas já
+        ordenadas por relevância (ex.: resultado do índice local)
+        """
+        compiled = self._compile(workspace or {})
+        ranked = compiled.rank(terms(message))
+        if not ranked:
+            # Nada relacionado: só os primeiros bancos, para a IA saber o que existe
+            ranked = compiled.entries[:self.top_k]
+
+        sections = []
+        used = 0
+
+        def take(header: str, entries: List[_Entry]) -> None:
+            nonlocal used
+            selected = []
+            for entry in entries[:self.top_k]:
+                if used + entry.tokens > self.token_budget:
+                    break
+                selected.append(entry.line)
+                used += entry.tokens
+            if selected:
+                sections.append(header + "\n" + "\n".join(selected))
+
+        take("Relevant Notion pages:", [
+            _Entry(f"- {page['title']} (edited {page.get('last_edited', '?')[:10]})") for page in pages or []
+        ])
+        take("Notion databases:", ranked)
+        if len(compiled.entries) > self.top_k:
+            sections.append(f"({len(compiled.entries)} databases in the workspace)")
+
+        context = "\n".join(sections)
+        built_tokens = estimate_tokens(context) if context else 0
+        self.builds += 1
+        self.raw_tokens_total += compiled.raw_tokens
+        self.built_tokens_total += built_tokens
+        logger.info(f"Contexto do prompt: {compiled.raw_tokens} -> {built_tokens} tokens estimados")
+        return context
+
+    def stats(self) -> dict:
+        return {
+            "compilations": self.compilations,
+            "builds": self.builds,
+            "avg_raw_tokens": self.raw_tokens_total / self.builds if self.builds else 0.0,
+            "avg_built_tokens": self.built_tokens_total / self.builds if self.builds else 0.0
+        }
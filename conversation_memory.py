@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import re
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List
+from config import (
+    CONVERSATION_TOKEN_BUDGET,
+    CONVERSATION_MAX_TURNS,
+    CONVERSATION_SUMMARY_TOKENS,
+    CONVERSATION_MAX_USERS
+)
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Tamanho máximo de cada linha do resumo de turnos antigos
+_SUMMARY_LINE_CHARS = 160
+
+_SUMMARY_HEADER = "Summary of earlier conversation:\n"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa barata de tokens (~4 caracteres por token)
+    """
+    return max(1, len(text) // 4)
+
+class Turn:
+    """Um turno da conversa, com a contagem de tokens calculada uma única vez."""
+    __slots__ = ("role", "text", "tokens")
+
+    def __init__(self, role: str, text: str):
+        self.role = role
+        self.text = text
+        self.tokens = estimate_tokens(text)
+
+class _History:
+    __slots__ = ("turns", "tokens", "summary", "summary_tokens", "evicted")
+
+    def __init__(self):
+        self.turns: Deque[Turn] = deque()
+        self.tokens = 0
+        self.summary: Deque[str] = deque()
+        self.summary_tokens = 0
+        self.evicted: List[Turn] = []
+
+class ConversationMemory:
+    """
+    Histórico de conversa por usuário em buffers circulares.
+    O total de tokens é mantido incrementalmente: novos turnos somam, turnos
+    removidos pelo início subtraem, sem recontar o histórico inteiro. Turnos
+    removidos viram linhas de um resumo curto, limitado em tokens e reservado
+    no orçamento, de modo que turnos e resumo juntos nunca passam de
+    `token_budget`. O resumo é barato e roda no mesmo event loop, logo
+    depois do passo atual (call_soon), não em outra thread.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = CONVERSATION_TOKEN_BUDGET,
+        max_turns: int = CONVERSATION_MAX_TURNS,
+        summary_tokens: int = CONVERSATION_SUMMARY_TOKENS,
+        max_users: int = CONVERSATION_MAX_USERS
+    ):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_budget = summary_tokens
+        self.max_users = max_users
+        self._histories: "OrderedDict[int, _History]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.token_budget > 0
+
+    def _history(self, user_id: int) -> _History:
+        history = self._histories.get(user_id)
+        if history is None:
+            history = self._histories[user_id] = _History()
+            if len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+        else:
+            self._histories.move_to_end(user_id)
+        return history
+
+    def add_turn(self, user_id: int, role: str, text: str) -> None:
+        """
+        Acrescenta um turno e remove os mais antigos até caber no orçamento
+        """
+        if not self.enabled or not text:
+            return
+        history = self._history(user_id)
+        turn = Turn(role, text)
+        history.turns.append(turn)
+        history.tokens += turn.tokens
+
+        # O espaço do resumo fica reservado: os turnos removidos agora ainda vão entrar nele
+        while history.turns and (
+            history.tokens + self.summary_budget > self.token_budget
+            or len(history.turns) > self.max_turns
+        ):
+            old = history.turns.popleft()
+            history.tokens -= old.tokens
+            history.evicted.append(old)
+
+        if history.evicted:
+            self._schedule_summary(user_id)
+
+    def _schedule_summary(self, user_id: int) -> None:
+        try:
+            asyncio.get_running_loop().call_soon(self._summarize, user_id)
+        except RuntimeError:
+            # Sem event loop (uso síncrono): resume na hora
+            self._summarize(user_id)
+
+    def _summarize(self, user_id: int) -> None:
+        history = self._histories.get(user_id)
+        if history is None or not history.evicted:
+            return
+        evicted, history.evicted = history.evicted, []
+        for turn in evicted:
+            first_sentence = _SENTENCE_END.split(turn.text.strip(), 1)[0]
+            line = f"{turn.role}: {first_sentence[:_SUMMARY_LINE_CHARS]}"
+            history.summary.append(line)
+            history.summary_tokens += estimate_tokens(line)
+        while history.summary and history.summary_tokens + estimate_tokens(_SUMMARY_HEADER) > self.summary_budget:
+            history.summary_tokens -= estimate_tokens(history.summary.popleft())
+
+    def messages(self, user_id: int) -> List[Dict[str, str]]:
+        """
+        Retorna o histórico no formato de mensagens de chat (resumo primeiro)
+        """
+        history = self._histories.get(user_id)
+        if history is None:
+            return []
+        messages = []
+        if history.summary:
+            messages.append({
+                "role": "system",
+                "content": _SUMMARY_HEADER + "\n".join(history.summary)
+            })
+        messages.extend({"role": turn.role, "content": turn.text} for turn in history.turns)
+        return messages
+
+    def clear(self, user_id: int) -> None:
+        self._histories.pop(user_id, None)
+
+    def retain(self, keep: Callable[[int], bool]) -> int:
+        """
+        Descarta o histórico dos usuários para os quais `keep` retorna False
+        """
+        removed = [user_id for user_id in self._histories if not keep(user_id)]
+        for user_id in removed:
+            del self._histories[user_id]
+        return len(removed)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._histories),
+            "token_budget": self.token_budget,
+            "max_turns": self.max_turns
+        }
+
+def format_history_as_text(history: List[Dict[str, str]]) -> str:
+    """
+    Converte o histórico para o formato de prompt plano (ex.: Eden AI)
+    """
+    labels = {"user": "User", "assistant": "Assistant", "system": "Note"}
+    return "\n".join(f"{labels.get(m['role'], m['role'])}: {m['content']}" for m in history)
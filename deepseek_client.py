@@ -1,7 +1,11 @@
 import aiohttp
 import asyncio
+import json
 import logging
+from typing import AsyncIterator, List
 from config import DEEPSEEK_API_KEY, DEEPSEEK_API_URL
+from http_session import HTTPSessionManager
+from metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
@@ -13,49 +17,91 @@ class DeepSeekClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.http = HTTPSessionManager("deepseek")
 
-    async def get_response(self, message: str, context: dict = None) -> str:
+    async def start(self) -> None:
+        """
+        Open the pooled HTTP session
+        """
+        await self.http.start()
+
+    async def close(self) -> None:
+        """
+        Close the pooled HTTP session
+        """
+        await self.http.close()
+
+    async def health_check(self) -> int:
+        """
+        Check that the API answers (any HTTP status) and leave a warm connection in the pool
+        """
+        session = await self.http.get_session()
+        async with session.head(self.api_url, headers=self.headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status in (401, 403):
+                raise Exception(f"API key rejected (HTTP {response.status})")
+            return response.status
+
+    def pool_stats(self) -> dict:
+        """
+        Return connection pool statistics
+        """
+        return self.http.stats()
+
+    def _build_payload(self, message: str, context: str = None, stream: bool = False, history: List[dict] = None) -> dict:
+        """
+        Build the chat completion payload
+        """
+        system_prompt = """
+        You are an AI assistant that helps users manage their Notion workspace.
+        You can help create pages, search for content, and organize information.
+        When users mention databases or pages, try to understand their intent
+        and suggest appropriate actions.
+        """
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+        ]
+
+        if context:
+            messages.append({
+                "role": "system",
+                "content": f"Current context:\n{context}"
+            })
+
+        if history:
+            messages.extend(history)
+
+        messages.append({"role": "user", "content": message})
+
+        payload = {
+            "model": "deepseek-chat",
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @instrumented("deepseek", "chat")
+    async def get_response(self, message: str, context: str = None, history: List[dict] = None) -> str:
         """
         Get response from DeepSeek API asynchronously
         """
         try:
-            system_prompt = """
-            You are an AI assistant that helps users manage their Notion workspace.
-            You can help create pages, search for content, and organize information.
-            When users mention databases or pages, try to understand their intent
-            and suggest appropriate actions.
-            """
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-            ]
-
-            if context:
-                messages.append({
-                    "role": "system",
-                    "content": f"Current context: {str(context)}"
-                })
-
-            messages.append({"role": "user", "content": message})
-
-            payload = {
-                "model": "deepseek-chat",
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-
-                    return result['choices'][0]['message']['content']
+            payload = self._build_payload(message, context, history=history)
+
+            session = await self.http.get_session()
+            async with session.post(
+                self.api_url,
+                headers=self.headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                response.raise_for_status()
+                result = await response.json()
+
+                return result['choices'][0]['message']['content']
 
         except asyncio.TimeoutError:
             logger.error("Request to DeepSeek API timed out")
@@ -63,4 +109,48 @@ class DeepSeekClient:
 
         except Exception as e:
             logger.error(f"Error calling DeepSeek API: {str(e)}")
-            raise Exception(f"Error processing request: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error processing request: {str(e)}")
+
+    @instrumented("deepseek", "chat_stream")
+    async def stream_response(self, message: str, context: str = None, history: List[dict] = None) -> AsyncIterator[str]:
+        """
+        Stream the response from DeepSeek API, yielding text deltas as they arrive
+        """
+        try:
+            payload = self._build_payload(message, context, stream=True, history=history)
+
+            session = await self.http.get_session()
+            async with session.post(
+                self.api_url,
+                headers=self.headers,
+                json=payload,
+                # Sem limite total: o stream pode durar mais que 30s, mas cada leitura não
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+            ) as response:
+                response.raise_for_status()
+
+                # Server-Sent Events: uma linha "data: {...}" por chunk
+                async for raw_line in response.content:
+                    line = raw_line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+
+        except asyncio.TimeoutError:
+            logger.error("Streaming request to DeepSeek API timed out")
+            raise TimeoutError("The request to DeepSeek API timed out")
+
+        except Exception as e:
+            logger.error(f"Error streaming from DeepSeek API: {str(e)}")
+            raise Exception(f"Error processing request: {str(e)}")
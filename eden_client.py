@@ -1,20 +1,54 @@
 import aiohttp
 import asyncio
 import logging
-from config import EDEN_AI_API_KEY
+from typing import List
+from config import EDEN_AI_API_KEY, EDEN_AI_API_URL, SENTIMENT_PROVIDERS, SENTIMENT_TIMEOUT
+from http_session import HTTPSessionManager
+from conversation_memory import format_history_as_text
+from metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
 class EdenAIClient:
     def __init__(self):
         self.api_key = EDEN_AI_API_KEY
-        self.base_url = "https://api.edenai.run/v2"
+        self.base_url = EDEN_AI_API_URL
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.http = HTTPSessionManager("eden")
 
-    async def get_response(self, message: str, context: dict = None) -> str:
+    async def start(self) -> None:
+        """
+        Open the pooled HTTP session
+        """
+        await self.http.start()
+
+    async def close(self) -> None:
+        """
+        Close the pooled HTTP session
+        """
+        await self.http.close()
+
+    async def health_check(self) -> int:
+        """
+        Check that the API answers (any HTTP status) and leave a warm connection in the pool
+        """
+        session = await self.http.get_session()
+        async with session.head(self.base_url, headers=self.headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status in (401, 403):
+                raise Exception(f"API key rejected (HTTP {response.status})")
+            return response.status
+
+    def pool_stats(self) -> dict:
+        """
+        Return connection pool statistics
+        """
+        return self.http.stats()
+
+    @instrumented("eden", "generation")
+    async def get_response(self, message: str, context: str = None, history: List[dict] = None) -> str:
         """
         Get AI response using Eden AI's Text Generation API
         """
@@ -29,7 +63,10 @@ class EdenAIClient:
             and suggest appropriate actions.
             """
 
-            prompt = f"{system_prompt}\n\nContext: {str(context)}\n\nUser: {message}" if context else f"{system_prompt}\n\nUser: {message}"
+            prompt = f"{system_prompt}\n\nContext:\n{context}" if context else system_prompt
+            if history:
+                prompt += f"\n\n{format_history_as_text(history)}"
+            prompt += f"\n\nUser: {message}"
 
             payload = {
                 "providers": "openai",  # Você pode adicionar outros provedores como "anthropic", "cohere"
@@ -38,22 +75,22 @@ class EdenAIClient:
                 "max_tokens": 1000
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    endpoint,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    response.raise_for_status()
-                    result = await response.json()
+            session = await self.http.get_session()
+            async with session.post(
+                endpoint,
+                headers=self.headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                response.raise_for_status()
+                result = await response.json()
 
-                    # Eden AI retorna respostas de diferentes provedores
-                    # Vamos usar o OpenAI como padrão
-                    if result.get("openai") and result["openai"].get("generated_text"):
-                        return result["openai"]["generated_text"]
+                # Eden AI retorna respostas de diferentes provedores
+                # Vamos usar o OpenAI como padrão
+                if result.get("openai") and result["openai"].get("generated_text"):
+                    return result["openai"]["generated_text"]
 
-                    raise Exception("No valid response from Eden AI providers")
+                raise Exception("No valid response from Eden AI providers")
 
         except asyncio.TimeoutError:
             logger.error("Request to Eden AI timed out")
@@ -63,33 +100,43 @@ class EdenAIClient:
             logger.error(f"Error calling Eden AI: {str(e)}")
             raise Exception(f"Error processing request: {str(e)}")
 
-    async def analyze_sentiment(self, text: str) -> dict:
+    @instrumented("eden", "sentiment")
+    async def analyze_sentiment(self, text: str, providers: List[str] = None, timeout: float = SENTIMENT_TIMEOUT) -> dict:
         """
-        Analyze sentiment of a text using Eden AI
+        Analyze sentiment of a text using Eden AI, returning one result per provider
         """
+        providers = providers or SENTIMENT_PROVIDERS
         try:
             endpoint = f"{self.base_url}/text/sentiment_analysis"
 
             payload = {
-                "providers": "amazon,google",
+                "providers": ",".join(providers),
                 "text": text,
                 "language": "pt-BR"
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    endpoint,
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    response.raise_for_status()
-                    result = await response.json()
+            session = await self.http.get_session()
+            async with session.post(
+                endpoint,
+                headers=self.headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                response.raise_for_status()
+                result = await response.json()
+
+                results = {}
+                for provider in providers:
+                    data = result.get(provider, {})
+                    if data.get("status") == "fail":
+                        data = {"error": str(data.get("error") or "falha no provider")}
+                    results[provider] = data
+                return results
 
-                    return {
-                        "amazon": result.get("amazon", {}),
-                        "google": result.get("google", {})
-                    }
+        except asyncio.TimeoutError:
+            logger.error("Sentiment analysis request to Eden AI timed out")
+            raise TimeoutError("The sentiment analysis request to Eden AI timed out")
 
         except Exception as e:
             logger.error(f"Error in sentiment analysis: {str(e)}")
-            raise Exception(f"Error analyzing sentiment: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error analyzing sentiment: {str(e)}")
@@ -0,0 +1,99 @@
+import aiohttp
+import asyncio
+import logging
+from typing import Optional
+from config import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+class HTTPSessionManager:
+    """
+    Mantém uma aiohttp.ClientSession de longa duração com pool de conexões configurável.
+    A sessão é aberta em start() (ou no primeiro uso) e fechada em close().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache: int = HTTP_DNS_CACHE_TTL
+    ):
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+        self._requests = 0
+        self._sessions_opened = 0
+
+    async def start(self) -> aiohttp.ClientSession:
+        """
+        Abre a sessão compartilhada, caso ainda não esteja aberta
+        """
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.ttl_dns_cache
+                )
+                self._session = aiohttp.ClientSession(connector=connector)
+                self._sessions_opened += 1
+                logger.info(
+                    f"Sessão HTTP '{self.name}' aberta "
+                    f"(limit={self.limit}, limit_per_host={self.limit_per_host})"
+                )
+            return self._session
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Retorna a sessão compartilhada, abrindo-a sob demanda
+        """
+        session = self._session
+        if session is None or session.closed:
+            session = await self.start()
+        self._requests += 1
+        return session
+
+    async def close(self) -> None:
+        """
+        Fecha a sessão e libera as conexões do pool
+        """
+        async with self._lock:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+                logger.info(f"Sessão HTTP '{self.name}' fechada")
+            self._session = None
+
+    def stats(self) -> dict:
+        """
+        Retorna estatísticas do pool de conexões
+        """
+        stats = {
+            "name": self.name,
+            "open": self._session is not None and not self._session.closed,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "requests": self._requests,
+            "sessions_opened": self._sessions_opened,
+            "acquired": 0,
+            "idle": 0
+        }
+        if stats["open"]:
+            connector = self._session.connector
+            # Atributos internos do TCPConnector; podem não existir em todas as versões
+            acquired = getattr(connector, "_acquired", ())
+            idle = getattr(connector, "_conns", {})
+            stats["acquired"] = len(acquired)
+            stats["idle"] = sum(len(conns) for conns in idle.values())
+        return stats
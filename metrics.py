@@ -0,0 +1,388 @@
+import asyncio
+import bisect
+import inspect
+import logging
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from aiohttp import web
+from config import METRICS_LISTEN, METRICS_PORT
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Limites (em segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    def items(self) -> List[Tuple[tuple, object]]:
+        return sorted(self._values.items())
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class Counter(_Metric):
+    """
+    Contador monotônico por combinação de labels
+    """
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+class Gauge(_Metric):
+    """
+    Valor instantâneo (ex.: requisições em andamento)
+    """
+    kind = "gauge"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: tuple, value: float) -> None:
+        self._values[labels] = value
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+class Histogram(_Metric):
+    """
+    Histograma com buckets fixos; guarda contagens por bucket, soma e total
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: tuple, value: float) -> None:
+        data = self._values.get(labels)
+        if data is None:
+            # [contagem por bucket (não cumulativa, último = +Inf), soma, total]
+            data = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        data[0][bisect.bisect_left(self.buckets, value)] += 1
+        data[1] += value
+        data[2] += 1
+
+    def merged(self, match: Callable[[tuple], bool] = lambda labels: True) -> Tuple[List[int], float, int]:
+        """
+        Soma as séries cujos labels satisfazem `match`
+        """
+        counts = [0] * (len(self.buckets) + 1)
+        total_sum = 0.0
+        total = 0
+        for labels, (bucket_counts, value_sum, count) in self._values.items():
+            if match(labels):
+                counts = [a + b for a, b in zip(counts, bucket_counts)]
+                total_sum += value_sum
+                total += count
+        return counts, total_sum, total
+
+    def quantile(self, q: float, match: Callable[[tuple], bool] = lambda labels: True) -> float:
+        """
+        Estimativa do quantil por interpolação linear dentro do bucket (como histogram_quantile)
+        """
+        counts, _, total = self.merged(match)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, (bucket_counts, value_sum, count) in self.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(value_sum)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas exportadas no formato texto do Prometheus. Coletores
+    registrados com add_collector rodam só no momento da leitura.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Falha ao coletar métricas: {str(e)}")
+
+    def render(self) -> str:
+        self.collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HANDLER_REQUESTS = registry.counter(
+    "bot_handler_requests_total", "Updates processados por handler e resultado", ("handler", "outcome")
+)
+HANDLER_IN_FLIGHT = registry.gauge(
+    "bot_handler_in_flight", "Updates em processamento por handler", ("handler",)
+)
+HANDLER_DURATION = registry.histogram(
+    "bot_handler_duration_seconds", "Duração dos handlers", ("handler", "outcome")
+)
+PROVIDER_REQUESTS = registry.counter(
+    "bot_provider_requests_total", "Chamadas aos serviços externos", ("provider", "operation", "outcome", "status")
+)
+PROVIDER_IN_FLIGHT = registry.gauge(
+    "bot_provider_in_flight", "Chamadas em andamento aos serviços externos", ("provider", "operation")
+)
+PROVIDER_DURATION = registry.histogram(
+    "bot_provider_request_duration_seconds", "Duração das chamadas aos serviços externos", ("provider", "operation", "outcome")
+)
+LOOP_LAG = registry.histogram(
+    "bot_event_loop_lag_seconds", "Atraso do event loop medido pelo monitor",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+COMPONENT_STATS = registry.gauge(
+    "bot_component_stat", "Estatísticas numéricas dos componentes (filas, caches, índice)", ("component", "stat")
+)
+
+def _outcome(error: Optional[BaseException]) -> str:
+    if error is None:
+        return "ok"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    return "error"
+
+def _status(error: Optional[BaseException]) -> str:
+    """
+    Código HTTP do erro; os clientes relançam como Exception(msg), então
+    o código pode estar na exceção original (__cause__/__context__)
+    """
+    if error is None:
+        return "200"
+    current = error
+    while current is not None:
+        status = getattr(current, "status", None)
+        if isinstance(status, int):
+            return str(status)
+        current = current.__cause__ or current.__context__
+    return _outcome(error)
+
+def _record(provider: str, operation: str, duration: float, error: Optional[BaseException]) -> None:
+    outcome = _outcome(error)
+    PROVIDER_IN_FLIGHT.dec((provider, operation))
+    PROVIDER_REQUESTS.inc((provider, operation, outcome, _status(error)))
+    PROVIDER_DURATION.observe((provider, operation, outcome), duration)
+
+def instrumented(provider: str, operation: str):
+    """
+    Decorator que mede chamadas a um serviço externo (e abre um span no
+    trace atual). Em geradores assíncronos só conta o tempo gasto dentro
+    do gerador, não o do consumidor, e não há span.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def generator_wrapper(*args, **kwargs):
+                PROVIDER_IN_FLIGHT.inc((provider, operation))
+                elapsed = 0.0
+                error = None
+                iterator = func(*args, **kwargs)
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = await iterator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            elapsed += time.perf_counter() - started
+                        yield item
+                except GeneratorExit:
+                    # O consumidor parou antes do fim (ex.: limite atingido): não é erro
+                    raise
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    await iterator.aclose()
+                    _record(provider, operation, elapsed, error)
+            return generator_wrapper
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            PROVIDER_IN_FLIGHT.inc((provider, operation))
+            started = time.perf_counter()
+            error = None
+            try:
+                with span(f"{provider}.{operation}"):
+                    return await func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _record(provider, operation, time.perf_counter() - started, error)
+        return wrapper
+    return decorator
+
+def instrument_handler(name: str, callback):
+    """
+    Envolve o callback de um handler do Telegram com contador, gauge e histograma
+    """
+    @wraps(callback)
+    async def wrapper(update, context):
+        HANDLER_IN_FLIGHT.inc((name,))
+        started = time.perf_counter()
+        error = None
+        try:
+            return await callback(update, context)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            outcome = _outcome(error)
+            HANDLER_IN_FLIGHT.dec((name,))
+            HANDLER_REQUESTS.inc((name, outcome))
+            HANDLER_DURATION.observe((name, outcome), time.perf_counter() - started)
+    return wrapper
+
+def export_stats(component: str, stats: dict) -> None:
+    """
+    Publica os valores numéricos de um dicionário stats() como gauges
+    """
+    for stat, value in stats.items():
+        if isinstance(value, (int, float)):
+            COMPONENT_STATS.set((component, stat), value)
+
+def summary() -> Dict[str, Dict[str, dict]]:
+    """
+    Resumo por handler e por provider/operação: total, erros, em andamento, p50 e p95
+    """
+    def rows(counter: Counter, gauge: Gauge, histogram: Histogram, key_size: int, outcome_index: int) -> Dict[str, dict]:
+        result: Dict[str, dict] = {}
+        for labels, count in counter.items():
+            key = labels[:key_size]
+            row = result.setdefault("/".join(key), {"requests": 0, "errors": 0, "in_flight": gauge.value(key)})
+            row["requests"] += count
+            if labels[outcome_index] != "ok":
+                row["errors"] += count
+        for name, row in result.items():
+            key = tuple(name.split("/"))
+            match = lambda labels, key=key: labels[:key_size] == key
+            row["p50"] = histogram.quantile(0.5, match)
+            row["p95"] = histogram.quantile(0.95, match)
+        return result
+
+    return {
+        "handlers": rows(HANDLER_REQUESTS, HANDLER_IN_FLIGHT, HANDLER_DURATION, 1, 1),
+        "providers": rows(PROVIDER_REQUESTS, PROVIDER_IN_FLIGHT, PROVIDER_DURATION, 2, 2)
+    }
+
+class MetricsServer:
+    """
+    Servidor HTTP local que expõe GET /metrics no formato texto do Prometheus
+    """
+
+    def __init__(self, listen: str = METRICS_LISTEN, port: int = METRICS_PORT, metrics: MetricsRegistry = registry):
+        self.listen = listen
+        self.port = port
+        self.metrics = metrics
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.port > 0
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.metrics.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+
+    async def start(self) -> None:
+        """
+        Inicia o servidor (porta 0 desativa)
+        """
+        if not self.enabled:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port)
+        await site.start()
+        logger.info(f"Métricas disponíveis em http://{self.listen}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """
+        Encerra o servidor HTTP
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,367 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
+from rate_limiter import TokenBucket
+from context_builder import terms
+from config import (
+    NOTION_INDEX_PATH,
+    NOTION_INDEX_SYNC_INTERVAL,
+    NOTION_INDEX_FULL_SYNC_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# Peso do título em relação ao conteúdo no ranking (bm25)
+_TITLE_WEIGHT = 10.0
+
+def _match_query(query: str) -> str:
+    """
+    Converte o texto (ex.: a mensagem inteira do usuário) numa consulta FTS5
+    segura: os termos-chave, sem stopwords, entre aspas, com busca por
+    prefixo e unidos por OR; o bm25 ordena as páginas que casam mais termos
+    """
+    return " OR ".join(f'"{term}"*' for term in sorted(terms(query)))
+
+class NotionIndex:
+    """
+    Índice local (SQLite FTS5) com título e conteúdo das páginas do Notion.
+    A sincronização é incremental: as páginas são percorridas da edição
+    mais recente para a mais antiga e a varredura para na marca d'água
+    (maior last_edited_time da última sincronização completa). Uma página
+    que falhou segura a marca d'água na sua edição, para ser tentada de
+    novo na próxima varredura. De tempos em tempos uma varredura completa
+    remove páginas apagadas. Com `bucket`, cada requisição ao Notion
+    consome um token do limite de taxa compartilhado com a fila de /save.
+    """
+
+    def __init__(
+        self,
+        notion,
+        path: str = NOTION_INDEX_PATH,
+        sync_interval: float = NOTION_INDEX_SYNC_INTERVAL,
+        full_sync_interval: float = NOTION_INDEX_FULL_SYNC_INTERVAL,
+        bucket: Optional[TokenBucket] = None
+    ):
+        self.notion = notion
+        self.bucket = bucket
+        self.path = path
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        # Uma única thread acessa o banco
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notion-index")
+        self._sync_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.available = True
+        self.ready = False
+        self.syncing = False
+        self.watermark: Optional[str] = None
+        self.last_sync_at: Optional[float] = None
+        self.last_full_sync_at: Optional[float] = None
+        self.last_sync_duration = 0.0
+        self.page_count = 0
+        self.pages_indexed = 0
+        self.pages_scanned = 0
+        self.pages_failed = 0
+        self.syncs = 0
+        self.sync_errors = 0
+        self.searches = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sync_interval > 0 and self.available
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "id INTEGER PRIMARY KEY, "
+                "page_id TEXT NOT NULL UNIQUE, "
+                "title TEXT NOT NULL, "
+                "url TEXT NOT NULL, "
+                "last_edited TEXT NOT NULL, "
+                "database_id TEXT, "
+                "indexed_at REAL NOT NULL)"
+            )
+            # O rowid do texto indexado é o id da linha em pages.
+            # remove_diacritics: "reuniao" encontra "reunião"
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5("
+                "title, content, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _load_meta(self) -> dict:
+        return dict(self._db().execute("SELECT key, value FROM index_meta").fetchall())
+
+    def _save_meta(self, values: dict) -> None:
+        with self._db() as conn:
+            conn.executemany(
+                "INSERT INTO index_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                [(key, str(value)) for key, value in values.items()]
+            )
+
+    def _indexed_edit_time(self, page_id: str) -> Optional[str]:
+        row = self._db().execute("SELECT last_edited FROM pages WHERE page_id = ?", (page_id,)).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, page: dict, content: str) -> bool:
+        """
+        Grava a página no índice; retorna True se ela ainda não estava indexada
+        """
+        values = (page["title"], page["url"], page["last_edited"], page["database_id"], time.time())
+        with self._db() as conn:
+            row = conn.execute("SELECT id FROM pages WHERE page_id = ?", (page["id"],)).fetchone()
+            if row is None:
+                rowid = conn.execute(
+                    "INSERT INTO pages (title, url, last_edited, database_id, indexed_at, page_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    values + (page["id"],)
+                ).lastrowid
+            else:
+                rowid = row[0]
+                conn.execute(
+                    "UPDATE pages SET title = ?, url = ?, last_edited = ?, database_id = ?, indexed_at = ? "
+                    "WHERE id = ?",
+                    values + (rowid,)
+                )
+                conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (rowid,))
+            conn.execute(
+                "INSERT INTO pages_fts (rowid, title, content) VALUES (?, ?, ?)",
+                (rowid, page["title"], content)
+            )
+        return row is None
+
+    def _remove_missing(self, seen: Set[str]) -> int:
+        stored = self._db().execute("SELECT id, page_id FROM pages").fetchall()
+        missing = [(rowid,) for rowid, page_id in stored if page_id not in seen]
+        if missing:
+            with self._db() as conn:
+                conn.executemany("DELETE FROM pages_fts WHERE rowid = ?", missing)
+                conn.executemany("DELETE FROM pages WHERE id = ?", missing)
+        return len(missing)
+
+    def _search(self, query: str, limit: int) -> List[dict]:
+        rows = self._db().execute(
+            "SELECT p.page_id, p.title, p.url, p.last_edited, p.database_id "
+            "FROM pages_fts f JOIN pages p ON p.id = f.rowid "
+            f"WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, {_TITLE_WEIGHT}, 1.0) LIMIT ?",
+            (_match_query(query), limit)
+        ).fetchall()
+        return [
+            {
+                "id": page_id,
+                "title": title,
+                "url": url,
+                "last_edited": last_edited,
+                "database_id": database_id or "N/A"
+            }
+            for page_id, title, url, last_edited, database_id in rows
+        ]
+
+    def _page_count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    async def search(self, query: str, limit: int = 5) -> Optional[List[dict]]:
+        """
+        Busca no índice local, ordenando por relevância.
+        Retorna None se o índice ainda não puder responder (o chamador usa o Notion).
+        """
+        if not self.enabled or not self.ready or not _match_query(query):
+            self.fallbacks += 1
+            return None
+        self.searches += 1
+        try:
+            started = time.perf_counter()
+            results = await self._run(self._search, query, limit)
+            logger.info(f"Busca local por '{query}': {len(results)} resultados em {(time.perf_counter() - started) * 1000:.1f} ms")
+            return results
+        except sqlite3.Error as e:
+            logger.error(f"Erro na busca do índice local: {str(e)}")
+            self.fallbacks += 1
+            return None
+
+    async def sync(self, full: bool = False) -> int:
+        """
+        Indexa as páginas editadas desde a última sincronização e retorna quantas
+        foram (re)indexadas. Com full=True percorre tudo e remove páginas apagadas.
+        """
+        started = time.monotonic()
+        self.syncing = True
+        scanned = 0
+        indexed = 0
+        failed = 0
+        seen: Set[str] = set()
+        newest = self.watermark
+        # Edição mais antiga entre as páginas que falharam: a marca d'água não passa dela
+        retry_from: Optional[str] = None
+        try:
+            async for page in self.notion.iter_pages("", bucket=self.bucket):
+                # Ordenado por last_edited_time decrescente: o resto já está indexado
+                if not full and self.watermark and page["last_edited"] < self.watermark:
+                    break
+                scanned += 1
+                seen.add(page["id"])
+                if newest is None or page["last_edited"] > newest:
+                    newest = page["last_edited"]
+
+                if await self._run(self._indexed_edit_time, page["id"]) == page["last_edited"]:
+                    continue
+                try:
+                    content = await self.notion.get_page_content(page["id"], page["last_edited"], bucket=self.bucket)
+                except Exception as e:
+                    # Uma página problemática não interrompe a sincronização
+                    logger.warning(f"Página {page['id']} não indexada: {str(e)}")
+                    failed += 1
+                    if retry_from is None or page["last_edited"] < retry_from:
+                        retry_from = page["last_edited"]
+                    continue
+                if await self._run(self._upsert, page, content):
+                    self.page_count += 1
+                indexed += 1
+
+            removed = await self._run(self._remove_missing, seen) if full else 0
+            self.page_count -= removed
+        except Exception as e:
+            self.sync_errors += 1
+            logger.error(f"Erro ao sincronizar o índice do Notion: {str(e)}")
+            raise
+        finally:
+            self.syncing = False
+            self.pages_scanned = scanned
+            self.pages_failed = failed
+
+        # A marca d'água só avança depois de uma varredura sem erros, e nunca
+        # além de uma página que falhou (a varredura para só em edições anteriores a ela)
+        if retry_from is not None and (newest is None or retry_from < newest):
+            newest = retry_from
+        now = time.time()
+        self.watermark = newest
+        self.last_sync_at = now
+        meta = {"last_sync_at": now}
+        if newest:
+            meta["watermark"] = newest
+        if full:
+            self.last_full_sync_at = now
+            meta["last_full_sync_at"] = now
+        await self._run(self._save_meta, meta)
+
+        self.syncs += 1
+        self.pages_indexed += indexed
+        self.last_sync_duration = time.monotonic() - started
+        self.ready = True
+        logger.info(
+            f"Índice do Notion sincronizado ({'completo' if full else 'incremental'}): "
+            f"{scanned} páginas verificadas, {indexed} indexadas, {failed} com erro, {removed} removidas "
+            f"em {self.last_sync_duration:.1f}s"
+        )
+        return indexed
+
+    def _needs_full_sync(self) -> bool:
+        return (
+            self.watermark is None
+            or self.last_full_sync_at is None
+            or time.time() - self.last_full_sync_at >= self.full_sync_interval
+        )
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                await self.sync(full=self._needs_full_sync())
+            except Exception:
+                # Já registrado em sync(); tenta de novo no próximo ciclo
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def request_sync(self) -> None:
+        """
+        Antecipa a próxima sincronização (ex.: após criar uma página)
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """
+        Abre o índice e inicia a sincronização periódica em segundo plano
+        """
+        if self.sync_interval <= 0 or self._sync_task is not None:
+            return
+        try:
+            meta = await self._run(self._load_meta)
+            self.page_count = await self._run(self._page_count)
+        except sqlite3.OperationalError as e:
+            # SQLite compilado sem FTS5: as buscas continuam indo ao Notion
+            self.available = False
+            logger.warning(f"Índice local do Notion indisponível: {str(e)}")
+            return
+        self.watermark = meta.get("watermark")
+        self.last_sync_at = float(meta["last_sync_at"]) if "last_sync_at" in meta else None
+        self.last_full_sync_at = float(meta["last_full_sync_at"]) if "last_full_sync_at" in meta else None
+        # Um índice de execuções anteriores já responde enquanto a sincronização roda
+        self.ready = self.last_sync_at is not None
+        self._wakeup = asyncio.Event()
+        self._sync_task = asyncio.create_task(self._sync_loop())
+        logger.info(f"Índice local do Notion em '{self.path}' iniciado")
+
+    async def close(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        await self._run(self._close_db)
+        self._executor.shutdown(wait=True)
+
+    def _close_db(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> dict:
+        """
+        Progresso da sincronização, tamanho e defasagem do índice
+        """
+        size = sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(self.path + suffix)
+        )
+        return {
+            "path": self.path,
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "syncing": self.syncing,
+            "pages": self.page_count,
+            "size_bytes": size,
+            "watermark": self.watermark,
+            "staleness": time.time() - self.last_sync_at if self.last_sync_at else None,
+            "last_sync_duration": self.last_sync_duration,
+            "last_scanned": self.pages_scanned,
+            "last_failed": self.pages_failed,
+            "pages_indexed": self.pages_indexed,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "searches": self.searches,
+            "fallbacks": self.fallbacks
+        }
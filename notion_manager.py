@@ -1,55 +1,305 @@
+import asyncio
 import logging
-from notion_client import Client, APIResponseError
-from config import NOTION_TOKEN
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from notion_client import AsyncClient, APIResponseError
+from notion_client.errors import APIErrorCode
+from config import (
+    NOTION_TOKEN,
+    NOTION_DATABASE_ID,
+    NOTION_API_URL,
+    NOTION_FETCH_CONCURRENCY,
+    NOTION_PAGE_CACHE_SIZE
+)
+from metrics import instrumented
+from rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# Maior page_size aceito pelos endpoints paginados do Notion
+NOTION_MAX_PAGE_SIZE = 100
+
+# Limites do Notion por requisição: 2000 caracteres por objeto de texto,
+# 100 blocos por chamada e ~500 KB de payload (usamos uma margem)
+NOTION_TEXT_LIMIT = 2000
+NOTION_MAX_BLOCKS_PER_REQUEST = 100
+NOTION_MAX_REQUEST_BYTES = 400_000
+
+def _utf16_len(text: str) -> int:
+    # O Notion mede o tamanho do texto em unidades UTF-16 (emojis contam 2)
+    return len(text.encode("utf-16-le")) // 2
+
+def split_text(text: str, limit: int = NOTION_TEXT_LIMIT) -> List[str]:
+    """
+    Divide o texto em pedaços aceitos pelo Notion, preferindo quebrar em
+    fim de linha ou espaço em vez de no meio de uma palavra
+    """
+    chunks = []
+    while text:
+        piece = text[:limit]
+        excess = _utf16_len(piece) - limit
+        while excess > 0:
+            # Cada caractere ocupa 1 ou 2 unidades: remove o mínimo sem esvaziar o pedaço
+            piece = piece[:len(piece) - (excess + 1) // 2]
+            excess = _utf16_len(piece) - limit
+
+        if len(piece) == len(text):
+            chunks.append(piece)
+            break
+
+        cut = piece.rfind("\n")
+        if cut >= limit // 2:
+            # A quebra de linha vira a separação entre blocos
+            chunks.append(piece[:cut])
+            text = text[cut + 1:]
+            continue
+        cut = piece.rfind(" ")
+        if cut >= limit // 2:
+            piece = piece[:cut + 1]
+        chunks.append(piece)
+        text = text[len(piece):]
+    return chunks
+
+def _paragraph_block(text: str) -> dict:
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [{"type": "text", "text": {"content": text}}]
+        }
+    }
+
+def _batch_blocks(blocks: List[dict]) -> List[List[dict]]:
+    """
+    Agrupa os blocos em lotes que respeitam os limites por requisição
+    """
+    batches = []
+    batch: List[dict] = []
+    size = 0
+    for block in blocks:
+        block_size = len(block["paragraph"]["rich_text"][0]["text"]["content"].encode("utf-8"))
+        if batch and (len(batch) >= NOTION_MAX_BLOCKS_PER_REQUEST or size + block_size > NOTION_MAX_REQUEST_BYTES):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(block)
+        size += block_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _plain_text(rich_text: List[dict]) -> str:
+    return "".join(part.get("plain_text", "") for part in rich_text or [])
+
+def _render_block(block: dict, number: int) -> Optional[str]:
+    """
+    Converte um bloco em uma linha de texto (None para blocos sem texto)
+    """
+    block_type = block["type"]
+    data = block.get(block_type, {})
+    text = _plain_text(data.get("rich_text"))
+
+    if block_type == "heading_1":
+        return f"# {text}"
+    if block_type == "heading_2":
+        return f"## {text}"
+    if block_type == "heading_3":
+        return f"### {text}"
+    if block_type == "bulleted_list_item":
+        return f"- {text}"
+    if block_type == "numbered_list_item":
+        return f"{number}. {text}"
+    if block_type == "to_do":
+        return f"[{'x' if data.get('checked') else ' '}] {text}"
+    if block_type == "quote":
+        return f"> {text}"
+    if block_type == "callout":
+        icon = (data.get("icon") or {}).get("emoji", "")
+        return f"{icon} {text}".strip()
+    if block_type == "code":
+        return f"```{data.get('language', '')}\n{text}\n```"
+    if block_type == "equation":
+        return data.get("expression", "")
+    if block_type in ("child_page", "child_database"):
+        return f"[{data.get('title', '')}]"
+    if block_type in ("bookmark", "embed", "link_preview"):
+        caption = _plain_text(data.get("caption"))
+        return f"{caption} {data.get('url', '')}".strip()
+    if block_type == "table_row":
+        return " | ".join(_plain_text(cell) for cell in data.get("cells", []))
+    if block_type == "divider":
+        return "---"
+    if "rich_text" in data:
+        # paragraph, toggle e outros tipos que só carregam texto
+        return text
+    return None
+
+def render_blocks(blocks: List[dict], depth: int = 0) -> List[str]:
+    """
+    Renderiza a árvore de blocos como linhas de texto, indentando os filhos
+    """
+    lines = []
+    indent = "  " * depth
+    number = 0
+    for block in blocks:
+        number = number + 1 if block["type"] == "numbered_list_item" else 0
+        line = _render_block(block, number)
+        if line:
+            lines.append(indent + line.replace("\n", "\n" + indent))
+        if block.get("children"):
+            lines.extend(render_blocks(block["children"], depth + 1))
+    return lines
+
+def _database_rejected(error: APIResponseError) -> bool:
+    """
+    Indica se o Notion recusou o banco de destino (inexistente, sem acesso ou ID inválido)
+    """
+    if error.code == APIErrorCode.ObjectNotFound or getattr(error, "status", None) == 404:
+        return True
+    return error.code == APIErrorCode.ValidationError and "database" in str(error).lower()
+
 class NotionManager:
     def __init__(self):
-        if not NOTION_TOKEN:
-            logger.error("NOTION_TOKEN não configurado")
-            raise ValueError("Token do Notion não configurado")
+        # Cliente assíncrono criado no primeiro uso: importar o bot não abre conexões
+        self._client: Optional[AsyncClient] = None
+        # Banco padrão: o configurado ou, na falta dele, o primeiro encontrado
+        # (resolvido uma única vez e descartado se o Notion recusar o ID)
+        self.default_database_id: Optional[str] = NOTION_DATABASE_ID
+        self._database_lock = asyncio.Lock()
+        # Conteúdo de páginas por page_id, válido enquanto last_edited_time não mudar
+        self.fetch_concurrency = NOTION_FETCH_CONCURRENCY
+        self.page_cache_size = NOTION_PAGE_CACHE_SIZE
+        self._page_cache: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._page_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.page_cache_hits = 0
+        self.page_cache_misses = 0
+        self.block_requests = 0
+        # Índice local de busca (NotionIndex), conectado pelo bot
+        self.index = None
+
+    @property
+    def fetch_concurrency(self) -> int:
+        return self._fetch_concurrency
+
+    @fetch_concurrency.setter
+    def fetch_concurrency(self, value: int) -> None:
+        # Um semáforo por instância: leituras simultâneas de páginas dividem o mesmo limite
+        self._fetch_concurrency = value
+        self._fetch_semaphore = asyncio.Semaphore(value)
 
-        logger.info("Inicializando NotionManager")
-        self.client = Client(auth=NOTION_TOKEN)
+    @property
+    def client(self) -> AsyncClient:
+        """
+        Cliente assíncrono do Notion, criado no primeiro uso
+        """
+        if self._client is None:
+            if not NOTION_TOKEN:
+                logger.error("NOTION_TOKEN não configurado")
+                raise ValueError("Token do Notion não configurado")
+            self._client = AsyncClient(auth=NOTION_TOKEN, base_url=NOTION_API_URL)
+            logger.info("Cliente do Notion criado")
+        return self._client
 
-        # Verifica se a integração tem acesso básico
+    @instrumented("notion", "verify_connection")
+    async def verify_connection(self) -> None:
+        """
+        Verifica se a integração tem acesso básico ao Notion
+        """
         try:
-            self.client.users.me()
+            await self.client.users.me()
             logger.info("Conexão com Notion estabelecida com sucesso")
         except APIResponseError as e:
             logger.error(f"Erro ao verificar acesso ao Notion: {str(e)}")
             raise ValueError("Erro de autenticação com o Notion")
 
-    async def list_databases(self) -> list:
+    async def close(self) -> None:
         """
-        Lista todos os bancos de dados acessíveis
+        Fecha o cliente HTTP do Notion
         """
-        try:
-            logger.info("Buscando todos os bancos de dados acessíveis")
-            response = self.client.search(
-                query="",
-                filter={
-                    "value": "database",
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _paginate_search(
+        self,
+        object_type: str,
+        query: str = "",
+        limit: Optional[int] = None,
+        sort: dict = None,
+        bucket: Optional[TokenBucket] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Percorre os resultados da busca do Notion página a página (start_cursor/has_more),
+        pedindo apenas a quantidade ainda necessária e parando assim que `limit` é atingido.
+        Com `bucket`, cada requisição consome um token do limite de taxa
+        """
+        cursor = None
+        produced = 0
+        while limit is None or produced < limit:
+            page_size = NOTION_MAX_PAGE_SIZE if limit is None else min(NOTION_MAX_PAGE_SIZE, limit - produced)
+            params = {
+                "query": query,
+                "filter": {
+                    "value": object_type,
                     "property": "object"
                 },
-                page_size=50
-            )
+                "page_size": page_size
+            }
+            if sort:
+                params["sort"] = sort
+            if cursor:
+                params["start_cursor"] = cursor
 
-            results = response.get("results", [])
-            if not results:
-                logger.info("Nenhum banco de dados encontrado")
-                return []
+            if bucket is not None:
+                await bucket.acquire()
+            response = await self.client.search(**params)
+            for result in response.get("results", []):
+                yield result
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
 
-            databases = [{
-                "id": db["id"],
-                "title": db["title"][0]["plain_text"] if db.get("title") else "Sem título",
-                "description": db.get("description", "Sem descrição"),
-                "url": db.get("url", "")  # Adicionando URL para referência
-            } for db in results]
+            if not response.get("has_more"):
+                return
+            cursor = response.get("next_cursor")
 
-            logger.info(f"Encontrados {len(databases)} bancos de dados")
-            return databases
+    @staticmethod
+    def _format_database(db: dict) -> dict:
+        return {
+            "id": db["id"],
+            "title": db["title"][0]["plain_text"] if db.get("title") else "Sem título",
+            "description": "".join(t.get("plain_text", "") for t in db.get("description") or []),
+            "url": db.get("url", "")  # Adicionando URL para referência
+        }
+
+    @staticmethod
+    def _format_page(page: dict) -> dict:
+        # Páginas de bancos usam a propriedade "Name"; as demais, a propriedade do tipo título
+        properties = page.get("properties", {})
+        title = properties.get("Name", {}).get("title")
+        if title is None:
+            title = next((p["title"] for p in properties.values() if p.get("type") == "title"), [])
+        return {
+            "id": page["id"],
+            "title": title[0]["plain_text"] if title else "Sem título",
+            "url": page["url"],
+            "last_edited": page.get("last_edited_time", "Desconhecido"),
+            "database_id": page.get("parent", {}).get("database_id", "N/A")
+        }
+
+    @instrumented("notion", "iter_databases")
+    async def iter_databases(self, limit: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Itera sobre os bancos de dados acessíveis, buscando-os sob demanda
+        """
+        async for db in self._iter_databases(limit):
+            yield db
+
+    async def _iter_databases(self, limit: Optional[int] = None, bucket: Optional[TokenBucket] = None) -> AsyncIterator[dict]:
+        # Sem métricas próprias: é medido uma única vez, pela chamada pública que o usa
+        try:
+            logger.info("Buscando bancos de dados acessíveis")
+            async for db in self._paginate_search("database", limit=limit, bucket=bucket):
+                yield self._format_database(db)
 
         except APIResponseError as e:
             error_msg = f"Erro na API do Notion ao listar bancos: {str(e)}"
@@ -60,48 +310,116 @@ class NotionManager:
             logger.error(error_msg)
             raise Exception("Erro ao listar bancos de dados do Notion")
 
-    async def create_page(self, title: str, content: str, database_id: str = None) -> dict:
+    @instrumented("notion", "list_databases")
+    async def list_databases(self) -> list:
+        """
+        Lista todos os bancos de dados acessíveis
+        """
+        databases = [db async for db in self._iter_databases()]
+        if not databases:
+            logger.info("Nenhum banco de dados encontrado")
+        else:
+            logger.info(f"Encontrados {len(databases)} bancos de dados")
+        return databases
+
+    @instrumented("notion", "resolve_default_database")
+    async def resolve_default_database(self, bucket: Optional[TokenBucket] = None) -> str:
+        """
+        Retorna o ID do banco padrão, buscando o primeiro disponível só na primeira vez
+        """
+        if self.default_database_id:
+            return self.default_database_id
+        async with self._database_lock:
+            if not self.default_database_id:
+                async for db in self._iter_databases(limit=1, bucket=bucket):
+                    self.default_database_id = db["id"]
+                    logger.info(f"Usando primeiro banco de dados disponível: {db['id']}")
+                if not self.default_database_id:
+                    raise ValueError("Nenhum banco de dados disponível")
+        return self.default_database_id
+
+    def invalidate_default_database(self) -> None:
+        """
+        Descarta o banco padrão em cache para que seja resolvido novamente
+        """
+        if self.default_database_id and self.default_database_id != NOTION_DATABASE_ID:
+            logger.info(f"Descartando banco padrão em cache: {self.default_database_id}")
+        self.default_database_id = NOTION_DATABASE_ID
+
+    @instrumented("notion", "create_page")
+    async def create_page(
+        self,
+        title: str,
+        content: str,
+        database_id: str = None,
+        progress: Optional[dict] = None,
+        bucket: Optional[TokenBucket] = None
+    ) -> dict:
         """
         Cria uma nova página em um banco de dados do Notion
-        Se database_id não for fornecido, usa o primeiro banco disponível
+        Se database_id não for fornecido, usa o banco padrão.
+        O conteúdo completo vai para o corpo da página, em blocos de até 2000 caracteres.
+        Páginas longas levam várias requisições: `progress` (dict do chamador) registra a
+        página criada e os lotes já enviados, e uma nova chamada com ele retoma de onde parou.
+        Com `bucket`, cada requisição (busca do banco padrão, criação e cada anexo) consome um token
         """
+        progress = progress if progress is not None else {}
+        use_default = not database_id and not progress.get("page_id")
         try:
-            if not database_id:
-                # Busca o primeiro banco de dados disponível
-                databases = await self.list_databases()
-                if not databases:
-                    raise ValueError("Nenhum banco de dados disponível")
-                database_id = databases[0]["id"]
-                logger.info(f"Usando primeiro banco de dados disponível: {database_id}")
-
-            logger.info(f"Criando página '{title}' no banco {database_id}")
-            content_truncated = content[:2000]
-            if len(content) > 2000:
-                logger.warning(f"Conteúdo truncado de {len(content)} para 2000 caracteres")
-
-            new_page = self.client.pages.create(
-                parent={"database_id": database_id},
-                properties={
-                    "Name": {
-                        "title": [
-                            {
-                                "text": {
-                                    "content": title
+            if progress.get("page_id"):
+                database_id = progress["database_id"]
+            elif use_default:
+                database_id = await self.resolve_default_database(bucket)
+
+            chunks = split_text(content)
+            batches = _batch_blocks([_paragraph_block(chunk) for chunk in chunks])
+
+            if progress.get("page_id"):
+                new_page = {"id": progress["page_id"], "url": progress["url"]}
+                logger.info(
+                    f"Retomando a página '{title}' ({new_page['id']}) "
+                    f"no lote {progress['batches_sent'] + 1} de {len(batches)}"
+                )
+            else:
+                logger.info(
+                    f"Criando página '{title}' no banco {database_id} "
+                    f"({len(content)} caracteres, {len(chunks)} blocos, {max(1, len(batches))} requisições)"
+                )
+                if bucket is not None:
+                    await bucket.acquire()
+                new_page = await self.client.pages.create(
+                    parent={"database_id": database_id},
+                    properties={
+                        "Name": {
+                            "title": [
+                                {
+                                    "text": {
+                                        "content": title
+                                    }
                                 }
-                            }
-                        ]
-                    },
-                    "Content": {
-                        "rich_text": [
-                            {
-                                "text": {
-                                    "content": content_truncated
+                            ]
+                        },
+                        "Content": {
+                            "rich_text": [
+                                {
+                                    "text": {
+                                        # Prévia; o texto completo está nos blocos da página
+                                        "content": chunks[0] if chunks else ""
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                }
-            )
+                            ]
+                        }
+                    },
+                    children=batches[0] if batches else []
+                )
+                progress.update(page_id=new_page["id"], url=new_page["url"], database_id=database_id, batches_sent=1)
+
+            # Os lotes restantes são anexados em ordem; uma falha aqui não recria a página
+            for index in range(progress["batches_sent"], len(batches)):
+                if bucket is not None:
+                    await bucket.acquire()
+                await self.client.blocks.children.append(block_id=new_page["id"], children=batches[index])
+                progress["batches_sent"] = index + 1
 
             logger.info(f"Página criada com sucesso: {new_page['id']}")
             return {
@@ -112,51 +430,41 @@ class NotionManager:
             }
 
         except APIResponseError as e:
+            # Só quando o banco sumiu ou foi recusado; 429, 409 e 5xx são transitórios
+            if use_default and _database_rejected(e):
+                self.invalidate_default_database()
             error_msg = f"Erro na API do Notion ao criar página: {str(e)}"
             logger.error(error_msg)
-            raise Exception(error_msg)
+            # Mantém o erro original (status, Retry-After) para quem for tentar de novo
+            raise Exception(error_msg) from e
         except Exception as e:
             error_msg = f"Erro inesperado ao criar página: {str(e)}"
             logger.error(error_msg)
-            raise Exception("Erro ao criar página no Notion")
+            raise Exception("Erro ao criar página no Notion") from e
 
-    async def search_pages(self, query: str) -> list:
+    @instrumented("notion", "iter_pages")
+    async def iter_pages(self, query: str, limit: Optional[int] = None, bucket: Optional[TokenBucket] = None) -> AsyncIterator[dict]:
         """
-        Busca páginas em todos os bancos de dados acessíveis
+        Itera sobre as páginas que correspondem à busca, das mais recentes para as mais antigas
         """
+        async for page in self._iter_pages(query, limit, bucket):
+            yield page
+
+    async def _iter_pages(self, query: str, limit: Optional[int] = None, bucket: Optional[TokenBucket] = None) -> AsyncIterator[dict]:
+        # Sem métricas próprias: é medido uma única vez, pela chamada pública que o usa
         try:
             logger.info(f"Buscando páginas com query: '{query}'")
-            results = self.client.search(
+            async for page in self._paginate_search(
+                "page",
                 query=query,
-                filter={
-                    "property": "object",
-                    "value": "page"
-                },
+                limit=limit,
                 sort={
                     "direction": "descending",
                     "timestamp": "last_edited_time"
-                }
-            ).get("results", [])
-
-            if not results:
-                logger.info("Nenhuma página encontrada")
-                return []
-
-            formatted_results = []
-            for page in results[:5]:  # Limitando a 5 resultados
-                title = page["properties"].get("Name", {}).get("title", [])
-                title_text = title[0]["plain_text"] if title else "Sem título"
-
-                formatted_results.append({
-                    "id": page["id"],
-                    "title": title_text,
-                    "url": page["url"],
-                    "last_edited": page.get("last_edited_time", "Desconhecido"),
-                    "database_id": page.get("parent", {}).get("database_id", "N/A")
-                })
-
-            logger.info(f"Encontradas {len(formatted_results)} páginas")
-            return formatted_results
+                },
+                bucket=bucket
+            ):
+                yield self._format_page(page)
 
         except APIResponseError as e:
             error_msg = f"Erro na API do Notion ao buscar páginas: {str(e)}"
@@ -167,33 +475,132 @@ class NotionManager:
             logger.error(error_msg)
             raise Exception("Erro ao buscar páginas no Notion")
 
-    async def get_page_content(self, page_id: str) -> str:
+    @instrumented("notion", "search_pages")
+    async def search_pages(self, query: str, limit: int = 5) -> list:
+        """
+        Busca páginas em todos os bancos de dados acessíveis.
+        Usa o índice local quando disponível e a busca do Notion como alternativa.
+        """
+        if self.index is not None:
+            results = await self.index.search(query, limit)
+            if results:
+                return results
+        results = [page async for page in self._iter_pages(query, limit=limit)]
+        if not results:
+            logger.info("Nenhuma página encontrada")
+        else:
+            logger.info(f"Encontradas {len(results)} páginas")
+        return results
+
+    async def _list_children(self, block_id: str, semaphore: asyncio.Semaphore, bucket: Optional[TokenBucket]) -> List[dict]:
+        """
+        Lê todos os filhos diretos de um bloco, seguindo a paginação
+        """
+        children = []
+        cursor = None
+        while True:
+            params = {"block_id": block_id, "page_size": NOTION_MAX_PAGE_SIZE}
+            if cursor:
+                params["start_cursor"] = cursor
+            # O semáforo limita só as chamadas à API, nunca a recursão (evita deadlock)
+            async with semaphore:
+                if bucket is not None:
+                    await bucket.acquire()
+                self.block_requests += 1
+                response = await self.client.blocks.children.list(**params)
+            children.extend(response.get("results", []))
+            if not response.get("has_more"):
+                return children
+            cursor = response.get("next_cursor")
+
+    async def _fetch_tree(self, block_id: str, semaphore: asyncio.Semaphore, bucket: Optional[TokenBucket]) -> List[dict]:
+        """
+        Lê os blocos de `block_id` e, em paralelo, os filhos de cada um
+        """
+        blocks = await self._list_children(block_id, semaphore, bucket)
+        nested = [
+            block for block in blocks
+            # Subpáginas e bancos aninhados são documentos à parte: só o título entra
+            if block.get("has_children") and block["type"] not in ("child_page", "child_database")
+        ]
+        if nested:
+            subtrees = await asyncio.gather(*(self._fetch_tree(block["id"], semaphore, bucket) for block in nested))
+            for block, children in zip(nested, subtrees):
+                block["children"] = children
+        return blocks
+
+    async def _load_page(self, page_id: str, last_edited_time: str, bucket: Optional[TokenBucket]) -> str:
         """
-        Get the content of a specific page
+        Lê a árvore de blocos da página e guarda o texto no cache
         """
         try:
             logger.info(f"Getting content for page: {page_id}")
-            blocks = self.client.blocks.children.list(block_id=page_id).get("results", [])
-            content = []
-            for block in blocks:
-                if block["type"] == "paragraph":
-                    text = block["paragraph"]["rich_text"]
-                    if text:
-                        content.append(text[0]["plain_text"])
-
-            page_content = "\n".join(content)
-            logger.info(f"Page content retrieved successfully.")
-            return page_content
+            blocks = await self._fetch_tree(page_id, self._fetch_semaphore, bucket)
+            page_content = "\n".join(render_blocks(blocks))
+        finally:
+            key = (page_id, last_edited_time)
+            if self._page_inflight.get(key) is asyncio.current_task():
+                del self._page_inflight[key]
+
+        self._page_cache[page_id] = (last_edited_time, page_content)
+        self._page_cache.move_to_end(page_id)
+        if len(self._page_cache) > self.page_cache_size:
+            self._page_cache.popitem(last=False)
+
+        logger.info(f"Page content retrieved successfully ({len(page_content)} caracteres).")
+        return page_content
+
+    @instrumented("notion", "get_page_content")
+    async def get_page_content(self, page_id: str, last_edited_time: str = None, bucket: Optional[TokenBucket] = None) -> str:
+        """
+        Get the full text content of a page, including nested blocks.
+        Results are cached by page_id + last_edited_time, so an unchanged page is not fetched again.
+        With `bucket`, every request to the API takes a token from it first.
+        """
+        try:
+            if last_edited_time is None:
+                if bucket is not None:
+                    await bucket.acquire()
+                page = await self.client.pages.retrieve(page_id=page_id)
+                last_edited_time = page.get("last_edited_time")
+
+            cached = self._page_cache.get(page_id)
+            if cached is not None and cached[0] == last_edited_time:
+                self._page_cache.move_to_end(page_id)
+                self.page_cache_hits += 1
+                return cached[1]
+
+            key = (page_id, last_edited_time)
+            task = self._page_inflight.get(key)
+            if task is not None:
+                self.page_cache_hits += 1
+            else:
+                self.page_cache_misses += 1
+                # A leitura roda numa tarefa própria: cancelar quem a iniciou não cancela quem a aguarda
+                task = asyncio.create_task(self._load_page(page_id, last_edited_time, bucket))
+                # Evita o aviso "exception was never retrieved" quando ninguém aguardava
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+                self._page_inflight[key] = task
+            return await asyncio.shield(task)
 
         except APIResponseError as e:
             error_msg = f"Notion API error getting page content: {str(e)}"
             logger.error(error_msg)
-            raise Exception(error_msg)
+            raise Exception(error_msg) from e
         except Exception as e:
             error_msg = f"Error getting page content: {str(e)}"
             logger.error(error_msg)
-            raise Exception("Erro ao obter conteúdo da página")
+            raise Exception("Erro ao obter conteúdo da página") from e
+
+    def page_cache_stats(self) -> dict:
+        return {
+            "entries": len(self._page_cache),
+            "hits": self.page_cache_hits,
+            "misses": self.page_cache_misses,
+            "block_requests": self.block_requests
+        }
 
+    @instrumented("notion", "get_database_schema")
     async def get_database_schema(self, database_id: str = None) -> dict:
         """
         Get the schema of a specific database
@@ -206,7 +613,7 @@ class NotionManager:
                 raise ValueError(error_msg)
 
             logger.info(f"Getting schema for database: {database_id}")
-            database = self.client.databases.retrieve(database_id=database_id)
+            database = await self.client.databases.retrieve(database_id=database_id)
 
             logger.info(f"Database schema retrieved successfully.")
             return {
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, Set, Tuple
+import httpx
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+from rate_limiter import TokenBucket
+from config import (
+    NOTION_OUTBOX_PATH,
+    NOTION_RATE_LIMIT,
+    NOTION_OUTBOX_CONCURRENCY,
+    NOTION_OUTBOX_MAX_ATTEMPTS,
+    NOTION_OUTBOX_MAX_BACKOFF
+)
+
+logger = logging.getLogger(__name__)
+
+# Respostas do Notion que valem nova tentativa
+_RETRYABLE_STATUS = {409, 429, 500, 502, 503, 504}
+# Falhas de transporte: o Notion nem chegou a responder
+_TRANSIENT_ERRORS = (RequestTimeoutError, httpx.TransportError, asyncio.TimeoutError, ConnectionError)
+
+PENDING = "pending"
+FAILED = "failed"
+
+def _retry_after(error: Exception) -> Tuple[bool, Optional[float]]:
+    """
+    Classifica a falha: (deve tentar de novo, segundos pedidos pelo Retry-After).
+    Só falhas transitórias voltam para a fila: timeout, erro de conexão e
+    respostas 409/429/5xx. O resto (token ou banco não configurado, 400,
+    401, 404...) não se resolve sozinho e falha na hora.
+    """
+    # NotionManager encapsula o erro original: procura na cadeia de causas
+    cause: Optional[BaseException] = error
+    while cause is not None:
+        if isinstance(cause, HTTPResponseError):
+            break
+        if isinstance(cause, _TRANSIENT_ERRORS):
+            return True, None
+        cause = cause.__cause__
+    if cause is None or getattr(cause, "status", None) not in _RETRYABLE_STATUS:
+        return False, None
+    headers = getattr(cause, "headers", None) or {}
+    try:
+        return True, float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return True, None
+
+class NotionOutbox:
+    """
+    Fila persistente (SQLite) na frente de NotionManager.create_page.
+    Cada /save é gravado em disco antes da confirmação ao usuário e enviado
+    em segundo plano, respeitando o limite de taxa do Notion (token bucket,
+    um token por requisição de create_page) e tentando de novo com backoff exponencial ou pelo tempo do Retry-After.
+    Notas ainda não enviadas sobrevivem a reinícios do bot.
+    """
+
+    def __init__(
+        self,
+        notion,
+        path: str = NOTION_OUTBOX_PATH,
+        rate: float = NOTION_RATE_LIMIT,
+        concurrency: int = NOTION_OUTBOX_CONCURRENCY,
+        max_attempts: int = NOTION_OUTBOX_MAX_ATTEMPTS,
+        max_backoff: float = NOTION_OUTBOX_MAX_BACKOFF,
+        bucket: Optional[TokenBucket] = None
+    ):
+        self.notion = notion
+        self.path = path
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        # Compartilhado com as demais leituras e escritas em segundo plano no Notion
+        self._bucket = bucket if bucket is not None else TokenBucket(rate)
+        self._conn: Optional[sqlite3.Connection] = None
+        # Uma única thread acessa o banco
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notion-outbox")
+        self._on_result: Optional[Callable[[dict, Optional[dict], Optional[str]], Awaitable[None]]] = None
+        self._in_flight: Set[int] = set()
+        self._deliveries: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self.pending = 0
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS notion_outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "chat_id INTEGER NOT NULL, "
+                "user_id INTEGER NOT NULL, "
+                "title TEXT NOT NULL, "
+                "content TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, "
+                "last_error TEXT, "
+                "created_at REAL NOT NULL, "
+                "progress TEXT)"
+            )
+            # Filas criadas antes da coluna de progresso (páginas longas retomadas após falha)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(notion_outbox)")}
+            if "progress" not in columns:
+                conn.execute("ALTER TABLE notion_outbox ADD COLUMN progress TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS notion_outbox_due "
+                "ON notion_outbox (status, next_attempt_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _insert(self, chat_id: int, user_id: int, title: str, content: str) -> int:
+        now = time.time()
+        with self._db() as conn:
+            cursor = conn.execute(
+                "INSERT INTO notion_outbox (chat_id, user_id, title, content, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chat_id, user_id, title, content, now, now)
+            )
+        return cursor.lastrowid
+
+    def _next_due(self, exclude: Tuple[int, ...]) -> Tuple[Optional[dict], Optional[float]]:
+        """
+        Retorna a próxima nota pronta para envio ou, se nenhuma estiver,
+        quantos segundos faltam para a próxima tentativa agendada
+        """
+        placeholders = ",".join("?" * len(exclude))
+        skip = f"AND id NOT IN ({placeholders}) " if exclude else ""
+        row = self._db().execute(
+            f"SELECT * FROM notion_outbox WHERE status = ? {skip}"
+            "ORDER BY next_attempt_at, id LIMIT 1",
+            (PENDING, *exclude)
+        ).fetchone()
+        if row is None:
+            return None, None
+        wait = row["next_attempt_at"] - time.time()
+        if wait > 0:
+            return None, wait
+        return dict(row), None
+
+    def _delete(self, entry_id: int) -> None:
+        with self._db() as conn:
+            conn.execute("DELETE FROM notion_outbox WHERE id = ?", (entry_id,))
+
+    def _reschedule(self, entry_id: int, attempts: int, next_attempt_at: float, error: str, progress: str) -> None:
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE notion_outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, progress = ? WHERE id = ?",
+                (attempts, next_attempt_at, error, progress, entry_id)
+            )
+
+    def _mark_failed(self, entry_id: int, attempts: int, error: str, progress: str) -> None:
+        # Notas que não puderam ser enviadas ficam guardadas para inspeção manual
+        # (com a página parcial, se chegou a ser criada)
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE notion_outbox SET status = ?, attempts = ?, last_error = ?, progress = ? WHERE id = ?",
+                (FAILED, attempts, error, progress, entry_id)
+            )
+
+    def _counts(self) -> dict:
+        rows = self._db().execute(
+            "SELECT status, COUNT(*) FROM notion_outbox GROUP BY status"
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+    async def enqueue(self, chat_id: int, user_id: int, title: str, content: str) -> int:
+        """
+        Grava a nota em disco e retorna o ID na fila; o envio acontece em segundo plano
+        """
+        entry_id = await self._run(self._insert, chat_id, user_id, title, content)
+        self.pending += 1
+        logger.info(f"Nota {entry_id} de {user_id} enfileirada para o Notion ({len(content)} caracteres)")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return entry_id
+
+    def _backoff(self, attempts: int) -> float:
+        # Backoff exponencial com jitter: 2, 4, 8... segundos, até max_backoff
+        return min(self.max_backoff, 2 ** attempts) * random.uniform(0.5, 1.0)
+
+    async def _deliver(self, entry: dict) -> None:
+        page = None
+        error_msg = None
+        # Página já criada e lotes já anexados numa tentativa anterior: a nova tentativa continua dali
+        progress = json.loads(entry["progress"]) if entry.get("progress") else {}
+        try:
+            page = await self.notion.create_page(
+                title=entry["title"], content=entry["content"], progress=progress, bucket=self._bucket
+            )
+            await self._run(self._delete, entry["id"])
+            self.pending -= 1
+            self.delivered += 1
+        except Exception as e:
+            attempts = entry["attempts"] + 1
+            retry, retry_after = _retry_after(e)
+            if retry and retry_after is not None:
+                # Rate limit do Notion: segura todos os envios pelo tempo pedido
+                self._bucket.pause(retry_after)
+            if retry and attempts < self.max_attempts:
+                delay = retry_after if retry_after is not None else self._backoff(attempts)
+                self.retries += 1
+                logger.warning(
+                    f"Falha ao enviar nota {entry['id']} (tentativa {attempts}), "
+                    f"nova tentativa em {delay:.1f}s: {str(e)}"
+                )
+                await self._run(
+                    self._reschedule, entry["id"], attempts, time.time() + delay, str(e), json.dumps(progress) if progress else None
+                )
+                return
+            error_msg = str(e)
+            self.pending -= 1
+            self.failed += 1
+            logger.error(f"Nota {entry['id']} descartada após {attempts} tentativas: {error_msg}")
+            await self._run(self._mark_failed, entry["id"], attempts, error_msg, json.dumps(progress) if progress else None)
+        finally:
+            self._in_flight.discard(entry["id"])
+            self._slots.release()
+            self._wakeup.set()
+
+        if self._on_result is not None:
+            try:
+                await self._on_result(entry, page, error_msg)
+            except Exception as e:
+                logger.error(f"Erro ao notificar resultado da nota {entry['id']}: {str(e)}")
+
+    async def _drain_loop(self) -> None:
+        while True:
+            await self._slots.acquire()
+            self._wakeup.clear()
+            try:
+                entry, wait = await self._run(self._next_due, tuple(self._in_flight))
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"Erro ao ler a fila do Notion: {str(e)}")
+                await asyncio.sleep(5)
+                continue
+
+            if entry is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # O limite de taxa é aplicado dentro de create_page, um token por requisição
+            self._in_flight.add(entry["id"])
+            task = asyncio.create_task(self._deliver(entry))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def start(self, on_result: Callable[[dict, Optional[dict], Optional[str]], Awaitable[None]] = None) -> None:
+        """
+        Inicia o envio em segundo plano, retomando notas de execuções anteriores.
+        `on_result(entry, page, error)` é chamado quando a nota é gravada ou descartada.
+        """
+        if self._drain_task is not None:
+            return
+        self._on_result = on_result
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        counts = await self._run(self._counts)
+        self.pending += counts.get(PENDING, 0)
+        if counts.get(PENDING):
+            logger.info(f"Retomando {counts[PENDING]} notas pendentes para o Notion")
+        if counts.get(FAILED):
+            logger.warning(f"{counts[FAILED]} notas não enviadas estão guardadas em '{self.path}'")
+        self._drain_task = asyncio.create_task(self._drain_loop())
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Para o envio; notas em andamento têm `timeout` segundos para terminar
+        e as demais continuam no disco para a próxima execução
+        """
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+        if self._deliveries:
+            _, unfinished = await asyncio.wait(self._deliveries, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+        await self._run(self._close_db)
+        self._executor.shutdown(wait=True)
+
+    def _close_db(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": self.pending,
+            "in_flight": len(self._in_flight),
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "failed": self.failed
+        }
@@ -0,0 +1,175 @@
+import asyncio
+import io
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from config import PROFILER_INTERVAL, PROFILER_MAX_DURATION, PROFILER_TOP, PROFILER_TRACEMALLOC_FRAMES
+
+logger = logging.getLogger(__name__)
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class RuntimeProfiler:
+    """
+    Profiler ligado e desligado em tempo de execução: uma thread amostra a
+    pilha da thread do event loop a cada `interval` segundos e, se pedido,
+    o tracemalloc compara snapshots do início e do fim. O relatório (texto)
+    traz as funções mais quentes, as pilhas em formato "collapsed" (para
+    flame graphs) e os maiores alocadores. Para sozinho depois de
+    `max_duration` segundos.
+
+    A amostragem custa pouco; o tracemalloc deixa código que aloca muito
+    várias vezes mais lento, por isso só é ligado com memory=True.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILER_INTERVAL,
+        max_duration: float = PROFILER_MAX_DURATION,
+        top: int = PROFILER_TOP,
+        tracemalloc_frames: int = PROFILER_TRACEMALLOC_FRAMES
+    ):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.top = top
+        self.tracemalloc_frames = tracemalloc_frames
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target_thread_id: Optional[int] = None
+        self._started_at: Optional[float] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._owns_tracemalloc = False
+        self._timeout: Optional[asyncio.TimerHandle] = None
+        self._last_report: Optional[bytes] = None
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.stacks: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[labels[0]] += 1
+            # Recursão não conta a mesma função duas vezes no tempo inclusivo
+            self.total_counts.update(set(labels))
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self, memory: bool = False) -> None:
+        """
+        Começa a amostrar a thread atual (a do event loop) e, com memory=True, a rastrear alocações
+        """
+        if self.running:
+            raise Exception("O profiler já está em execução")
+        self.samples = 0
+        self.self_counts.clear()
+        self.total_counts.clear()
+        self.stacks.clear()
+        self._target_thread_id = threading.get_ident()
+        self._started_at = time.monotonic()
+        self._owns_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(self.tracemalloc_frames)
+        self._snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="runtime-profiler", daemon=True)
+        self._thread.start()
+        try:
+            self._timeout = asyncio.get_running_loop().call_later(self.max_duration, self._expire)
+        except RuntimeError:
+            self._timeout = None
+        logger.info(
+            f"Profiler iniciado (amostragem a cada {self.interval * 1000:.0f} ms, "
+            f"memória {'rastreada' if self._snapshot is not None else 'não rastreada'})"
+        )
+
+    def _expire(self) -> None:
+        self._timeout = None
+        if self.running:
+            logger.warning(f"Profiler parado automaticamente após {self.max_duration:.0f}s")
+            self._last_report = self.stop()
+
+    def stop(self) -> bytes:
+        """
+        Para a amostragem e devolve o relatório em texto (UTF-8)
+        """
+        if not self.running:
+            if self._last_report is not None:
+                # Parado pelo limite de tempo: entrega o relatório guardado
+                report, self._last_report = self._last_report, None
+                return report
+            raise Exception("O profiler não está em execução")
+        if self._timeout is not None:
+            self._timeout.cancel()
+            self._timeout = None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        elapsed = time.monotonic() - self._started_at
+        memory = None
+        if self._snapshot is not None and tracemalloc.is_tracing():
+            memory = (self._snapshot, tracemalloc.take_snapshot(), *tracemalloc.get_traced_memory())
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        report = self._report(elapsed, memory)
+        self._snapshot = None
+        logger.info(f"Profiler parado ({self.samples} amostras em {elapsed:.1f}s)")
+        return report
+
+    def _report(self, elapsed: float, memory: Optional[tuple]) -> bytes:
+        out = io.StringIO()
+        out.write(f"Perfil gerado em {datetime.now().isoformat(timespec='seconds')}\n")
+        out.write(f"Duração: {elapsed:.1f}s, {self.samples} amostras a cada {self.interval * 1000:.0f} ms\n\n")
+
+        def share(count: int) -> str:
+            return f"{count / self.samples * 100:6.1f}%" if self.samples else "   0.0%"
+
+        out.write(f"== Funções mais quentes (tempo próprio), top {self.top} ==\n")
+        for label, count in self.self_counts.most_common(self.top):
+            out.write(f"{share(count)} {count:7d}  {label}\n")
+        out.write(f"\n== Tempo inclusivo (função e o que ela chama), top {self.top} ==\n")
+        for label, count in self.total_counts.most_common(self.top):
+            out.write(f"{share(count)} {count:7d}  {label}\n")
+
+        if memory is None:
+            out.write("\n== Memória não rastreada (use /profile start mem) ==\n")
+        else:
+            first, final, current, peak = memory
+            filters = [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, __file__)
+            ]
+            first = first.filter_traces(filters)
+            final = final.filter_traces(filters)
+            out.write(f"\n== Memória rastreada: atual {current / 2**20:.1f} MiB, pico {peak / 2**20:.1f} MiB ==\n")
+            out.write(f"\n== Crescimento de memória por linha desde o início, top {self.top} ==\n")
+            for stat in final.compare_to(first, "lineno")[:self.top]:
+                out.write(f"{stat}\n")
+            out.write(f"\n== Maiores alocadores atuais (pilha), top {min(self.top, 10)} ==\n")
+            for stat in final.statistics("traceback")[:min(self.top, 10)]:
+                out.write(f"{stat.size / 1024:.1f} KiB em {stat.count} blocos\n")
+                for line in stat.traceback.format():
+                    out.write(f"    {line}\n")
+
+        out.write("\n== Pilhas (formato collapsed, para flamegraph.pl/speedscope) ==\n")
+        for stack, count in self.stacks.most_common():
+            out.write(f"{stack} {count}\n")
+        return out.getvalue().encode("utf-8")
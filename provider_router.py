@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from ai_manager import AIProvider
+from config import (
+    HEDGE_MIN_DELAY,
+    HEDGE_MAX_DELAY,
+    HEDGE_PERCENTILE,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+class ProvidersUnavailableError(Exception):
+    """Todos os circuitos estão abertos: nenhum provider pode ser chamado agora."""
+
+class LatencyTracker:
+    """
+    Janela deslizante das latências de sucesso de um provider
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+class CircuitBreaker:
+    """
+    Circuit breaker por provider: após `failure_threshold` falhas seguidas o
+    circuito abre e o provider é pulado por `reset_timeout` segundos; depois
+    disso uma única requisição de teste decide se ele volta a ser usado.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def available(self) -> bool:
+        """
+        Indica, sem reservar a requisição de teste, se allow() liberaria o provider agora
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at >= self.reset_timeout
+        return not self._probe_in_flight
+
+    def allow(self) -> bool:
+        """
+        Indica se uma requisição pode ser enviada ao provider; no estado
+        half-open reserva a única requisição de teste (chame só ao enviá-la)
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """
+        Libera a requisição de teste que terminou sem resultado (cancelada ou
+        com um erro que não diz nada sobre o provider)
+        """
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuito aberto após {self.failures} falhas")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+class HedgedRouter:
+    """
+    Encaminha a mensagem ao provider escolhido e, se ele demorar mais que o
+    percentil configurado das suas latências recentes, dispara a mesma
+    requisição no provider secundário. A primeira resposta válida vence e a
+    outra requisição é cancelada. Providers com o circuito aberto são pulados;
+    se todos estiverem abertos, a chamada falha na hora com
+    ProvidersUnavailableError (só a requisição de teste do half-open passa).
+    """
+
+    def __init__(
+        self,
+        providers: List[AIProvider],
+        min_delay: float = HEDGE_MIN_DELAY,
+        max_delay: float = HEDGE_MAX_DELAY,
+        percentile: float = HEDGE_PERCENTILE,
+        ignore_errors: tuple = ()
+    ):
+        self.providers = providers
+        # Erros que não indicam falha do provider (ex.: fila local cheia)
+        self.ignore_errors = ignore_errors
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.percentile = percentile
+        self.latencies: Dict[AIProvider, LatencyTracker] = {p: LatencyTracker() for p in providers}
+        self.breakers: Dict[AIProvider, CircuitBreaker] = {p: CircuitBreaker() for p in providers}
+        self.hedges = 0
+        self.secondary_wins = 0
+        self.skipped = 0
+
+    def hedge_delay(self, provider: AIProvider) -> float:
+        """
+        Tempo de espera antes de disparar a requisição secundária
+        """
+        observed = self.latencies[provider].percentile(self.percentile)
+        if observed is None:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, observed))
+
+    def _candidates(self, primary: AIProvider) -> List[AIProvider]:
+        # Só consulta os circuitos: a vaga de teste do half-open é reservada ao disparar
+        ordered = [primary] + [p for p in self.providers if p != primary]
+        return [provider for provider in ordered if self.breakers[provider].available()]
+
+    async def _attempt(self, provider: AIProvider, call: Callable[[AIProvider], Awaitable[str]], probe: bool) -> str:
+        started = time.monotonic()
+        breaker = self.breakers[provider]
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            # Hedge perdedor ou chamador cancelado: o teste não terminou, outro pode ser feito
+            if probe:
+                breaker.release_probe()
+            raise
+        except Exception as e:
+            if not isinstance(e, self.ignore_errors):
+                breaker.record_failure()
+            elif probe:
+                breaker.release_probe()
+            raise
+        breaker.record_success()
+        self.latencies[provider].record(time.monotonic() - started)
+        return result
+
+    async def route(
+        self, primary: AIProvider, call: Callable[[AIProvider], Awaitable[str]]
+    ) -> Tuple[AIProvider, str]:
+        """
+        Executa `call(provider)` com hedging entre os providers disponíveis;
+        retorna o provider que respondeu e a resposta
+        """
+        remaining = self._candidates(primary)
+        for provider in self.providers:
+            if provider not in remaining:
+                self.skipped += 1
+                logger.info(f"Pulando {provider.name}: circuito aberto")
+        pending: Dict[asyncio.Task, AIProvider] = {}
+        last_error: Optional[BaseException] = None
+        first: Optional[AIProvider] = None
+
+        def launch_next() -> bool:
+            nonlocal first
+            while remaining:
+                provider = remaining.pop(0)
+                breaker = self.breakers[provider]
+                # Reserva a vaga de teste só agora; outra requisição pode tê-la levado
+                if not breaker.allow():
+                    self.skipped += 1
+                    continue
+                probe = breaker.state == CircuitBreaker.HALF_OPEN
+                pending[asyncio.create_task(self._attempt(provider, call, probe))] = provider
+                first = first or provider
+                return True
+            return False
+
+        if not launch_next():
+            # Todos os circuitos abertos: falha rápido em vez de insistir num provider fora do ar
+            raise ProvidersUnavailableError("Nenhum provider de IA disponível no momento")
+        try:
+            while pending:
+                timeout = self.hedge_delay(first) if remaining else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # O provider principal está lento: dispara o secundário
+                    if launch_next():
+                        self.hedges += 1
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if provider != first:
+                            self.secondary_wins += 1
+                        return provider, task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Falha no provider {provider.name}: {str(last_error)}")
+
+                # Falhou rápido: não espera o atraso para tentar o próximo
+                if not pending:
+                    launch_next()
+
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "secondary_wins": self.secondary_wins,
+            "skipped": self.skipped,
+            "providers": {
+                provider.name: {
+                    "circuit": self.breakers[provider].state,
+                    "failures": self.breakers[provider].failures,
+                    "p95": self.latencies[provider].percentile(95),
+                    "hedge_delay": self.hedge_delay(provider)
+                }
+                for provider in self.providers
+            }
+        }
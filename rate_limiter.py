@@ -0,0 +1,54 @@
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """
+    Limitador token bucket: `rate` tokens por segundo, acumulando até `capacity`.
+    Com `rate` <= 0 não há limite.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Consome tokens se disponíveis e retorna 0; caso contrário retorna
+        quantos segundos faltam para haver tokens suficientes
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Aguarda até que haja tokens disponíveis (em ordem de chegada)
+        """
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                wait = self.try_acquire(tokens)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Esvazia o bucket por `seconds` segundos (ex.: após um Retry-After)
+        """
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
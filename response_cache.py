@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from config import (
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_message(message: str) -> str:
+    """
+    Normaliza a mensagem para que variações triviais compartilhem a mesma chave
+    """
+    return _WHITESPACE.sub(" ", message).strip().rstrip("?!. ").lower()
+
+def context_hash(context) -> str:
+    """
+    Hash estável do contexto passado aos provedores
+    """
+    if not context:
+        return ""
+    serialized = json.dumps(context, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+class MemoryCacheBackend:
+    """
+    Backend em memória com remoção LRU por número de entradas e por bytes
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, size = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            self._bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (time.time() + ttl, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "evictions": self.evictions
+        }
+
+class DiskCacheBackend:
+    """
+    Backend em SQLite, para cache que sobrevive a reinícios.
+    As operações rodam numa thread dedicada para não bloquear o event loop.
+    """
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_PATH,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._entries = 0
+        self._bytes = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS response_cache_last_access ON response_cache (last_access)"
+            )
+            self._conn.commit()
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+            ).fetchone()
+            self._entries, self._bytes = count, total
+        return self._conn
+
+    def _get(self, key: str) -> Optional[str]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, size, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, size, expires_at = row
+        now = time.time()
+        with conn:
+            if now >= expires_at:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._entries -= 1
+                self._bytes -= size
+                return None
+            conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return value
+
+    def _set(self, key: str, value: str, ttl: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            old = conn.execute("SELECT size FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._entries -= 1
+                self._bytes -= old[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + ttl, now)
+            )
+            self._entries += 1
+            self._bytes += size
+            while self._entries > self.max_entries or self._bytes > self.max_bytes:
+                victim = conn.execute(
+                    "SELECT key, size FROM response_cache ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                if victim is None:
+                    break
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (victim[0],))
+                self._entries -= 1
+                self._bytes -= victim[1]
+                self.evictions += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._get, key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._set, key, value, ttl)
+
+    async def close(self) -> None:
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, _close)
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "disk",
+            "path": self.path,
+            "entries": self._entries,
+            "bytes": self._bytes,
+            "evictions": self.evictions
+        }
+
+class ResponseCache:
+    """
+    Cache de respostas dos provedores de IA, chaveado por provider,
+    mensagem normalizada e hash do contexto. Desativado quando `backend` é None.
+    """
+
+    def __init__(self, backend=None, ttl: float = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def make_key(provider: str, message: str, context=None) -> str:
+        raw = f"{provider}\x00{normalize_message(message)}\x00{context_hash(context)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, provider: str, counter: str) -> None:
+        counters = self._counters.setdefault(provider, {"hits": 0, "misses": 0, "stores": 0, "errors": 0})
+        counters[counter] += 1
+
+    async def get(self, provider: str, message: str, context=None) -> Optional[str]:
+        """
+        Retorna a resposta em cache, ou None
+        """
+        if not self.enabled:
+            return None
+        try:
+            value = await self.backend.get(self.make_key(provider, message, context))
+        except Exception as e:
+            logger.warning(f"Erro ao ler cache de respostas: {str(e)}")
+            self._count(provider, "errors")
+            return None
+        self._count(provider, "hits" if value is not None else "misses")
+        return value
+
+    async def set(self, provider: str, message: str, context, response: str) -> None:
+        """
+        Armazena a resposta de um provider
+        """
+        if not self.enabled or not response:
+            return
+        try:
+            await self.backend.set(self.make_key(provider, message, context), response, self.ttl)
+            self._count(provider, "stores")
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache de respostas: {str(e)}")
+            self._count(provider, "errors")
+
+    async def close(self) -> None:
+        if self.enabled:
+            await self.backend.close()
+
+    def stats(self) -> dict:
+        """
+        Retorna a taxa de acerto por provider e o estado do backend
+        """
+        providers = {}
+        for provider, counters in self._counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            providers[provider] = dict(counters, hit_rate=counters["hits"] / lookups if lookups else 0.0)
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.stats() if self.enabled else None,
+            "providers": providers
+        }
+
+def build_response_cache(backend: str = RESPONSE_CACHE_BACKEND) -> ResponseCache:
+    """
+    Cria o cache de respostas conforme a configuração ("none", "memory" ou "disk")
+    """
+    backend = (backend or "none").lower()
+    if backend == "memory":
+        return ResponseCache(MemoryCacheBackend())
+    if backend == "disk":
+        return ResponseCache(DiskCacheBackend())
+    if backend != "none":
+        logger.warning(f"Backend de cache desconhecido '{backend}', cache desativado")
+    return ResponseCache()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from rate_limiter import TokenBucket
+from config import PROVIDER_MAX_QUEUE, PROVIDER_MAX_QUEUE_PER_USER
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SchedulerBusyError(Exception):
+    """Fila do provider cheia: a requisição foi recusada."""
+
+class ProviderScheduler:
+    """
+    Agenda chamadas a um provider de IA com limite de concorrência, limite de
+    taxa (token bucket) e filas limitadas. Usuários com requisições pendentes
+    são atendidos em round-robin, então um usuário com muitas mensagens não
+    bloqueia os demais.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        rate: float,
+        burst: Optional[float] = None,
+        max_queue: int = PROVIDER_MAX_QUEUE,
+        max_queue_per_user: int = PROVIDER_MAX_QUEUE_PER_USER
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self._bucket = TokenBucket(rate, burst)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[int, Deque[asyncio.Future]] = {}
+        # Usuários com requisições pendentes, na ordem em que serão atendidos
+        self._ring: Deque[int] = deque()
+        self._queued = 0
+        self._has_work: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.in_flight = 0
+        self.granted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._has_work = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await self._slots.acquire()
+            granted = False
+            try:
+                while not granted:
+                    while not self._ring:
+                        self._has_work.clear()
+                        await self._has_work.wait()
+
+                    user_id = self._ring.popleft()
+                    queue = self._queues[user_id]
+                    waiter = queue.popleft()
+                    self._queued -= 1
+                    if queue:
+                        self._ring.append(user_id)
+                    else:
+                        del self._queues[user_id]
+
+                    if waiter.done():
+                        # Quem pediu desistiu enquanto esperava
+                        continue
+                    await self._bucket.acquire()
+                    if not waiter.done():
+                        waiter.set_result(None)
+                        granted = True
+            finally:
+                if not granted:
+                    self._slots.release()
+
+    def _enqueue(self, user_id: int) -> asyncio.Future:
+        queue = self._queues.get(user_id)
+        if self._queued >= self.max_queue or (queue is not None and len(queue) >= self.max_queue_per_user):
+            self.rejected += 1
+            logger.warning(f"Fila do provider '{self.name}' cheia, recusando requisição do usuário {user_id}")
+            raise SchedulerBusyError(f"Provider '{self.name}' ocupado")
+
+        waiter = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._ring.append(user_id)
+        queue.append(waiter)
+        self._queued += 1
+        self._has_work.set()
+        return waiter
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    async def submit(self, user_id: int, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Aguarda a vez do usuário e executa `call`.
+        Levanta SchedulerBusyError se as filas estiverem cheias.
+        """
+        self._ensure_started()
+        enqueued_at = time.monotonic()
+        waiter = self._enqueue(user_id)
+        try:
+            with span("scheduler_wait", provider=self.name):
+                await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga foi concedida no mesmo instante do cancelamento
+                self._slots.release()
+            else:
+                waiter.cancel()
+            raise
+
+        wait = time.monotonic() - enqueued_at
+        self.granted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.in_flight += 1
+        try:
+            return await call()
+        finally:
+            self.completed += 1
+            self._release()
+
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+    def stats(self) -> dict:
+        """
+        Retorna profundidade das filas e tempos de espera
+        """
+        return {
+            "name": self.name,
+            "queue_depth": self._queued,
+            "waiting_users": len(self._queues),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait": self.max_wait
+        }
@@ -0,0 +1,215 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Dict, Iterator, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from rate_limiter import TokenBucket
+from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_GROUP_RATE, TELEGRAM_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Prioridades dos envios (menor sai primeiro quando o limite global aperta)
+PRIORITY_ACK = 0
+PRIORITY_REPLY = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_ACK: "ack", PRIORITY_REPLY: "reply", PRIORITY_BACKGROUND: "background"}
+
+# Chats sem envios recentes são esquecidos acima deste número
+MAX_TRACKED_CHATS = 10000
+
+_send_options: ContextVar[Tuple[int, Optional[int]]] = ContextVar("send_options", default=(PRIORITY_ACK, None))
+
+@contextmanager
+def send_priority(priority: int, max_retries: Optional[int] = None) -> Iterator[None]:
+    """
+    Define a prioridade (e opcionalmente o número de novas tentativas após
+    RetryAfter) das chamadas à Bot API feitas dentro do bloco
+    """
+    token = _send_options.set((priority, max_retries))
+    try:
+        yield
+    finally:
+        _send_options.reset(token)
+
+class _ChatLane:
+    """
+    Envios de um chat: um por vez, em ordem de chegada, no ritmo do bucket do chat
+    """
+    __slots__ = ("bucket", "lock", "paused_until")
+
+    def __init__(self, rate: float):
+        self.bucket = TokenBucket(rate, capacity=1.0)
+        self.lock = asyncio.Lock()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.bucket.pause(seconds)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """
+    Fila de saída da Bot API, plugada na Application (rate_limiter).
+
+    Cada chat envia uma mensagem por vez, em ordem, no ritmo do seu token
+    bucket (`chat_rate` por segundo em chats privados, `group_rate` em
+    grupos); edições de mensagens já enviadas mantêm a ordem do chat, mas
+    não consomem esse ritmo. Todos os envios passam por um bucket global (`global_rate`
+    por segundo); quando ele está vazio, os envios esperam numa fila de
+    prioridade, em que confirmações curtas de comandos passam na frente de
+    respostas longas das IAs e de avisos em segundo plano. Um RetryAfter do
+    Telegram pausa o chat (ou tudo, em métodos sem chat) pelo tempo pedido
+    e o envio é refeito até `max_retries` vezes, sem que o chamador perceba.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        group_rate: float = TELEGRAM_GROUP_RATE,
+        max_retries: int = TELEGRAM_MAX_RETRIES
+    ):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        # Sem rajada acumulada: o Telegram conta os envios em qualquer janela de 1 s
+        self._global = TokenBucket(global_rate, capacity=1.0)
+        self._chats: "OrderedDict[Any, _ChatLane]" = OrderedDict()
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.requests = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.max_waiting = 0
+        self._delays: Dict[int, List[float]] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+    def _lane(self, chat_id) -> _ChatLane:
+        lane = self._chats.get(chat_id)
+        if lane is None:
+            # Grupos e canais (ID negativo ou @username) têm limite por minuto bem menor
+            group = str(chat_id).startswith(("-", "@"))
+            lane = self._chats[chat_id] = _ChatLane(self.group_rate if group else self.chat_rate)
+            if len(self._chats) > MAX_TRACKED_CHATS:
+                self._forget_idle_chats()
+        else:
+            self._chats.move_to_end(chat_id)
+        return lane
+
+    def _forget_idle_chats(self) -> None:
+        excess = len(self._chats) - MAX_TRACKED_CHATS + max(1, MAX_TRACKED_CHATS // 100)
+        for chat_id in list(self._chats):
+            if excess <= 0:
+                break
+            if not self._chats[chat_id].lock.locked():
+                del self._chats[chat_id]
+                excess -= 1
+
+    async def _dispatch(self) -> None:
+        while self._waiting:
+            future = self._waiting[0][2]
+            if future.done():
+                # Chamador cancelado enquanto esperava
+                heapq.heappop(self._waiting)
+                continue
+            wait = self._global.try_acquire()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._waiting)
+            future.set_result(None)
+
+    async def _global_slot(self, priority: int) -> None:
+        if not self._waiting and self._global.try_acquire() <= 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+        self.max_waiting = max(self.max_waiting, len(self._waiting))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _acquire(self, lane: Optional[_ChatLane], priority: int, paced: bool) -> None:
+        started = time.perf_counter()
+        if lane is not None and paced:
+            await lane.bucket.acquire()
+        elif lane is not None and lane.paused_until > time.monotonic():
+            # Só respeita a pausa de um RetryAfter, sem consumir o ritmo do chat
+            await asyncio.sleep(lane.paused_until - time.monotonic())
+        await self._global_slot(priority)
+        delays = self._delays.setdefault(priority, [0, 0.0])
+        delays[0] += 1
+        delays[1] += time.perf_counter() - started
+
+    async def _send(self, lane, priority: int, paced: bool, max_retries: int, callback, args, kwargs):
+        attempts = 0
+        while True:
+            await self._acquire(lane, priority, paced)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                retry_after = float(e.retry_after)
+                (lane if lane is not None else self._global).pause(retry_after)
+                if attempts >= max_retries:
+                    self.gave_up += 1
+                    raise
+                attempts += 1
+                self.retries += 1
+                logger.warning(f"Limite do Telegram atingido, reenviando em {retry_after:.0f}s")
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[dict]
+    ) -> Any:
+        priority, max_retries = _send_options.get()
+        if rate_limit_args:
+            priority = rate_limit_args.get("priority", priority)
+            max_retries = rate_limit_args.get("max_retries", max_retries)
+        if max_retries is None:
+            max_retries = self.max_retries
+        self.requests += 1
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await self._send(None, priority, False, max_retries, callback, args, kwargs)
+        # Edições já têm ritmo próprio (STREAM_EDIT_INTERVAL); o limite por chat vale para mensagens novas
+        paced = not endpoint.startswith("edit")
+        lane = self._lane(chat_id)
+        # Um envio por vez por chat: partes de uma resposta longa não se invertem, nem após um RetryAfter
+        async with lane.lock:
+            return await self._send(lane, priority, paced, max_retries, callback, args, kwargs)
+
+    def stats(self) -> dict:
+        stats = {
+            "requests": self.requests,
+            "retries": self.retries,
+            "gave_up": self.gave_up,
+            "waiting": len(self._waiting),
+            "max_waiting": self.max_waiting,
+            "chats": len(self._chats)
+        }
+        for priority, (count, total) in sorted(self._delays.items()):
+            stats[f"avg_delay_{PRIORITY_NAMES.get(priority, priority)}"] = total / count if count else 0.0
+        return stats
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from config import (
+    SENTIMENT_PROVIDERS,
+    SENTIMENT_TIMEOUT,
+    SENTIMENT_CACHE_SIZE,
+    SENTIMENT_BATCH_WINDOW,
+    SENTIMENT_MAX_BATCH,
+    SENTIMENT_MAX_CONCURRENCY
+)
+
+logger = logging.getLogger(__name__)
+
+def text_hash(text: str) -> str:
+    """
+    Hash do texto normalizado (espaços colapsados), usado como chave do cache
+    """
+    return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).hexdigest()
+
+class SentimentAnalyzer:
+    """
+    Análise de sentimento via Eden AI com timeout rígido, cache LRU por hash
+    do conteúdo e micro-lotes: pedidos que chegam dentro de `batch_window`
+    segundos são despachados juntos, textos repetidos viram uma única
+    chamada e a concorrência é limitada (pelo agendador do provider, quando
+    informado). Cada provider (amazon, google...) é consultado em separado,
+    o que permite mostrar o primeiro resultado sem esperar os demais.
+    """
+
+    def __init__(
+        self,
+        eden,
+        scheduler=None,
+        providers: List[str] = SENTIMENT_PROVIDERS,
+        timeout: float = SENTIMENT_TIMEOUT,
+        cache_size: int = SENTIMENT_CACHE_SIZE,
+        batch_window: float = SENTIMENT_BATCH_WINDOW,
+        max_batch: int = SENTIMENT_MAX_BATCH,
+        max_concurrency: int = SENTIMENT_MAX_CONCURRENCY
+    ):
+        self.eden = eden
+        self.scheduler = scheduler
+        self.providers = providers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        # Pedidos aguardando o próximo lote e pedidos já em andamento
+        self._pending: Dict[Tuple[str, str], Tuple[str, int, asyncio.Future]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[dict]:
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+        return result
+
+    def _cache_put(self, key: Tuple[str, str], result: dict) -> None:
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _call(self, text: str, provider: str, user_id: int) -> dict:
+        async def request() -> dict:
+            self.calls += 1
+            results = await self.eden.analyze_sentiment(text, providers=[provider], timeout=self.timeout)
+            return results[provider]
+
+        if self.scheduler is not None:
+            return await self.scheduler.submit(user_id, request)
+        async with self._slots:
+            return await request()
+
+    async def _resolve(self, key: Tuple[str, str], text: str, user_id: int, future: asyncio.Future) -> None:
+        try:
+            # Timeout rígido, incluindo a espera na fila do agendador
+            result = await asyncio.wait_for(self._call(text, key[1], user_id), timeout=self.timeout)
+            if result.get("error"):
+                raise Exception(result["error"])
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                e = TimeoutError(f"Análise de sentimento ({key[1]}) excedeu {self.timeout:.0f}s")
+            self.errors += 1
+            logger.warning(f"Falha na análise de sentimento ({key[1]}): {str(e)}")
+            future.set_exception(e)
+            # Evita o aviso "exception was never retrieved" quando ninguém aguardava
+            future.exception()
+        except BaseException:
+            # Tarefa cancelada (ex.: desligamento): quem aguarda recebe um erro em vez de esperar para sempre
+            self._abandon(future)
+            raise
+        else:
+            self._cache_put(key, result)
+            future.set_result(result)
+        finally:
+            self._inflight.pop(key, None)
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_exception(Exception("Análise de sentimento cancelada"))
+            future.exception()
+
+    def _finished(self, key: Tuple[str, str], future: asyncio.Future, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Cancelada antes de começar, _resolve nem chega a rodar
+        if not future.done():
+            self._abandon(future)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self.batches += 1
+        for key, (text, user_id, future) in batch.items():
+            self._inflight[key] = future
+            task = asyncio.create_task(self._resolve(key, text, user_id, future))
+            self._tasks.add(task)
+            task.add_done_callback(partial(self._finished, key, future))
+
+    def _request(self, text: str, digest: str, provider: str, user_id: int) -> asyncio.Future:
+        key = (digest, provider)
+        pending = self._pending.get(key)
+        future = pending[2] if pending is not None else self._inflight.get(key)
+        if future is not None:
+            # Mesmo texto já pedido: compartilha a chamada
+            self.coalesced += 1
+            return future
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = (text, user_id, future)
+        if len(self._pending) >= self.max_batch:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    async def analyze_provider(self, text: str, provider: str, user_id: int = 0) -> dict:
+        """
+        Resultado de um único provider, do cache ou do próximo lote
+        """
+        digest = text_hash(text)
+        cached = self._cache_get((digest, provider))
+        if cached is not None:
+            self.hits += 1
+            return cached
+        return await asyncio.shield(self._request(text, digest, provider, user_id))
+
+    async def iter_results(self, text: str, user_id: int = 0) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Produz (provider, resultado) na ordem em que cada provider responde.
+        Providers que falharem produzem {"error": mensagem}.
+        """
+        async def labeled(provider: str) -> Tuple[str, dict]:
+            try:
+                return provider, await self.analyze_provider(text, provider, user_id)
+            except Exception as e:
+                return provider, {"error": str(e)}
+
+        tasks = [asyncio.ensure_future(labeled(provider)) for provider in self.providers]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _gather(self, text: str, user_id: int) -> list:
+        return await asyncio.gather(
+            *(self.analyze_provider(text, provider, user_id) for provider in self.providers),
+            return_exceptions=True
+        )
+
+    def _labeled(self, results: list) -> Dict[str, dict]:
+        return {
+            provider: {"error": str(result)} if isinstance(result, Exception) else result
+            for provider, result in zip(self.providers, results)
+        }
+
+    async def analyze(self, text: str, user_id: int = 0) -> Dict[str, dict]:
+        """
+        Resultados de todos os providers; levanta o erro se nenhum responder
+        """
+        results = await self._gather(text, user_id)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        return self._labeled(results)
+
+    async def analyze_batch(self, texts: List[str], user_id: int = 0) -> List[Dict[str, dict]]:
+        """
+        Analisa vários textos de uma vez; falhas aparecem como {"error": ...} por provider
+        """
+        batches = await asyncio.gather(*(self._gather(text, user_id) for text in texts))
+        return [self._labeled(results) for results in batches]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "batches": self.batches,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
@@ -0,0 +1,632 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import signal
+import sys
+from collections import deque
+from itertools import count
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_API_URL, METRICS_PORT,
+    NOTION_OUTBOX_PATH, NOTION_INDEX_PATH, RESPONSE_CACHE_PATH,
+    SHARD_SOCKET, SHARD_WORKERS, SHARD_WORKER_NAME, SHARD_VIRTUAL_NODES, SHARD_REBALANCE_TIMEOUT
+)
+from metrics import MetricsServer, registry, export_stats
+
+logger = logging.getLogger(__name__)
+
+# Grupo do handler que confirma o update ao front: roda depois de todos os handlers do bot
+ACK_GROUP = 1000
+# Limite de uma mensagem no socket (um update do Telegram tem poucos KiB)
+MAX_FRAME = 4 * 2**20
+# Updates guardados no front enquanto não há workers conectados
+MAX_UNROUTED = 10000
+# Tempo para um worker terminar os updates que já recebeu antes de ser encerrado
+DRAIN_TIMEOUT = 120.0
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+
+def shard_key(update: Update) -> int:
+    """
+    Chave de roteamento: o usuário, senão o chat, senão o próprio update
+    """
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return update.update_id
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def _worker_path(path: str, name: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+class HashRing:
+    """
+    Hash consistente com nós virtuais: adicionar ou remover um worker move
+    só a fração de chaves que passa a pertencer a ele (ou que era dele);
+    as demais continuam no mesmo worker.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = SHARD_VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self.nodes: Set[str] = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.virtual_nodes):
+            point = self._hash(f"{node}#{replica}")
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect_right(self._points, self._hash(str(key)))
+        return self._owners[index % len(self._points)]
+
+class _WorkerLink:
+    """
+    Conexão do front com um worker
+    """
+
+    def __init__(self, name: str, writer: asyncio.StreamWriter):
+        self.name = name
+        self.writer = writer
+        self.routed = 0
+
+    def send(self, message: dict) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(_encode(message))
+
+class ShardRouter:
+    """
+    Front do modo com shards: distribui os updates entre os workers
+    conectados ao socket Unix pelo hash consistente da chave (user_id).
+
+    A ordem por usuário é preservada. Quando um usuário muda de worker
+    (worker adicionado, removido ou caído), os novos updates dele ficam
+    retidos até o worker anterior confirmar os que já recebeu. A cada
+    mudança no anel o roteamento pausa até todos os workers confirmarem a
+    nova composição (depois de gravar e esquecer o estado dos usuários que
+    saíram deles) ou até `rebalance_timeout` segundos.
+    """
+
+    def __init__(
+        self,
+        path: str = SHARD_SOCKET,
+        virtual_nodes: int = SHARD_VIRTUAL_NODES,
+        rebalance_timeout: float = SHARD_REBALANCE_TIMEOUT,
+        on_done: Optional[Callable[[int, int, str], None]] = None
+    ):
+        self.path = path
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self.rebalance_timeout = rebalance_timeout
+        # Chamado com (update_id, chave, worker) a cada update confirmado
+        self.on_done = on_done
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._links: Dict[str, _WorkerLink] = {}
+        self._version = 0
+        self._waiting: Set[str] = set()
+        self._rebalance_timer: Optional[asyncio.TimerHandle] = None
+        # Chave -> [worker, updates enviados e ainda não confirmados]
+        self._owners: Dict[int, list] = {}
+        self._outstanding: Dict[int, Tuple[str, int]] = {}
+        # Updates de usuários que mudaram de worker, esperando o worker anterior
+        self._held: Dict[int, Deque[dict]] = {}
+        # Updates recebidos durante a troca do anel ou sem nenhum worker
+        self._paused: Deque[Tuple[int, dict]] = deque()
+        self.routed = 0
+        self.handoffs = 0
+        self.lost = 0
+        self.dropped = 0
+        self.rebalances = 0
+
+    @property
+    def paused(self) -> bool:
+        return bool(self._waiting) or not self.ring.nodes
+
+    async def dispatch(self, update: Update, context) -> None:
+        """
+        Handler da Application do front: repassa o update ao worker do usuário
+        """
+        self.route(shard_key(update), update.to_dict())
+
+    def route(self, key: int, data: dict) -> None:
+        """
+        Envia o update (formato JSON da API do Telegram) ao worker da chave
+        """
+        if self.paused:
+            if len(self._paused) >= MAX_UNROUTED:
+                self._paused.popleft()
+                self.dropped += 1
+            self._paused.append((key, data))
+            return
+        self._route(key, data)
+
+    def _route(self, key: int, data: dict) -> None:
+        held = self._held.get(key)
+        if held is not None:
+            held.append(data)
+            return
+        target = self.ring.node_for(key)
+        owner = self._owners.get(key)
+        if owner is not None and owner[0] != target:
+            # O worker anterior ainda processa updates deste usuário
+            self._held[key] = deque([data])
+            self.handoffs += 1
+            return
+        self._send(target, key, data)
+
+    def _send(self, name: str, key: int, data: dict) -> None:
+        link = self._links[name]
+        link.send({"op": "update", "key": key, "update": data})
+        link.routed += 1
+        self.routed += 1
+        self._outstanding[data["update_id"]] = (name, key)
+        owner = self._owners.get(key)
+        if owner is None:
+            self._owners[key] = [name, 1]
+        else:
+            owner[1] += 1
+
+    def _release(self, key: int) -> None:
+        owner = self._owners[key]
+        owner[1] -= 1
+        if owner[1] > 0:
+            return
+        del self._owners[key]
+        if key in self._held and not self.paused:
+            for data in self._held.pop(key):
+                self._route(key, data)
+
+    def _done(self, name: str, update_id: int) -> None:
+        entry = self._outstanding.get(update_id)
+        if entry is None or entry[0] != name:
+            return
+        del self._outstanding[update_id]
+        self._release(entry[1])
+        if self.on_done is not None:
+            self.on_done(update_id, entry[1], name)
+
+    def _resume(self) -> None:
+        if self.paused:
+            return
+        if self._rebalance_timer is not None:
+            self._rebalance_timer.cancel()
+            self._rebalance_timer = None
+        # Primeiro os retidos cujo worker anterior já terminou, depois os que chegaram na pausa
+        for key in [key for key in self._held if key not in self._owners]:
+            for data in self._held.pop(key):
+                self._route(key, data)
+        while self._paused and not self.paused:
+            self._route(*self._paused.popleft())
+
+    def _change_ring(self, add: Optional[str] = None, remove: Optional[str] = None) -> None:
+        if add is not None:
+            self.ring.add(add)
+        if remove is not None:
+            self.ring.remove(remove)
+        self._version += 1
+        self.rebalances += 1
+        nodes = sorted(self.ring.nodes)
+        self._waiting = set(self._links)
+        for link in self._links.values():
+            link.send({"op": "ring", "version": self._version, "nodes": nodes})
+        if self._rebalance_timer is not None:
+            self._rebalance_timer.cancel()
+        self._rebalance_timer = asyncio.get_running_loop().call_later(
+            self.rebalance_timeout, self._rebalance_expired
+        )
+        logger.info(f"Anel de workers: {', '.join(nodes) or 'vazio'} (versão {self._version})")
+        self._resume()
+
+    def _rebalance_expired(self) -> None:
+        self._rebalance_timer = None
+        if self._waiting:
+            logger.warning(f"Workers não confirmaram o novo anel a tempo: {', '.join(sorted(self._waiting))}")
+            self._waiting.clear()
+            self._resume()
+
+    def _ring_ack(self, name: str, version: int) -> None:
+        if version == self._version and name in self._waiting:
+            self._waiting.discard(name)
+            self._resume()
+
+    def _drop(self, name: str) -> None:
+        """
+        Remove um worker desconectado; updates que ele não confirmou são perdidos
+        """
+        self._links.pop(name, None)
+        self._waiting.discard(name)
+        if name in self.ring.nodes:
+            self._change_ring(remove=name)
+        lost = [update_id for update_id, (worker, _) in self._outstanding.items() if worker == name]
+        for update_id in lost:
+            _, key = self._outstanding.pop(update_id)
+            self._release(key)
+        if lost:
+            self.lost += len(lost)
+            logger.warning(f"Worker {name} saiu sem confirmar {len(lost)} updates")
+        self._resume()
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        name = None
+        link = None
+        try:
+            hello = json.loads(await reader.readline())
+            name = str(hello["name"])
+            if name in self._links:
+                logger.warning(f"Worker {name} reconectou; a conexão anterior foi descartada")
+                self._links[name].writer.close()
+                self._drop(name)
+            link = self._links[name] = _WorkerLink(name, writer)
+            logger.info(f"Worker {name} conectado")
+            self._change_ring(add=name)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                op = message.get("op")
+                if op == "done":
+                    self._done(name, message["update_id"])
+                elif op == "ring_ack":
+                    self._ring_ack(name, message["version"])
+                elif op == "drain":
+                    # Sai do anel; a resposta chega ao worker depois de todos os updates já enviados
+                    logger.info(f"Worker {name} saindo do anel")
+                    self._change_ring(remove=name)
+                    link.send({"op": "drained"})
+        except (ConnectionError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Conexão com o worker {name or '?'} encerrada: {str(e)}")
+        finally:
+            if link is not None and self._links.get(name) is link:
+                logger.info(f"Worker {name} desconectado")
+                self._drop(name)
+            writer.close()
+
+    async def start(self) -> None:
+        """
+        Abre o socket Unix em que os workers se conectam
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_worker, path=self.path, limit=MAX_FRAME)
+        logger.info(f"Front aguardando workers em '{self.path}'")
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for link in list(self._links.values()):
+            link.writer.close()
+        await self._server.wait_closed()
+        self._server = None
+        if self._rebalance_timer is not None:
+            self._rebalance_timer.cancel()
+            self._rebalance_timer = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        pending = len(self._paused) + sum(len(queue) for queue in self._held.values())
+        if pending:
+            logger.warning(f"{pending} updates não foram entregues a nenhum worker")
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._links),
+            "ring_nodes": len(self.ring.nodes),
+            "routed": self.routed,
+            "outstanding": len(self._outstanding),
+            "held_users": len(self._held),
+            "paused": len(self._paused),
+            "handoffs": self.handoffs,
+            "lost": self.lost,
+            "dropped": self.dropped,
+            "rebalances": self.rebalances
+        }
+
+class WorkerSupervisor:
+    """
+    Mantém os workers locais: processos `bot.py` com SHARD_ROLE=worker,
+    reiniciados se caírem. add() e remove() mudam o número de workers em
+    execução; remove() pede ao worker que termine o que já recebeu.
+    """
+
+    def __init__(self, path: str = SHARD_SOCKET, metrics_port: int = METRICS_PORT, env: Optional[dict] = None):
+        self.path = path
+        self.metrics_port = metrics_port
+        self.env = env
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}
+        self._stopping: Set[str] = set()
+        self.restarts = 0
+
+    @property
+    def workers(self) -> List[str]:
+        return sorted(self._tasks)
+
+    def worker_env(self, name: str, index: int) -> dict:
+        env = dict(os.environ if self.env is None else self.env)
+        env.update({
+            "SHARD_ROLE": "worker",
+            "SHARD_SOCKET": self.path,
+            "SHARD_WORKER_NAME": name,
+            # Fila, índice e cache em disco são por worker: dois processos nunca enviam a mesma nota
+            "NOTION_OUTBOX_PATH": _worker_path(env.get("NOTION_OUTBOX_PATH", NOTION_OUTBOX_PATH), name),
+            "NOTION_INDEX_PATH": _worker_path(env.get("NOTION_INDEX_PATH", NOTION_INDEX_PATH), name),
+            "RESPONSE_CACHE_PATH": _worker_path(env.get("RESPONSE_CACHE_PATH", RESPONSE_CACHE_PATH), name),
+            "METRICS_PORT": str(self.metrics_port + 1 + index) if self.metrics_port > 0 else "0"
+        })
+        return env
+
+    async def _keep_running(self, name: str, index: int) -> None:
+        while True:
+            process = await asyncio.create_subprocess_exec(sys.executable, BOT_SCRIPT, env=self.worker_env(name, index))
+            self._processes[name] = process
+            code = await process.wait()
+            if name in self._stopping:
+                return
+            self.restarts += 1
+            logger.error(f"Worker {name} terminou com código {code}; reiniciando")
+            await asyncio.sleep(1)
+
+    async def add(self) -> str:
+        """
+        Inicia mais um worker local e retorna o nome dele
+        """
+        index = next(index for index in count() if f"worker-{index}" not in self._tasks)
+        name = f"worker-{index}"
+        self._tasks[name] = asyncio.create_task(self._keep_running(name, index))
+        logger.info(f"Iniciando {name}")
+        return name
+
+    async def remove(self, name: Optional[str] = None) -> Optional[str]:
+        """
+        Encerra um worker (o mais recente, se nenhum for indicado) depois de
+        ele terminar os updates que já recebeu
+        """
+        candidates = [worker for worker in self.workers if worker not in self._stopping]
+        if name is None:
+            if not candidates:
+                return None
+            name = max(candidates, key=lambda worker: int(worker.rsplit("-", 1)[1]))
+        task = self._tasks.get(name)
+        if task is None or name in self._stopping:
+            return None
+        self._stopping.add(name)
+        process = self._processes.get(name)
+        if process is not None and process.returncode is None:
+            process.send_signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Worker {name} não terminou em {DRAIN_TIMEOUT:.0f}s; encerrando à força")
+                process.kill()
+                await process.wait()
+        else:
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        del self._tasks[name]
+        self._processes.pop(name, None)
+        self._stopping.discard(name)
+        logger.info(f"{name} encerrado")
+        return name
+
+    async def stop(self) -> None:
+        """
+        Encerra todos os workers locais
+        """
+        await asyncio.gather(*(self.remove(name) for name in self.workers))
+
+class ShardWorker:
+    """
+    Worker do modo com shards: conecta ao socket do front, recebe os
+    updates dos usuários atribuídos a ele e os entrega à Application local.
+    Cada update é confirmado ao front depois que todos os handlers terminam.
+    Quando o anel muda, `on_release(application, keep)` grava e esquece o
+    estado dos usuários que passaram para outro worker (`keep(user_id)`
+    retorna False para eles).
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        on_release: Callable[[Application, Callable[[int], bool]], Awaitable[int]],
+        name: str = SHARD_WORKER_NAME,
+        path: str = SHARD_SOCKET,
+        virtual_nodes: int = SHARD_VIRTUAL_NODES
+    ):
+        self.application = application
+        self.on_release = on_release
+        self.name = name
+        self.path = path
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self._writer: Optional[asyncio.StreamWriter] = None
+        # update_id -> chave dos updates recebidos e ainda não confirmados
+        self._keys: Dict[int, int] = {}
+        self._idle: Optional[asyncio.Event] = None
+        self.received = 0
+        self.released = 0
+        self.reconnects = 0
+        application.add_handler(TypeHandler(Update, self._on_processed), group=ACK_GROUP)
+
+    def owns(self, key: int) -> bool:
+        return self.ring.node_for(key) == self.name
+
+    def _send(self, message: dict) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(_encode(message))
+
+    async def _release(self, keep: Callable[[int], bool]) -> None:
+        self.released += await self.on_release(self.application, keep)
+
+    async def _on_processed(self, update: Update, context) -> None:
+        key = self._keys.pop(update.update_id, None)
+        if key is None:
+            return
+        if not self.owns(key):
+            # Último update antes de o usuário mudar de worker: grava o estado antes de confirmar
+            await self._release(lambda user_id: user_id != key)
+        self._send({"op": "done", "update_id": update.update_id})
+        if not self._keys:
+            self._idle.set()
+
+    async def _apply_ring(self, message: dict) -> None:
+        self.ring = HashRing(message["nodes"], self.ring.virtual_nodes)
+        # Usuários com updates ainda na fila local são liberados quando forem confirmados
+        queued = set(self._keys.values())
+        await self._release(lambda user_id: self.owns(user_id) or user_id in queued)
+        self._send({"op": "ring_ack", "version": message["version"]})
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """
+        Lê mensagens do front; retorna True quando o front confirma a saída do anel
+        """
+        self._writer = writer
+        self._send({"op": "hello", "name": self.name})
+        while True:
+            line = await reader.readline()
+            if not line:
+                return False
+            message = json.loads(line)
+            op = message.get("op")
+            if op == "update":
+                update = Update.de_json(message["update"], self.application.bot)
+                self._keys[update.update_id] = message["key"]
+                self._idle.clear()
+                self.received += 1
+                await self.application.update_queue.put(update)
+            elif op == "ring":
+                await self._apply_ring(message)
+            elif op == "drained":
+                return True
+
+    async def _drain(self, serve: asyncio.Task) -> None:
+        self._send({"op": "drain"})
+        try:
+            # "drained" chega depois de todos os updates que o front já enviou
+            if await asyncio.wait_for(asyncio.shield(serve), DRAIN_TIMEOUT):
+                await asyncio.wait_for(self._idle.wait(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker {self.name} encerrando com {len(self._keys)} updates não confirmados")
+        except Exception:
+            # Erro de conexão: registrado por run()
+            pass
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """
+        Processa os updates do front até `stop_event`; então sai do anel e
+        termina os updates já recebidos. Reconecta se o front cair.
+        """
+        self._idle = asyncio.Event()
+        self._idle.set()
+        stopping = asyncio.create_task(stop_event.wait())
+        try:
+            while not stop_event.is_set():
+                try:
+                    reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME)
+                except OSError as e:
+                    logger.warning(f"Front indisponível em '{self.path}': {str(e)}")
+                    await asyncio.wait({stopping}, timeout=1)
+                    continue
+                logger.info(f"Worker {self.name} conectado ao front")
+                serve = asyncio.create_task(self._serve(reader, writer))
+                await asyncio.wait({serve, stopping}, return_when=asyncio.FIRST_COMPLETED)
+                if not serve.done():
+                    await self._drain(serve)
+                if not serve.done():
+                    serve.cancel()
+                try:
+                    await serve
+                except asyncio.CancelledError:
+                    pass
+                except (ConnectionError, ValueError, KeyError, TypeError) as e:
+                    logger.error(f"Erro na conexão com o front: {str(e)}")
+                writer.close()
+                self._writer = None
+                if not stop_event.is_set():
+                    self.reconnects += 1
+                    logger.warning("Conexão com o front perdida; reconectando")
+                    await asyncio.wait({stopping}, timeout=1)
+        finally:
+            stopping.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "ring_nodes": len(self.ring.nodes),
+            "received": self.received,
+            "unconfirmed": len(self._keys),
+            "released_users": self.released,
+            "reconnects": self.reconnects
+        }
+
+def build_front_application(workers: int = SHARD_WORKERS) -> Application:
+    """
+    Application do front: recebe os updates (polling ou webhook) e os
+    repassa ao worker de cada usuário. Inicia `workers` workers locais;
+    SIGUSR1 adiciona e SIGUSR2 remove um worker em execução.
+    """
+    router = ShardRouter()
+    supervisor = WorkerSupervisor()
+    metrics_server = MetricsServer()
+    registry.add_collector(lambda: export_stats("shard_router", router.stats()))
+
+    async def post_init(application: Application) -> None:
+        await router.start()
+        for _ in range(workers):
+            await supervisor.add()
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGUSR1, lambda: asyncio.create_task(supervisor.add()))
+        loop.add_signal_handler(signal.SIGUSR2, lambda: asyncio.create_task(supervisor.remove()))
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.warning(f"Não foi possível iniciar o servidor de métricas: {str(e)}")
+
+    async def post_shutdown(application: Application) -> None:
+        # Os workers saem do anel e terminam o que receberam antes de o socket fechar
+        await supervisor.stop()
+        logger.info(f"Estatísticas do front: {router.stats()}")
+        await router.stop()
+        await metrics_server.stop()
+
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, router.dispatch))
+    return application
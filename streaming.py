@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, List, Optional
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+from config import STREAM_EDIT_INTERVAL, STREAM_PLACEHOLDER_MESSAGE, SUPERSEDED_MESSAGE
+from send_queue import send_priority, PRIORITY_ACK, PRIORITY_REPLY
+
+logger = logging.getLogger(__name__)
+
+# Limite de caracteres de uma mensagem do Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Pontos de corte preferidos, do melhor para o pior: parágrafo, linha, frase, palavra
+_SPLIT_SEPARATORS = ("\n\n", "\n", ". ", "! ", "? ", "; ", " ")
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Divide o texto em partes de até `limit` caracteres, cortando entre
+    parágrafos, linhas, frases ou palavras (nessa ordem de preferência)
+    """
+    parts = []
+    rest = text
+    while len(rest) > limit:
+        window = rest[:limit]
+        cut = limit
+        for separator in _SPLIT_SEPARATORS:
+            index = window.rfind(separator)
+            # Um corte muito cedo geraria partes minúsculas; tenta o próximo separador
+            if index >= limit // 2:
+                cut = index + len(separator)
+                break
+        part = rest[:cut].rstrip()
+        if part:
+            parts.append(part)
+        rest = rest[cut:].lstrip()
+    if rest.strip():
+        parts.append(rest)
+    return parts
+
+async def reply_long(reply_to: Message, text: str) -> Message:
+    """
+    Responde com o texto inteiro, em várias mensagens se passar do limite do Telegram
+    """
+    message = None
+    with send_priority(PRIORITY_REPLY):
+        for part in split_message(text) or [text]:
+            message = await reply_to.reply_text(part)
+    return message
+
+class ProgressiveReply:
+    """
+    Mensagem do Telegram atualizada progressivamente enquanto o texto chega.
+    As edições são limitadas a uma a cada `min_interval` segundos; deltas que
+    chegam nesse intervalo são agrupados na próxima edição.
+    """
+
+    def __init__(self, message: Message, min_interval: float = STREAM_EDIT_INTERVAL):
+        self.message = message
+        self.min_interval = min_interval
+        self._parts: List[str] = []
+        self._shown = ""
+        self._next_edit_at = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._edit_lock = asyncio.Lock()
+        self.edits = 0
+
+    @classmethod
+    async def start(cls, reply_to: Message, placeholder: str = STREAM_PLACEHOLDER_MESSAGE) -> "ProgressiveReply":
+        """
+        Envia a mensagem provisória que será editada com o texto recebido
+        """
+        # A mensagem provisória é a confirmação imediata: sai na frente de respostas longas
+        with send_priority(PRIORITY_ACK):
+            message = await reply_to.reply_text(placeholder)
+        return cls(message)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def append(self, delta: str) -> None:
+        """
+        Acrescenta texto e agenda uma edição, respeitando o intervalo mínimo
+        """
+        self._parts.append(delta)
+        if self._flush_task is None or self._flush_task.done():
+            loop = asyncio.get_running_loop()
+            delay = max(0.0, self._next_edit_at - loop.time())
+            self._flush_task = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        await self._edit(self.text[:TELEGRAM_MESSAGE_LIMIT])
+
+    async def _edit(self, text: str) -> bool:
+        async with self._edit_lock:
+            if not text.strip() or text == self._shown:
+                return True
+            loop = asyncio.get_running_loop()
+            try:
+                # Edições não são refeitas pela fila de envio: um RetryAfter só adia a próxima
+                with send_priority(PRIORITY_REPLY, max_retries=0):
+                    await self.message.edit_text(text)
+                self._shown = text
+                self.edits += 1
+                self._next_edit_at = loop.time() + self.min_interval
+                return True
+            except RetryAfter as e:
+                logger.warning(f"Limite de edições do Telegram atingido, aguardando {e.retry_after}s")
+                self._next_edit_at = loop.time() + float(e.retry_after)
+                return False
+            except BadRequest as e:
+                # "Message is not modified" e afins não devem interromper o stream
+                logger.debug(f"Edição ignorada: {str(e)}")
+                return True
+
+    async def _wait_edit_slot(self) -> None:
+        delay = self._next_edit_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def finish(self, max_attempts: int = 3) -> str:
+        """
+        Aguarda edições pendentes e publica o texto completo
+        """
+        if self._flush_task is not None:
+            await self._flush_task
+
+        text = self.text
+        parts = split_message(text) or [text]
+        final = parts[0]
+        for _ in range(max_attempts):
+            if final == self._shown:
+                break
+            await self._wait_edit_slot()
+            if await self._edit(final):
+                break
+
+        # O restante de respostas longas segue em mensagens adicionais
+        with send_priority(PRIORITY_REPLY):
+            for part in parts[1:]:
+                await self.message.reply_text(part)
+        return text
+
+    async def fail(self, error_text: str) -> None:
+        """
+        Substitui a mensagem provisória por uma mensagem de erro
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        partial = self.text[:TELEGRAM_MESSAGE_LIMIT - len(error_text) - 2]
+        await self._wait_edit_slot()
+        await self._edit(f"{partial}\n\n{error_text}" if partial else error_text)
+
+async def reply_streaming(
+    reply_to: Message,
+    chunks: AsyncIterator[str],
+    error_text: str,
+    on_first_delta: Optional[Callable[[], None]] = None
+) -> str:
+    """
+    Responde `reply_to` com o texto de `chunks`, editando a resposta à medida que chega.
+    `on_first_delta` é chamado com o primeiro texto recebido, antes de ele aparecer na mensagem
+    """
+    reply = await ProgressiveReply.start(reply_to)
+    try:
+        async for delta in chunks:
+            if on_first_delta is not None and delta:
+                on_first_delta()
+                on_first_delta = None
+            reply.append(delta)
+        return await reply.finish()
+    except asyncio.CancelledError:
+        # Substituída por uma mensagem mais nova do usuário (ou bot encerrando)
+        await reply.fail(SUPERSEDED_MESSAGE)
+        raise
+    except Exception:
+        await reply.fail(error_text)
+        raise
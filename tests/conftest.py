@@ -0,0 +1,27 @@
+"""
+Configuração comum dos testes: o config.py lê o ambiente na importação,
+então valores falsos (sem rede real) são definidos antes de importar o bot.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:test")
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+os.environ.setdefault("EDEN_AI_API_KEY", "test")
+os.environ.setdefault("NOTION_TOKEN", "test")
+os.environ.setdefault("NOTION_DATABASE_ID", "db0000")
+os.environ.setdefault("METRICS_PORT", "0")
+# Bancos SQLite do bot fora do diretório do projeto
+DATA_DIR = tempfile.mkdtemp(prefix="bot-tests-")
+for name, filename in (
+    ("USER_SETTINGS_DB_PATH", "user_settings.db"),
+    ("NOTION_OUTBOX_PATH", "notion_outbox.db"),
+    ("NOTION_INDEX_PATH", "notion_index.db"),
+    ("RESPONSE_CACHE_PATH", "response_cache.db")
+):
+    os.environ.setdefault(name, os.path.join(DATA_DIR, filename))
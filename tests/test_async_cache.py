@@ -0,0 +1,54 @@
+"""
+AsyncTTLCache: carga compartilhada (single-flight) com cancelamento de quem
+a iniciou e invalidação durante a carga.
+"""
+import asyncio
+
+from async_cache import AsyncTTLCache
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def test():
+        cache = AsyncTTLCache(ttl=60)
+        loads = 0
+
+        async def loader():
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.1)
+            return "valor"
+
+        leader = asyncio.create_task(cache.get("chave", loader))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get("chave", loader))
+        await asyncio.sleep(0.01)
+        # Ex.: a resposta de quem iniciou a carga foi substituída por uma mensagem nova
+        leader.cancel()
+
+        assert await waiter == "valor"
+        assert leader.cancelled()
+        assert loads == 1
+        # A carga terminou e ficou em cache mesmo sem o líder
+        assert await cache.get("chave", loader) == "valor"
+        assert loads == 1
+
+    asyncio.run(test())
+
+def test_load_started_before_invalidate_is_not_stored():
+    async def test():
+        cache = AsyncTTLCache(ttl=60)
+        versions = iter(["antigo", "novo"])
+
+        async def loader():
+            value = next(versions)
+            await asyncio.sleep(0.05)
+            return value
+
+        stale = asyncio.create_task(cache.get("chave", loader))
+        await asyncio.sleep(0.01)
+        cache.invalidate()
+        # Quem pede depois da invalidação não compartilha a carga antiga
+        assert await cache.get("chave", loader) == "novo"
+        assert await stale == "antigo"
+        assert await cache.get("chave", loader) == "novo"
+
+    asyncio.run(test())
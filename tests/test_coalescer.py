@@ -0,0 +1,69 @@
+"""
+Cancelamento de respostas pelo MessageCoalescer: uma mensagem nova só
+cancela a resposta em streaming antes de o primeiro texto aparecer.
+"""
+import asyncio
+
+from coalescer import MessageCoalescer
+from config import SUPERSEDED_MESSAGE
+from streaming import reply_streaming
+
+class FakeMessage:
+    """
+    Só o que o coalescer e o streaming usam de telegram.Message
+    """
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text: str) -> "FakeMessage":
+        reply = FakeMessage(text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text: str) -> None:
+        self.text = text
+
+async def slow_chunks(first_delay: float):
+    await asyncio.sleep(first_delay)
+    yield "Primeira parte. "
+    await asyncio.sleep(0.2)
+    yield "Segunda parte."
+
+async def stream_and_supersede(first_delay: float):
+    """
+    Responde em streaming à primeira mensagem e envia uma segunda após 0,1 s
+    """
+    replies = []
+
+    async def respond(batch):
+        replies.append(batch.reply_to)
+        await reply_streaming(batch.reply_to, slow_chunks(first_delay), "erro", on_first_delta=batch.commit)
+
+    coalescer = MessageCoalescer(respond, window=0, cancel_superseded=True)
+    coalescer.submit(1, FakeMessage("primeira"))
+    await asyncio.sleep(0.1)
+    coalescer.submit(1, FakeMessage("segunda"))
+    await coalescer.flush()
+    return coalescer, replies
+
+def test_visible_stream_is_not_cancelled_by_a_new_message():
+    async def test():
+        coalescer, replies = await stream_and_supersede(first_delay=0.01)
+        assert coalescer.stats()["cancelled"] == 0
+        # A resposta já visível termina inteira e a segunda mensagem vira outro lote
+        assert replies[0].replies[0].text == "Primeira parte. Segunda parte."
+        assert len(replies) == 2
+
+    asyncio.run(test())
+
+def test_stream_without_text_yet_is_superseded():
+    async def test():
+        coalescer, replies = await stream_and_supersede(first_delay=0.5)
+        assert coalescer.stats()["cancelled"] == 1
+        assert replies[0].replies[0].text == SUPERSEDED_MESSAGE
+        # As duas mensagens são respondidas juntas, em reply à mais nova
+        assert replies[1].text == "segunda"
+
+    asyncio.run(test())
@@ -0,0 +1,21 @@
+"""
+ConversationMemory: turnos e resumo dos turnos removidos, juntos, cabem no
+orçamento de tokens da conversa.
+"""
+from conversation_memory import ConversationMemory, _SUMMARY_HEADER, estimate_tokens
+
+def test_summary_fits_in_the_token_budget():
+    memory = ConversationMemory(token_budget=300, max_turns=100, summary_tokens=80)
+    # Sem event loop o resumo é feito na hora
+    for index in range(3):
+        memory.add_turn(1, "user", f"Pergunta número {index} sobre o projeto. " + "detalhes " * 20)
+        memory.add_turn(1, "assistant", f"Resposta número {index}. " + "explicação " * 20)
+
+    messages = memory.messages(1)
+    assert messages[0]["role"] == "system"
+    summary_lines = messages[0]["content"][len(_SUMMARY_HEADER):].split("\n")
+    used = estimate_tokens(_SUMMARY_HEADER) + sum(estimate_tokens(line) for line in summary_lines)
+    used += sum(estimate_tokens(message["content"]) for message in messages[1:])
+    assert used <= 300
+    # O resumo não devora o histórico: os turnos mais recentes continuam inteiros
+    assert messages[-1]["content"].startswith("Resposta número 2.")
@@ -0,0 +1,99 @@
+"""
+Sincronização do NotionIndex contra o Notion falso (benchmarks/fake_servers.py):
+marca d'água com páginas que falham e limite de taxa compartilhado; e a busca
+do contexto do prompt a partir da mensagem inteira do usuário.
+"""
+import asyncio
+
+from notion_client import AsyncClient
+
+from benchmarks.fake_servers import FakeNotion, Latency, start_server
+from notion_index import NotionIndex
+from notion_manager import NotionManager
+from rate_limiter import TokenBucket
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(0)
+        self.acquired = 0
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        self.acquired += 1
+        await super().acquire(tokens)
+
+class FlakyNotion(NotionManager):
+    """
+    NotionManager que falha ao ler o conteúdo das páginas em `failing`
+    """
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    async def get_page_content(self, page_id: str, last_edited_time: str = None, bucket=None) -> str:
+        if page_id in self.failing:
+            raise Exception("Erro ao obter conteúdo da página")
+        return await super().get_page_content(page_id, last_edited_time, bucket=bucket)
+
+async def with_fake_notion(test, tmp_path, failing=()):
+    server = FakeNotion(Latency(median=0.001, sigma=0), databases=2, pages=20, depth=1, fanout=2)
+    runner, url = await start_server(server)
+    notion = FlakyNotion(failing)
+    notion._client = AsyncClient(auth="token", base_url=url)
+    bucket = CountingBucket()
+    index = NotionIndex(notion, path=str(tmp_path / "index.db"), sync_interval=60, bucket=bucket)
+    try:
+        await test(server, notion, index, bucket)
+    finally:
+        await index.close()
+        await notion.close()
+        await runner.cleanup()
+
+def test_failed_page_holds_the_watermark_until_it_is_indexed(tmp_path):
+    async def test(server, notion, index, bucket):
+        pages = sorted(server.pages.values(), key=lambda page: page["last_edited_time"], reverse=True)
+        failing = pages[5]
+        notion.failing = {failing["id"]}
+
+        assert await index.sync(full=True) == 19
+        assert index.pages_failed == 1
+        # A próxima varredura incremental ainda alcança a página que falhou
+        assert index.watermark == failing["last_edited_time"]
+
+        notion.failing = set()
+        assert await index.sync() == 1
+        assert index.pages_failed == 0
+        assert index.watermark == pages[0]["last_edited_time"]
+        assert index.page_count == 20
+
+    asyncio.run(with_fake_notion(test, tmp_path))
+
+def test_every_sync_request_takes_a_token(tmp_path):
+    async def test(server, notion, index, bucket):
+        requests = server.requests
+        await index.sync(full=True)
+        assert server.requests > requests
+        assert bucket.acquired == server.requests - requests
+
+    asyncio.run(with_fake_notion(test, tmp_path))
+
+def test_sentence_length_message_finds_the_matching_page(tmp_path):
+    async def test():
+        index = NotionIndex(None, path=str(tmp_path / "index.db"), sync_interval=60)
+        pages = [
+            ("p1", "Reunião de planejamento", "Tarefas da sprint e prazos combinados com o time."),
+            ("p2", "Receitas", "Bolo de cenoura com cobertura de chocolate."),
+            ("p3", "Viagem", "Roteiro de museus e restaurantes em Lisboa.")
+        ]
+        try:
+            for page_id, title, content in pages:
+                page = {"id": page_id, "title": title, "url": "", "last_edited": "", "database_id": None}
+                await index._run(index._upsert, page, content)
+            index.ready = True
+            return await index.search("Quais foram as tarefas combinadas na última reunião de planejamento?", 2)
+        finally:
+            await index.close()
+
+    results = asyncio.run(test())
+    # A mensagem não aparece inteira em página nenhuma, mas os termos-chave sim
+    assert [page["id"] for page in results] == ["p1"]
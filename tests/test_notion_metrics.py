@@ -0,0 +1,44 @@
+"""
+Métricas do NotionManager: cada chamada pública é contada uma única vez,
+mesmo quando usa internamente outra operação instrumentada.
+"""
+import asyncio
+
+from notion_client import AsyncClient
+
+from benchmarks.fake_servers import FakeNotion, Latency, start_server
+from metrics import PROVIDER_REQUESTS
+from notion_manager import NotionManager
+
+def calls() -> dict:
+    counts = {}
+    for (provider, operation, _, _), value in PROVIDER_REQUESTS.items():
+        if provider == "notion":
+            counts[operation] = counts.get(operation, 0) + value
+    return counts
+
+def test_nested_notion_operations_are_counted_once():
+    async def test():
+        runner, url = await start_server(FakeNotion(Latency(median=0.001, sigma=0), databases=3, pages=5))
+        notion = NotionManager()
+        notion.default_database_id = None
+        notion._client = AsyncClient(auth="token", base_url=url)
+        try:
+            before = calls()
+            assert len(await notion.list_databases()) == 3
+            assert await notion.resolve_default_database() == "db0000"
+            assert await notion.search_pages("", limit=2)
+            assert len([db async for db in notion.iter_databases()]) == 3
+            after = calls()
+        finally:
+            await notion.close()
+            await runner.cleanup()
+        deltas = {operation: after[operation] - before.get(operation, 0) for operation in after}
+        return {operation: delta for operation, delta in deltas.items() if delta}
+
+    assert asyncio.run(test()) == {
+        "list_databases": 1,
+        "resolve_default_database": 1,
+        "search_pages": 1,
+        "iter_databases": 1
+    }
@@ -0,0 +1,89 @@
+"""
+Handlers do bot com o Notion lento: enquanto uma chamada ao Notion está em
+andamento, os updates de outros usuários são respondidos normalmente.
+"""
+import asyncio
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from benchmarks.fake_servers import FakeTelegram, Latency, start_server
+
+NOTION_DELAY = 1.0
+
+class SlowNotionClient:
+    """
+    Só a busca do notion_client.AsyncClient, respondendo depois de NOTION_DELAY segundos
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def search(self, **params) -> dict:
+        self.calls += 1
+        await asyncio.sleep(NOTION_DELAY)
+        return {
+            "results": [{
+                "object": "database",
+                "id": "db0000",
+                "title": [{"plain_text": "Tarefas"}],
+                "description": [],
+                "url": "https://notion.so/db0000"
+            }],
+            "has_more": False
+        }
+
+    async def aclose(self) -> None:
+        pass
+
+def command_update(bot, update_id: int, user_id: int, command: str) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Teste"},
+            "text": command,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        }
+    }, bot)
+
+def test_second_handler_finishes_while_notion_is_slow(monkeypatch):
+    import bot
+
+    notion = SlowNotionClient()
+    # Restaurados ao fim do teste: os demais testes usam o mesmo módulo bot
+    monkeypatch.setattr(bot.notion_client, "_client", notion)
+
+    async def test():
+        runner, url = await start_server(FakeTelegram(Latency(median=0.001, sigma=0)))
+        monkeypatch.setattr(bot, "TELEGRAM_API_URL", f"{url}/bot")
+        application = bot.build_application()
+        finished = {}
+
+        async def record(update: Update, context) -> None:
+            finished[update.update_id] = time.perf_counter()
+
+        # Grupo depois dos handlers do bot: marca o fim do processamento de cada update
+        application.add_handler(TypeHandler(Update, record), group=1000)
+        try:
+            async with application:
+                await application.start()
+                started = time.perf_counter()
+                await application.update_queue.put(command_update(application.bot, 1, 1001, "/databases"))
+                await application.update_queue.put(command_update(application.bot, 2, 1002, "/help"))
+                while len(finished) < 2 and time.perf_counter() - started < 10:
+                    await asyncio.sleep(0.01)
+                await application.stop()
+        finally:
+            await runner.cleanup()
+
+        assert notion.calls == 1
+        # O /help de outro usuário não esperou a busca lenta do /databases
+        assert finished[2] < finished[1]
+        assert finished[2] - started < NOTION_DELAY / 2
+        assert finished[1] - started >= NOTION_DELAY
+
+    asyncio.run(test())
@@ -0,0 +1,172 @@
+"""
+Fila de /save: só erros transitórios voltam para a fila, os de configuração
+falham na hora, e uma nota longa que falhou no meio é retomada sem duplicar a página.
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from notion_client import AsyncClient
+
+from benchmarks.fake_servers import FakeNotion, Latency, start_server
+from notion_manager import NotionManager
+from notion_outbox import NotionOutbox, _retry_after
+from rate_limiter import TokenBucket
+
+# Três lotes de blocos: pages.create com o primeiro e dois appends
+LONG_NOTE = ("Parágrafo da nota longa. " * 80 + "\n\n") * 230
+
+class FlakyAppendNotion(FakeNotion):
+    """
+    Notion falso em que o primeiro append de blocos falha com 503
+    """
+
+    def __init__(self):
+        super().__init__(Latency(median=0.001, sigma=0), databases=1, pages=1)
+        self.failed_appends = 0
+
+    async def append_children(self, request: web.Request) -> web.Response:
+        if not self.failed_appends:
+            self.failed_appends += 1
+            self.by_route["blocks_append_failed"] = 1
+            return web.json_response(
+                {"object": "error", "status": 503, "code": "service_unavailable", "message": "Erro simulado"},
+                status=503
+            )
+        return await super().append_children(request)
+
+async def create_page_error(base_url: str, database_id: str = "db0000") -> Exception:
+    notion = NotionManager()
+    notion.default_database_id = database_id
+    notion._client = AsyncClient(auth="token", base_url=base_url)
+    try:
+        with pytest.raises(Exception) as raised:
+            await notion.create_page("Nota", "conteúdo")
+        return raised.value
+    finally:
+        await notion.close()
+
+def test_client_error_response_is_not_retried():
+    async def test():
+        runner, url = await start_server(FakeNotion(Latency(median=0.001, sigma=0, error_rate=1.0, error_status=400)))
+        try:
+            return await create_page_error(url)
+        finally:
+            await runner.cleanup()
+
+    assert _retry_after(asyncio.run(test())) == (False, None)
+
+def test_connection_error_is_retried():
+    async def test():
+        runner, url = await start_server(FakeNotion(Latency(median=0.001, sigma=0)))
+        # Servidor já fechado: conexão recusada
+        await runner.cleanup()
+        return await create_page_error(url)
+
+    assert _retry_after(asyncio.run(test())) == (True, None)
+
+def test_missing_configuration_is_not_retried():
+    try:
+        try:
+            raise ValueError("Token do Notion não configurado")
+        except ValueError as e:
+            raise Exception("Erro ao criar página no Notion") from e
+    except Exception as e:
+        error = e
+    assert _retry_after(error) == (False, None)
+
+def test_failed_append_resumes_without_duplicating_the_page(tmp_path):
+    async def test():
+        server = FlakyAppendNotion()
+        runner, url = await start_server(server)
+        notion = NotionManager()
+        notion._client = AsyncClient(auth="token", base_url=url)
+        outbox = NotionOutbox(notion, path=str(tmp_path / "outbox.db"), rate=0, max_backoff=0.05)
+        results = []
+        delivered = asyncio.Event()
+
+        async def on_result(entry, page, error):
+            results.append((page, error))
+            delivered.set()
+
+        try:
+            await outbox.start(on_result)
+            await outbox.enqueue(1, 1, "Nota longa", LONG_NOTE)
+            await asyncio.wait_for(delivered.wait(), 10)
+        finally:
+            await outbox.close()
+            await notion.close()
+            await runner.cleanup()
+        return server, outbox, results
+
+    server, outbox, results = asyncio.run(test())
+    [(page, error)] = results
+    assert error is None and page["id"]
+    # Uma página só: a segunda tentativa só reenviou os lotes que faltavam
+    assert server.by_route["pages_create"] == 1
+    assert server.by_route["blocks_append"] == 2
+    assert server.by_route["blocks_append_failed"] == 1
+    assert outbox.retries == 1
+
+def test_only_a_rejected_database_drops_the_resolved_default():
+    async def resolved_after(status: int) -> str:
+        runner, url = await start_server(FakeNotion(Latency(median=0.001, sigma=0, error_rate=1.0, error_status=status)))
+        notion = NotionManager()
+        notion.default_database_id = "db0001"
+        notion._client = AsyncClient(auth="token", base_url=url)
+        try:
+            with pytest.raises(Exception):
+                await notion.create_page("Nota", "conteúdo")
+            return notion.default_database_id
+        finally:
+            await notion.close()
+            await runner.cleanup()
+
+    # Erro transitório: o banco resolvido continua valendo para a próxima tentativa
+    assert asyncio.run(resolved_after(503)) == "db0001"
+    assert asyncio.run(resolved_after(404)) != "db0001"
+
+class TimedNotion(FakeNotion):
+    """
+    Notion falso que registra o instante de cada requisição
+    """
+
+    def __init__(self):
+        super().__init__(Latency(median=0.001, sigma=0), databases=1, pages=1)
+        self.times = []
+
+    async def begin(self, route: str) -> bool:
+        self.times.append(asyncio.get_running_loop().time())
+        return await super().begin(route)
+
+def test_long_note_requests_respect_the_rate_limit(tmp_path):
+    rate = 5.0
+
+    async def test():
+        server = TimedNotion()
+        runner, url = await start_server(server)
+        notion = NotionManager()
+        # Sem banco padrão resolvido: a busca também conta no limite
+        notion.default_database_id = None
+        notion._client = AsyncClient(auth="token", base_url=url)
+        outbox = NotionOutbox(notion, path=str(tmp_path / "outbox.db"), bucket=TokenBucket(rate, capacity=1))
+        delivered = asyncio.Event()
+
+        async def on_result(entry, page, error):
+            delivered.set()
+
+        try:
+            await outbox.start(on_result)
+            await outbox.enqueue(1, 1, "Nota longa", LONG_NOTE)
+            await asyncio.wait_for(delivered.wait(), 10)
+        finally:
+            await outbox.close()
+            await notion.close()
+            await runner.cleanup()
+        return server
+
+    server = asyncio.run(test())
+    # Busca do banco, criação e dois anexos, cada um esperando seu token
+    assert len(server.times) == 4
+    gaps = [later - earlier for earlier, later in zip(server.times, server.times[1:])]
+    assert min(gaps) >= 0.9 / rate
@@ -0,0 +1,68 @@
+"""
+Leitura de páginas pelo NotionManager: o cancelamento de quem iniciou uma
+leitura não derruba quem a aguarda, e o limite de concorrência vale para a
+instância inteira, não para cada chamada.
+"""
+import asyncio
+
+from aiohttp import web
+from notion_client import AsyncClient
+
+from benchmarks.fake_servers import FakeNotion, Latency, start_server
+from notion_manager import NotionManager
+
+class ConcurrencyNotion(FakeNotion):
+    """
+    Notion falso que mede quantas listagens de blocos estão abertas ao mesmo tempo
+    """
+
+    def __init__(self):
+        super().__init__(Latency(median=0.02, sigma=0), databases=1, pages=4, depth=2, fanout=3)
+        self.active = 0
+        self.peak = 0
+
+    async def block_children(self, request: web.Request) -> web.Response:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().block_children(request)
+        finally:
+            self.active -= 1
+
+async def with_notion(test):
+    server = ConcurrencyNotion()
+    runner, url = await start_server(server)
+    notion = NotionManager()
+    notion._client = AsyncClient(auth="token", base_url=url)
+    try:
+        return await test(server, notion)
+    finally:
+        await notion.close()
+        await runner.cleanup()
+
+def test_cancelled_reader_does_not_cancel_the_waiters():
+    async def test(server, notion):
+        page = server.pages["page00000"]
+        leader = asyncio.create_task(notion.get_page_content(page["id"], page["last_edited_time"]))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(notion.get_page_content(page["id"], page["last_edited_time"]))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        content = await waiter
+        assert leader.cancelled()
+        assert content
+        # Uma única leitura da árvore, compartilhada pelas duas chamadas
+        assert server.by_route["blocks_children"] == 1 + 3
+        assert notion.page_cache_stats()["misses"] == 1
+
+    asyncio.run(with_notion(test))
+
+def test_fetch_concurrency_is_shared_by_all_pages():
+    async def test(server, notion):
+        notion.fetch_concurrency = 2
+        await asyncio.gather(*(
+            notion.get_page_content(page["id"], page["last_edited_time"]) for page in server.pages.values()
+        ))
+        assert server.peak == 2
+
+    asyncio.run(with_notion(test))
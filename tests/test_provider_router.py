@@ -0,0 +1,140 @@
+"""
+Hedging e circuit breaker do HedgedRouter contra os servidores falsos do
+DeepSeek e da Eden AI (benchmarks/fake_servers.py), com latência e erros injetados.
+"""
+import asyncio
+import time
+
+import pytest
+
+from ai_manager import AIProvider
+from benchmarks.fake_servers import FakeDeepSeek, FakeEden, Latency, start_server
+from deepseek_client import DeepSeekClient
+from eden_client import EdenAIClient
+from provider_router import CircuitBreaker, HedgedRouter, ProvidersUnavailableError
+
+PROVIDERS = [AIProvider.DEEPSEEK, AIProvider.EDEN]
+
+async def with_fake_providers(test):
+    """
+    Sobe DeepSeek e Eden falsos (rápidos e sem erros) e executa `test(servers, router)`
+    """
+    servers = {
+        AIProvider.DEEPSEEK: FakeDeepSeek(Latency(median=0.01, sigma=0)),
+        AIProvider.EDEN: FakeEden(Latency(median=0.01, sigma=0))
+    }
+    runners = []
+    deepseek = DeepSeekClient()
+    eden = EdenAIClient()
+    try:
+        runner, url = await start_server(servers[AIProvider.DEEPSEEK])
+        runners.append(runner)
+        deepseek.api_url = f"{url}/v1/chat/completions"
+        runner, url = await start_server(servers[AIProvider.EDEN])
+        runners.append(runner)
+        eden.base_url = f"{url}/v2"
+        clients = {AIProvider.DEEPSEEK: deepseek, AIProvider.EDEN: eden}
+
+        router = HedgedRouter(PROVIDERS, min_delay=0.2, max_delay=0.2)
+        router.breakers = {provider: CircuitBreaker(failure_threshold=2, reset_timeout=0.3) for provider in PROVIDERS}
+
+        async def route(primary: AIProvider):
+            return await router.route(primary, lambda provider: clients[provider].get_response("oi"))
+
+        await test(servers, router, route)
+    finally:
+        await deepseek.close()
+        await eden.close()
+        for runner in runners:
+            await runner.cleanup()
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    async def test(servers, router, route):
+        servers[AIProvider.DEEPSEEK].latency = Latency(median=3.0, sigma=0)
+        started = time.perf_counter()
+        provider, answer = await route(AIProvider.DEEPSEEK)
+        assert provider == AIProvider.EDEN
+        assert answer
+        # Respondeu logo após o atraso do hedge, sem esperar os 3 s do DeepSeek
+        assert time.perf_counter() - started < 1.5
+        assert router.hedges == 1
+        assert router.secondary_wins == 1
+        # O perdedor foi cancelado sem contar como falha
+        assert router.breakers[AIProvider.DEEPSEEK].failures == 0
+
+    asyncio.run(with_fake_providers(test))
+
+def test_breaker_opens_then_half_open_probe_closes_it():
+    async def test(servers, router, route):
+        breaker = router.breakers[AIProvider.DEEPSEEK]
+        servers[AIProvider.DEEPSEEK].latency = Latency(median=0.01, sigma=0, error_rate=1.0)
+
+        # Falha rápida: o secundário responde na hora, e o circuito abre após 2 falhas
+        for _ in range(2):
+            provider, _ = await route(AIProvider.DEEPSEEK)
+            assert provider == AIProvider.EDEN
+        assert breaker.state == CircuitBreaker.OPEN
+        requests = servers[AIProvider.DEEPSEEK].requests
+
+        # Aberto: o DeepSeek nem é chamado
+        provider, _ = await route(AIProvider.DEEPSEEK)
+        assert provider == AIProvider.EDEN
+        assert servers[AIProvider.DEEPSEEK].requests == requests
+
+        # Recuperado: depois do reset_timeout uma requisição de teste fecha o circuito
+        servers[AIProvider.DEEPSEEK].latency = Latency(median=0.01, sigma=0)
+        await asyncio.sleep(0.35)
+        provider, _ = await route(AIProvider.DEEPSEEK)
+        assert provider == AIProvider.DEEPSEEK
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(with_fake_providers(test))
+
+def test_unused_or_cancelled_probe_does_not_stick_half_open():
+    async def test(servers, router, route):
+        breaker = router.breakers[AIProvider.DEEPSEEK]
+        breaker.record_failure()
+        breaker.record_failure()
+        await asyncio.sleep(0.35)
+
+        # DeepSeek é só o secundário e a Eden responde antes do hedge: nenhum teste é reservado
+        provider, _ = await route(AIProvider.EDEN)
+        assert provider == AIProvider.EDEN
+        assert breaker.available()
+
+        # O teste vai para o DeepSeek, que está lento, e perde o hedge: a vaga é liberada
+        servers[AIProvider.DEEPSEEK].latency = Latency(median=3.0, sigma=0)
+        provider, _ = await route(AIProvider.DEEPSEEK)
+        assert provider == AIProvider.EDEN
+        # O perdedor é cancelado em segundo plano; dá uma volta ao loop para ele terminar
+        await asyncio.sleep(0.05)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.available()
+
+        # Recuperado, o próximo teste passa e o circuito fecha
+        servers[AIProvider.DEEPSEEK].latency = Latency(median=0.01, sigma=0)
+        provider, _ = await route(AIProvider.DEEPSEEK)
+        assert provider == AIProvider.DEEPSEEK
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(with_fake_providers(test))
+
+def test_all_circuits_open_fails_fast_until_a_probe_is_due():
+    async def test(servers, router, route):
+        for breaker in router.breakers.values():
+            breaker.record_failure()
+            breaker.record_failure()
+        requests = {provider: server.requests for provider, server in servers.items()}
+
+        # Nenhum provider é chamado enquanto os circuitos estiverem abertos
+        with pytest.raises(ProvidersUnavailableError):
+            await route(AIProvider.DEEPSEEK)
+        assert {provider: server.requests for provider, server in servers.items()} == requests
+
+        # Passado o reset_timeout, a requisição de teste do half-open é liberada
+        await asyncio.sleep(0.35)
+        provider, _ = await route(AIProvider.DEEPSEEK)
+        assert provider == AIProvider.DEEPSEEK
+        assert router.breakers[AIProvider.DEEPSEEK].state == CircuitBreaker.CLOSED
+
+    asyncio.run(with_fake_providers(test))
@@ -0,0 +1,36 @@
+"""
+SentimentAnalyzer: quando a tarefa do lote é cancelada, quem aguarda o
+resultado recebe um erro em vez de ficar esperando para sempre.
+"""
+import asyncio
+
+import pytest
+
+from sentiment import SentimentAnalyzer
+
+class HangingEden:
+    """
+    Eden AI que nunca responde
+    """
+
+    async def analyze_sentiment(self, text, providers, timeout):
+        await asyncio.Event().wait()
+
+async def cancel_batch(started: bool):
+    analyzer = SentimentAnalyzer(HangingEden(), providers=["amazon"], timeout=60, batch_window=0, max_batch=1)
+    # max_batch=1: o lote é despachado já na chamada
+    waiter = asyncio.create_task(analyzer.analyze_provider("texto", "amazon"))
+    await asyncio.sleep(0)
+    if started:
+        await asyncio.sleep(0.01)
+    for task in list(analyzer._tasks):
+        task.cancel()
+    with pytest.raises(Exception, match="cancelada"):
+        await asyncio.wait_for(waiter, 1)
+    assert not analyzer._inflight
+
+def test_cancelled_batch_fails_the_waiters():
+    asyncio.run(cancel_batch(started=True))
+
+def test_batch_cancelled_before_starting_fails_the_waiters():
+    asyncio.run(cancel_batch(started=False))
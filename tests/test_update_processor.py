@@ -0,0 +1,42 @@
+"""
+UserOrderedUpdateProcessor: updates de usuários diferentes em paralelo,
+os de um mesmo usuário em ordem.
+"""
+import asyncio
+
+from telegram import Update
+
+from update_processor import UserOrderedUpdateProcessor
+
+def text_update(update_id: int, user_id: int) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Teste"},
+            "text": "oi"
+        }
+    }, None)
+
+def test_other_users_are_not_blocked_and_each_user_stays_in_order():
+    async def test():
+        processor = UserOrderedUpdateProcessor(16)
+        finished = []
+
+        async def handle(update_id: int, delay: float) -> None:
+            await asyncio.sleep(delay)
+            finished.append(update_id)
+
+        # Usuário 1 manda um update lento e outro rápido; o usuário 2 um rápido no meio
+        await asyncio.gather(
+            processor.process_update(text_update(1, 1), handle(1, 0.2)),
+            processor.process_update(text_update(2, 2), handle(2, 0.01)),
+            processor.process_update(text_update(3, 1), handle(3, 0.01))
+        )
+        assert finished == [2, 1, 3]
+        assert processor.stats()["waited"] == 1
+        assert processor.stats()["active_users"] == 0
+
+    asyncio.run(test())
@@ -0,0 +1,70 @@
+"""
+Gravação em lote do UserSettingsStore com chamadas concorrentes a flush()
+(loop periódico, release_users e close), com uma escrita lenta no SQLite.
+"""
+import asyncio
+import time
+
+from user_settings import UserSettingsStore
+
+def slow_writes(store: UserSettingsStore, delay: float) -> None:
+    write_batch = store._write_batch
+
+    def slow(batch):
+        time.sleep(delay)
+        write_batch(batch)
+
+    store._write_batch = slow
+
+def test_concurrent_flushes_keep_every_batch_visible(tmp_path):
+    async def test():
+        store = UserSettingsStore(str(tmp_path / "settings.db"), flush_interval=0.01)
+        slow_writes(store, 0.2)
+        store.save_state(1, 5)
+        first = asyncio.create_task(store.flush())
+        await asyncio.sleep(0.05)
+
+        # Enquanto o primeiro lote grava, a escrita continua visível e um segundo flush espera a vez
+        store.save_state(2, 7)
+        second = asyncio.create_task(store.flush())
+        await asyncio.sleep(0.05)
+        assert store.load_state(1) == 5
+        assert (await store.load_user(2))[0] == 7
+
+        await asyncio.gather(first, second)
+        assert store.stats()["batches"] == 2
+        assert store.stats()["rows_written"] == 2
+        assert (await store.load_user(1))[0] == 5
+        assert (await store.load_user(2))[0] == 7
+        assert await store.load_user(3) == (None, None)
+        await store.close()
+
+    asyncio.run(test())
+
+def test_failed_batch_is_requeued_without_overwriting_newer_writes(tmp_path):
+    async def test():
+        store = UserSettingsStore(str(tmp_path / "settings.db"), flush_interval=0.01)
+        write_batch = store._write_batch
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def failing(batch):
+            loop.call_soon_threadsafe(started.set)
+            time.sleep(0.1)
+            raise OSError("disco cheio")
+
+        store._write_batch = failing
+        store.save_state(1, 5)
+        store.save_pending_save(1, {"title": "nota"})
+        flush = asyncio.create_task(store.flush())
+        await started.wait()
+        store.save_state(1, 9)
+        await flush
+
+        # O lote que falhou volta para a fila, mas o estado mais novo vence
+        store._write_batch = write_batch
+        await store.flush()
+        assert await store.load_user(1) == (9, {"title": "nota"})
+        await store.close()
+
+    asyncio.run(test())
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Iterator, List, Optional
+from config import TRACE_SLOW_THRESHOLD, LOOP_MONITOR_INTERVAL, LOOP_LAG_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """
+    Etapa medida de uma requisição; spans filhos formam a árvore do trace
+    """
+    __slots__ = ("name", "attributes", "started", "ended", "children", "error")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.perf_counter()) - self.started
+
+    def format(self, root_started: Optional[float] = None, depth: int = 0) -> List[str]:
+        """
+        Linhas da árvore: início relativo ao trace, duração, atributos e erro
+        """
+        root_started = self.started if root_started is None else root_started
+        details = " ".join(f"{key}={value}" for key, value in self.attributes.items())
+        line = f"{'  ' * depth}{self.name} +{(self.started - root_started) * 1000:.0f}ms {self.duration * 1000:.0f}ms"
+        if details:
+            line += f" {details}"
+        if self.ended is None:
+            line += " (não terminou)"
+        if self.error:
+            line += f" erro={self.error}"
+        lines = [line]
+        for child in self.children:
+            lines.extend(child.format(root_started, depth + 1))
+        return lines
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Mede uma etapa dentro do trace atual; sem trace ativo não faz nada
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, attributes)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        child.ended = time.perf_counter()
+        _current.reset(token)
+
+@contextmanager
+def start_trace(name: str, threshold: float = TRACE_SLOW_THRESHOLD, **attributes) -> Iterator[Span]:
+    """
+    Abre o trace de uma requisição; se ela passar de `threshold` segundos,
+    a árvore de spans vai para o log (threshold 0 desativa)
+    """
+    root = Span(name, attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = type(e).__name__
+        raise
+    finally:
+        root.ended = time.perf_counter()
+        _current.reset(token)
+        if threshold > 0 and root.duration >= threshold:
+            logger.warning(f"Requisição lenta ({root.duration:.2f}s):\n" + "\n".join(root.format()))
+
+def traced(name: str, callback):
+    """
+    Envolve o callback de um handler do Telegram em um trace
+    """
+    @wraps(callback)
+    async def wrapper(update, context):
+        user = update.effective_user
+        with start_trace(name, user_id=user.id if user else None):
+            return await callback(update, context)
+    return wrapper
+
+class LoopLagMonitor:
+    """
+    Mede o atraso do event loop (quanto um sleep de `interval` passa do
+    previsto). Uma thread de vigia detecta o loop parado por mais de
+    `threshold` segundos e registra a pilha da thread do loop, apontando
+    o handler que está bloqueando.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD, on_lag=None):
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._beat_reported = 0.0
+        self.max_lag = 0.0
+        self.lag_events = 0
+        self.blocked_reports = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    async def _beat_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._last_beat = time.monotonic()
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            if self.on_lag is not None:
+                self.on_lag(lag)
+            if lag >= self.threshold:
+                self.lag_events += 1
+                logger.warning(f"Event loop atrasado {lag * 1000:.0f} ms")
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat - self.interval
+            # Uma pilha por travamento: o mesmo batimento não é reportado duas vezes
+            if stalled < self.threshold or beat == self._beat_reported:
+                continue
+            self._beat_reported = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self.blocked_reports += 1
+            stack = "".join(traceback.format_stack(frame, limit=15))
+            logger.warning(f"Event loop bloqueado há {stalled * 1000:.0f} ms. Pilha da thread do loop:\n{stack}")
+
+    def start(self) -> None:
+        """
+        Inicia o batimento no loop atual e a thread de vigia (intervalo 0 desativa)
+        """
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """
+        Encerra o batimento e a thread de vigia
+        """
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def stats(self) -> dict:
+        return {
+            "max_lag": self.max_lag,
+            "lag_events": self.lag_events,
+            "blocked_reports": self.blocked_reports
+        }
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from sharding import shard_key
+
+logger = logging.getLogger(__name__)
+
+class _KeyLock:
+    __slots__ = ("lock", "updates")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Updates com esta chave em processamento ou esperando a vez
+        self.updates = 0
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processa updates de usuários diferentes em paralelo (até
+    `max_concurrent_updates`) e os de um mesmo usuário em ordem, um por vez.
+
+    Com o processamento sequencial padrão da Application, um handler
+    esperando o ritmo de envio de um chat (send_queue) ou uma IA lenta
+    segurava os updates de todos os outros usuários. A chave é a mesma do
+    roteamento dos shards: o usuário, senão o chat, senão o próprio update.
+    """
+
+    __slots__ = ("_locks", "processed", "waited")
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[int, _KeyLock] = {}
+        self.processed = 0
+        # Updates que esperaram o anterior do mesmo usuário terminar
+        self.waited = 0
+
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        if not isinstance(update, Update):
+            await coroutine
+            return
+        key = shard_key(update)
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        if entry.lock.locked():
+            self.waited += 1
+        entry.updates += 1
+        try:
+            async with entry.lock:
+                await coroutine
+                self.processed += 1
+        finally:
+            entry.updates -= 1
+            if not entry.updates:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent_updates": self.max_concurrent_updates,
+            "processed": self.processed,
+            "waited": self.waited,
+            "active_users": len(self._locks)
+        }
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from config import USER_SETTINGS_DB_PATH, USER_SETTINGS_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Campos persistidos por usuário e o SQL de upsert de cada um
+_UPSERTS = {
+    "state": (
+        "INSERT INTO user_settings (user_id, state, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at"
+    ),
+    "pending_save": (
+        "INSERT INTO user_settings (user_id, pending_save, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET pending_save = excluded.pending_save, updated_at = excluded.updated_at"
+    )
+}
+
+_FIELDS = ("state", "pending_save")
+# Marca uma linha ainda não lida do banco (None é "usuário sem linha")
+_UNREAD = object()
+
+class UserSettingsStore:
+    """
+    Persistência das configurações por usuário em SQLite (modo WAL).
+    Leituras são feitas sob demanda, uma linha por usuário, numa thread
+    (load_user); escritas são acumuladas em memória (a última vence) e
+    gravadas em lote numa thread dedicada, com um único commit por lote.
+    """
+
+    def __init__(self, path: str = USER_SETTINGS_DB_PATH, flush_interval: float = USER_SETTINGS_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._write_conn: Optional[sqlite3.Connection] = None
+        # Uma única thread de escrita: o SQLite aceita um escritor por vez
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-settings")
+        # Leituras também fora do event loop, numa thread própria com a conexão de leitura
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-settings-read")
+        self._pending: Dict[Tuple[int, str], object] = {}
+        self._flushing: Dict[Tuple[int, str], object] = {}
+        # Um lote por vez: flush() é chamado pelo loop periódico, por release_users e por close()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.batches = 0
+        self.rows_written = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_settings ("
+            "user_id INTEGER PRIMARY KEY, "
+            "state INTEGER NOT NULL DEFAULT 0, "
+            "pending_save TEXT, "
+            "updated_at REAL)"
+        )
+        conn.commit()
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        if self._read_conn is None:
+            self._read_conn = self._connect()
+        return self._read_conn
+
+    def _read_row(self, user_id: int) -> Optional[tuple]:
+        return self._reader().execute(
+            "SELECT state, pending_save FROM user_settings WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+    def _unwritten(self, user_id: int, field: str):
+        # Escritas ainda não gravadas têm precedência sobre o banco
+        key = (user_id, field)
+        if key in self._pending:
+            return True, self._pending[key]
+        if key in self._flushing:
+            return True, self._flushing[key]
+        return False, None
+
+    def _lookup(self, user_id: int, field: str, row=_UNREAD):
+        found, value = self._unwritten(user_id, field)
+        if found:
+            return found, value
+        if row is _UNREAD:
+            row = self._read_row(user_id)
+        return row is not None, row[_FIELDS.index(field)] if row is not None else None
+
+    async def load_user(self, user_id: int) -> Tuple[Optional[int], Optional[dict]]:
+        """
+        Lê o estado e o /save pendente de um usuário sem bloquear o event loop
+        """
+        row = None
+        if not all(self._unwritten(user_id, field)[0] for field in _FIELDS):
+            row = await asyncio.get_running_loop().run_in_executor(self._read_executor, self._read_row, user_id)
+        # As escritas pendentes são consultadas depois da leitura: podem ter chegado durante ela
+        found, state = self._lookup(user_id, "state", row)
+        _, pending_save = self._lookup(user_id, "pending_save", row)
+        return state if found else None, json.loads(pending_save) if pending_save else None
+
+    def load_state(self, user_id: int) -> Optional[int]:
+        """
+        Lê o estado persistido de um usuário (consulta pontual pela chave primária).
+        Bloqueia o event loop: os handlers usam load_user antes, este é só o fallback
+        """
+        found, state = self._lookup(user_id, "state")
+        return state if found else None
+
+    def save_state(self, user_id: int, state: int) -> None:
+        """
+        Agenda a gravação do estado de um usuário
+        """
+        self._schedule(user_id, "state", state)
+
+    def load_pending_save(self, user_id: int) -> Optional[dict]:
+        """
+        Lê o /save pendente de um usuário, se houver
+        """
+        _, value = self._lookup(user_id, "pending_save")
+        return json.loads(value) if value else None
+
+    def save_pending_save(self, user_id: int, data: Optional[dict]) -> None:
+        """
+        Agenda a gravação (ou remoção, com None) do /save pendente de um usuário
+        """
+        self._schedule(user_id, "pending_save", json.dumps(data) if data else None)
+
+    def _schedule(self, user_id: int, field: str, value) -> None:
+        self._pending[(user_id, field)] = value
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write_batch(self, batch: Dict[Tuple[int, str], object]) -> None:
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+        now = time.time()
+        rows: Dict[str, list] = {}
+        for (user_id, field), value in batch.items():
+            rows.setdefault(field, []).append((user_id, value, now))
+        with self._write_conn:
+            for field, params in rows.items():
+                self._write_conn.executemany(_UPSERTS[field], params)
+
+    async def flush(self) -> None:
+        """
+        Grava imediatamente todas as escritas pendentes em um único lote
+        """
+        # Uma chamada concorrente espera o lote em gravação e depois grava o que chegou durante ele
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._flushing = self._pending
+            self._pending = {}
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._write_batch, batch)
+                self.batches += 1
+                self.rows_written += len(batch)
+            except Exception as e:
+                logger.error(f"Erro ao gravar configurações de usuários: {str(e)}")
+                # Devolve o lote para a próxima tentativa sem sobrescrever escritas mais novas
+                batch.update(self._pending)
+                self._pending = batch
+            finally:
+                self._flushing = {}
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Espera o intervalo para agrupar escritas próximas no mesmo lote
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        """
+        Inicia a gravação periódica em segundo plano
+        """
+        if self._flush_task is None:
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+            logger.info(f"Persistência de usuários em '{self.path}' iniciada")
+
+    async def close(self) -> None:
+        """
+        Grava as escritas pendentes e fecha as conexões
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        # As threads terminam antes de as conexões que elas usam serem fechadas
+        self._executor.shutdown(wait=True)
+        self._read_executor.shutdown(wait=True)
+        for conn in (self._read_conn, self._write_conn):
+            if conn is not None:
+                conn.close()
+        self._read_conn = self._write_conn = None
+        logger.info(f"Persistência de usuários encerrada ({self.batches} lotes, {self.rows_written} linhas)")
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "rows_written": self.rows_written
+        }
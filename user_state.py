@@ -0,0 +1,160 @@
+import logging
+import time
+from itertools import islice
+from typing import Callable, Dict, Optional
+from config import USER_STATE_MAX_USERS, USER_STATE_IDLE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Layout do estado compactado em um único int por usuário (< 256, portanto
+# um dos inteiros pequenos pré-alocados pelo CPython, sem custo por usuário):
+#   bit 0      -> IA ativada
+#   bit 1      -> aguardando mensagem para análise de sentimento
+#   bits 2..4  -> código do provider (0 = nenhum, senão AIProvider.value)
+ENABLED = 1 << 0
+ANALYZING_SENTIMENT = 1 << 1
+PROVIDER_SHIFT = 2
+PROVIDER_MASK = 0b111 << PROVIDER_SHIFT
+STATE_MASK = 0xFF
+
+class UserStateStore:
+    """
+    Armazena o estado de cada usuário como um inteiro compactado.
+
+    Os usuários ficam em duas gerações (dicts simples): a atual e a anterior.
+    A cada `idle_ttl / 2` segundos a geração anterior é descartada e a atual
+    passa a ser a anterior, então um usuário sem acesso por `idle_ttl`
+    segundos é sempre removido. Um acesso na geração anterior promove o
+    usuário para a atual. Acima de `max_users`, os usuários mais antigos
+    (anterior primeiro, depois ordem de inserção) são removidos em lote.
+    Usuários ausentes assumem o estado padrão (tudo zerado), ou o estado
+    devolvido por `loader` quando há uma camada de persistência.
+    """
+
+    def __init__(
+        self,
+        max_users: int = USER_STATE_MAX_USERS,
+        idle_ttl: float = USER_STATE_IDLE_TTL,
+        loader: Optional[Callable[[int], Optional[int]]] = None,
+        on_write: Optional[Callable[[int, int], None]] = None
+    ):
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        # Carrega sob demanda o estado de usuários ausentes da memória
+        self._loader = loader
+        # Notificado a cada alteração de estado (ex.: gravação em lote no disco)
+        self._on_write = on_write
+        self._current: Dict[int, int] = {}
+        self._previous: Dict[int, int] = {}
+        self._rotated_at = time.monotonic()
+        self.evictions = 0
+
+    def _maybe_rotate(self) -> None:
+        elapsed = time.monotonic() - self._rotated_at
+        if elapsed < self.idle_ttl / 2:
+            return
+        evicted = len(self._previous)
+        if elapsed >= self.idle_ttl:
+            # Nenhum acesso por um TTL inteiro: as duas gerações estão ociosas
+            evicted += len(self._current)
+            self._previous = {}
+        else:
+            self._previous = self._current
+        self._current = {}
+        self._rotated_at = time.monotonic()
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"{evicted} usuários ociosos removidos do estado em memória")
+
+    def _evict_overflow(self) -> None:
+        # Remove 1% a mais que o necessário para não pagar a remoção a cada inserção
+        excess = len(self) - self.max_users + max(1, self.max_users // 100)
+        for generation in (self._previous, self._current):
+            if excess <= 0:
+                break
+            victims = list(islice(generation, excess))
+            for user_id in victims:
+                del generation[user_id]
+            excess -= len(victims)
+            self.evictions += len(victims)
+
+    def get(self, user_id: int) -> int:
+        """
+        Retorna os bits de estado do usuário, marcando o acesso
+        """
+        self._maybe_rotate()
+        state = self._current.get(user_id)
+        if state is not None:
+            return state
+        state = self._previous.pop(user_id, None)
+        if state is not None:
+            self._current[user_id] = state
+            return state
+        if self._loader is None:
+            return 0
+        state = (self._loader(user_id) or 0) & STATE_MASK
+        self._insert(user_id, state)
+        return state
+
+    def put(self, user_id: int, state: int) -> None:
+        """
+        Grava os bits de estado do usuário
+        """
+        self._maybe_rotate()
+        self._previous.pop(user_id, None)
+        state &= STATE_MASK
+        self._insert(user_id, state)
+        if self._on_write is not None:
+            self._on_write(user_id, state)
+
+    def preload(self, user_id: int, state: Optional[int]) -> None:
+        """
+        Coloca em memória o estado lido de forma assíncrona, sem chamar `loader`
+        nem `on_write`; não sobrescreve um usuário já presente
+        """
+        if user_id not in self:
+            self._insert(user_id, (state or 0) & STATE_MASK)
+
+    def _insert(self, user_id: int, state: int) -> None:
+        self._current[user_id] = state
+        if len(self._current) + len(self._previous) > self.max_users:
+            self._evict_overflow()
+
+    def get_flag(self, user_id: int, flag: int) -> bool:
+        return bool(self.get(user_id) & flag)
+
+    def set_flag(self, user_id: int, flag: int, value: bool) -> None:
+        state = self.get(user_id)
+        self.put(user_id, state | flag if value else state & ~flag)
+
+    def get_provider_code(self, user_id: int) -> int:
+        return (self.get(user_id) & PROVIDER_MASK) >> PROVIDER_SHIFT
+
+    def set_provider_code(self, user_id: int, code: int) -> None:
+        state = self.get(user_id) & ~PROVIDER_MASK
+        self.put(user_id, state | ((code << PROVIDER_SHIFT) & PROVIDER_MASK))
+
+    def retain(self, keep: Callable[[int], bool]) -> int:
+        """
+        Remove da memória os usuários para os quais `keep` retorna False
+        """
+        removed = 0
+        for generation in (self._previous, self._current):
+            for user_id in [user_id for user_id in generation if not keep(user_id)]:
+                del generation[user_id]
+                removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._current or user_id in self._previous
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self),
+            "max_users": self.max_users,
+            "idle_ttl": self.idle_ttl,
+            "evictions": self.evictions
+        }
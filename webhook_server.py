@@ -0,0 +1,92 @@
+import hmac
+import json
+import logging
+from typing import Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from config import WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    """
+    Servidor aiohttp que recebe os updates do Telegram via webhook.
+    Cada update é validado, enfileirado na Application e respondido com 200
+    imediatamente; o processamento acontece de forma assíncrona.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        listen: str = WEBHOOK_LISTEN,
+        port: int = WEBHOOK_PORT,
+        path: str = WEBHOOK_PATH,
+        secret_token: str = WEBHOOK_SECRET_TOKEN
+    ):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._runner: Optional[web.AppRunner] = None
+        self.received = 0
+        self.rejected = 0
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """
+        Valida o secret token, decodifica o update e o entrega à Application
+        """
+        if self.secret_token:
+            received_token = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(received_token, self.secret_token):
+                self.rejected += 1
+                logger.warning("Update recusado: secret token inválido")
+                return web.Response(status=403)
+
+        try:
+            data = json.loads(await request.read())
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            self.rejected += 1
+            logger.warning(f"Update inválido recebido no webhook: {str(e)}")
+            return web.Response(status=400)
+
+        # O processamento segue na fila de updates da Application
+        await self.application.update_queue.put(update)
+        self.received += 1
+        return web.Response(status=200)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "received": self.received,
+            "rejected": self.rejected
+        })
+
+    async def start(self) -> None:
+        """
+        Inicia o servidor HTTP
+        """
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port)
+        await site.start()
+        logger.info(f"Webhook ouvindo em http://{self.listen}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """
+        Encerra o servidor HTTP
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("Servidor de webhook encerrado")